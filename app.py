@@ -2,16 +2,30 @@ import pandas as pd
 import numpy as np
 import os
 import sys
-from flask import Flask, request, jsonify, render_template
+import json
+from flask import Flask, Response, g, request, jsonify, render_template, stream_with_context
 from flask_cors import CORS
 
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
 try:
-    from src.scraping.letterboxd_scraper import get_favorite_movies, scrape_watchlist, get_user_avatar
-    from src.matching.fuzzy_matcher import match_titles
-    from src.embedding.embedding_generator import generate_description_nova_base, embed_descriptions
-    from src.recommender.recommender import recommend_movies_advanced
+    from src.scraping.letterboxd_scraper import scrape_profile, scrape_watchlist
+    from src.matching.fuzzy_matcher import TitleMatcher
+    from src.embedding.embedding_generator import generate_description_nova_base
+    from src.embedding.embedding_store import update_embeddings
+    from src.recommender.recommender import recommend_movies_advanced, user_profile_vector
+    from src.recommender.index import RecommenderIndex, index_path_for, embeddings_version
+    from src.recommender.result_cache import RecommendationCache
+    from src.recommender.user_index import UserIndex
+    from src.recommender.filters import AttributeIndex
+    from src.recommender.watchlists import WatchlistService, WatchlistStore, WatchlistUnavailable, normalize_nicknames
+    from src.scraping.scrape_cache import get_scrape_cache
+    from src.utils.jobs import JobManager, JobError, INLINE, IO, CPU
+    from src.utils.metrics import registry, timed, render_prometheus, start_profile, profile_report
+    from src.recommender.batch import recommend_movies_batch, to_json_lines
+    from src.utils.catalog_index import CatalogIndex
+    from src.utils.catalog_store import REQUIRED_COLUMNS, catalog_exists, catalog_index_path, catalog_scale, load_catalog
+    from src.embedding.quantization import load_embeddings
 except ImportError as e:
     print(f"ERRO DE IMPORTAÇÃO: {e}")
     sys.exit()
@@ -21,30 +35,93 @@ CORS(app)
 
 DATASET_PATH = './data/pre-processing/base_transformada.csv'
 EMBEDDINGS_PATH = './data/embeddings/movie_embeddings.npy'
+EMBEDDINGS_STORE_DIR = './data/embeddings/store'
+INDEX_PATH = index_path_for(EMBEDDINGS_PATH)
+CATALOG_DIR = os.environ.get('TOPFOURYOU_CATALOG_DIR', './data/catalog')
+USER_INDEX_DIR = os.environ.get('TOPFOURYOU_USER_INDEX_DIR', './data/users')
+WATCHLIST_STORE_PATH = os.environ.get('TOPFOURYOU_WATCHLIST_STORE', './data/users/watchlists.sqlite')
+CO_FAVORITE_WEIGHT = float(os.environ.get('TOPFOURYOU_CO_FAVORITE_WEIGHT', 0.0))
 
 print("Iniciando o servidor e carregando os recursos...")
 imdb_df = None
-embeddings = None
+catalog_manifest = None
+embeddings_scale = None
+recommender_index = None
+catalog_index = None
+title_matcher = None
+user_index = None
+attribute_index = None
+watchlist_service = None
+recommendation_cache = RecommendationCache()
+job_manager = JobManager()
 
 try:
-    print(f"Carregando dataset de '{DATASET_PATH}'...")
-    imdb_df = pd.read_csv(DATASET_PATH) 
-    imdb_df.dropna(subset=['title', 'release_date', 'rating_imdb', 'genre', 'language'], inplace=True) #
-    print("Dataset carregado com sucesso.")
-
-    if os.path.exists(EMBEDDINGS_PATH):
-        print(f"Carregando embeddings de '{EMBEDDINGS_PATH}'...")
-        embeddings = np.load(EMBEDDINGS_PATH) 
+    if catalog_exists(CATALOG_DIR):
+        print(f"Carregando catálogo compilado de '{CATALOG_DIR}'...")
+        imdb_df, embeddings, catalog_manifest = load_catalog(CATALOG_DIR)
+        recommender_index = RecommenderIndex.load_or_build(
+            embeddings, catalog_index_path(CATALOG_DIR), normalized=True, mmap=True,
+            scale=catalog_scale(CATALOG_DIR, catalog_manifest), version=catalog_manifest["version"]
+        )
     else:
-        print("Embeddings não encontrados. Gerando novos...")
-        os.makedirs(os.path.dirname(EMBEDDINGS_PATH), exist_ok=True) 
-        descriptions = generate_description_nova_base(imdb_df) 
-        embeddings = embed_descriptions(descriptions) 
-        np.save(EMBEDDINGS_PATH, embeddings) 
+        print(f"Carregando dataset de '{DATASET_PATH}'...")
+        imdb_df = pd.read_csv(DATASET_PATH) 
+        imdb_df.dropna(subset=REQUIRED_COLUMNS, inplace=True) #
+        imdb_df.reset_index(drop=True, inplace=True)
+        print("Dataset carregado com sucesso.")
+
+        if os.path.exists(EMBEDDINGS_PATH):
+            print(f"Carregando embeddings de '{EMBEDDINGS_PATH}'...")
+            embeddings, embeddings_scale = load_embeddings(EMBEDDINGS_PATH)
+        else:
+            print("Embeddings não encontrados. Gerando novos...")
+            descriptions = generate_description_nova_base(imdb_df) 
+            update_embeddings(descriptions, EMBEDDINGS_STORE_DIR).export_npy(EMBEDDINGS_PATH)
+            embeddings = np.load(EMBEDDINGS_PATH) 
+            if os.path.exists(INDEX_PATH):
+                os.remove(INDEX_PATH)
+        recommender_index = RecommenderIndex.load_or_build(
+            embeddings, INDEX_PATH, scale=embeddings_scale, version=embeddings_version(EMBEDDINGS_PATH)
+        )
+
+    # Daqui em diante os vetores saem de recommender_index.vectors(); não guardar outra cópia no módulo.
+    del embeddings
+
+    catalog_index = CatalogIndex.from_dataframe(imdb_df)
+    title_matcher = TitleMatcher(catalog_index)
+    attribute_index = AttributeIndex.from_dataframe(imdb_df)
+    user_index = UserIndex.load_or_create(
+        USER_INDEX_DIR, recommender_index.dim, len(recommender_index), version=recommender_index.version
+    )
+    watchlist_service = WatchlistService(
+        imdb_df, recommender_index, title_matcher, scrape=scrape_watchlist,
+        store=WatchlistStore(WATCHLIST_STORE_PATH, version=recommender_index.version), user_index=user_index
+    )
     print("Servidor pronto.")
 except Exception as e:
     print(f"Erro durante a inicialização: {e}")
 
+@registry.register_collector
+def cache_metrics():
+    caches = {"recommendation": recommendation_cache.stats(), "scrape": get_scrape_cache().stats()}
+    for cache, cache_stats in caches.items():
+        yield "topfouryou_cache_entries", "Entradas em cada cache.", {"cache": cache}, cache_stats["entries"]
+        for field in ("hits", "misses", "evictions"):
+            yield (f"topfouryou_cache_{field}_total", f"Total de '{field}' de cada cache.", {"cache": cache},
+                   cache_stats[field], "counter")
+    if user_index is not None:
+        yield "topfouryou_user_profiles", "Perfis no índice de usuários.", {}, len(user_index)
+
+@app.before_request
+def start_request_profile():
+    g.profiler = start_profile(request.headers.get('X-Debug-Profile') == '1')
+
+@app.after_request
+def finish_request_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        print(f"Profile de {request.method} {request.full_path}:\n{profile_report(profiler)}")
+    return response
 
 @app.route('/')
 def index():
@@ -58,63 +135,226 @@ def frontend():
 def common_page():
     return render_template('common.html')
 
+def fetch_profile(nickname):
+    print(f"Buscando perfil de {nickname}...")
+    with timed("scrape_profile"):
+        profile = scrape_profile(nickname)
+    if not profile or not profile["favorites"]:
+        raise JobError(f"Não foi possível encontrar favoritos para '{nickname}'.", 404)
+    return profile
+
+def match_profile(profile):
+    """Favorito -> linha do catálogo escolhida pelo matcher (None quando não encontrado)."""
+    with timed("match_titles"):
+        matched_rows = title_matcher.match_rows(profile["favorites"], threshold=85)
+    if all(row is None for row in matched_rows.values()):
+        raise JobError("Nenhum filme favorito foi encontrado no nosso banco de dados.", 404)
+    return matched_rows
+
+def _list_arg(args, name):
+    values = args.getlist(name) if hasattr(args, 'getlist') else args.get(name) or []
+    if not isinstance(values, (list, tuple)):
+        values = [values]
+    return [v.strip() for value in values for v in str(value).split(',') if v.strip()] or None
+
+def parse_filters(args):
+    """Filtros de catálogo vindos da query string (ou de um dict no corpo do lote)."""
+    def number(name, cast):
+        value = args.get(name)
+        return cast(value) if value not in (None, '') else None
+
+    try:
+        return attribute_index.build(
+            genres=_list_arg(args, 'genre'),
+            languages=_list_arg(args, 'language'),
+            year_min=number('year_min', int),
+            year_max=number('year_max', int),
+            min_rating=number('min_rating', float)
+        )
+    except (TypeError, ValueError):
+        raise JobError("Filtros inválidos: year_min, year_max e min_rating devem ser números.", 400)
+
+def parse_recommend_filters(args):
+    """
+    Como `parse_filters`, mas falha logo (404) se nenhum filme atende aos
+    filtros: sem candidatos, não adianta coletar o perfil no Letterboxd.
+    """
+    row_filter = parse_filters(args)
+    if row_filter is not None and row_filter.count == 0:
+        raise JobError("Nenhum filme do catálogo atende aos filtros escolhidos.", 404)
+    return row_filter
+
+def remember_profile(nickname, rows):
+    """Grava (ou atualiza) o perfil do usuário no índice de usuários."""
+    if user_index is not None and nickname and rows:
+        user_index.upsert(nickname, user_profile_vector(recommender_index.vectors(rows)), rows)
+
+def rank_profile(profile, nprobe=None, ef_search=None, co_favorite_weight=CO_FAVORITE_WEIGHT, row_filter=None):
+    matched_rows = match_profile(profile)
+    remember_profile(profile.get("nickname"), [row for row in matched_rows.values() if row is not None])
+
+    with timed("recommend"):
+        recommendations_df = recommend_movies_advanced(
+            fav_matches=None,
+            fav_rows=matched_rows,
+            imdb_df=imdb_df,
+            embeddings=None,
+            index=recommender_index,
+            catalog_index=catalog_index,
+            nprobe=nprobe,
+            ef_search=ef_search,
+            cache=recommendation_cache,
+            user_index=user_index,
+            nickname=profile.get("nickname"),
+            co_favorite_weight=co_favorite_weight,
+            row_filter=row_filter
+        )
+
+    return {
+        "avatar_url": profile["avatar_url"],
+        "recommendations": recommendations_df.to_dict(orient="records")
+    }
+
 @app.route('/recommend', methods=['GET'])
 def recommend():
     nickname = request.args.get('nickname')
     if not nickname:
         return jsonify({"error": "O parâmetro 'nickname' é obrigatório."}), 400
 
-    if imdb_df is None or embeddings is None:
+    if imdb_df is None or recommender_index is None:
         return jsonify({"error": "Erro interno: dataset ou embeddings não carregados."}), 500
 
     try:
-        print(f"Buscando avatar para {nickname}...")
-        avatar_url = get_user_avatar(nickname) 
-        
-        print(f"Buscando filmes favoritos para {nickname}...")
-        favorite_titles = get_favorite_movies(nickname) 
-        
-        if not favorite_titles:
-            return jsonify({"error": f"Não foi possível encontrar favoritos para '{nickname}'."}), 404
-
-        imdb_titles = imdb_df['title'].tolist()
-        matched_titles = match_titles(favorite_titles, imdb_titles, threshold=85)
-        if not matched_titles:
-            return jsonify({"error": "Nenhum filme favorito foi encontrado no nosso banco de dados."}), 404
-
-        recommendations_df = recommend_movies_advanced(
-            fav_matches=matched_titles,
-            imdb_df=imdb_df,
-            embeddings=embeddings
+        row_filter = parse_recommend_filters(request.args)
+        profile = fetch_profile(nickname)
+        response_data = rank_profile(
+            profile,
+            nprobe=request.args.get('nprobe', type=int),
+            ef_search=request.args.get('ef_search', type=int),
+            co_favorite_weight=request.args.get('co_favorite_weight', CO_FAVORITE_WEIGHT, type=float),
+            row_filter=row_filter
         )
-
-        response_data = {
-            "avatar_url": avatar_url,
-            "recommendations": recommendations_df.to_dict(orient="records")
-        }
-        
         return jsonify(response_data) 
 
+    except JobError as e:
+        return jsonify({"error": e.message}), e.status_code
     except Exception as e:
         print(f"Erro ao gerar recomendações: {e}")
         return jsonify({"error": "Erro interno durante a recomendação."}), 500
 
+BATCH_USAGE = "O corpo deve conter 'users': [{\"user\": ..., \"favorites\": [...]}]."
+
+def _batch_users(users):
+    if isinstance(users, dict):
+        users = [{"user": user, "favorites": favorites} for user, favorites in users.items()]
+    if not isinstance(users, list) or not users:
+        raise JobError(BATCH_USAGE, 400)
+
+    parsed = []
+    for position, user in enumerate(users):
+        if not isinstance(user, dict) or user.get('user') in (None, ''):
+            raise JobError(f"Usuário na posição {position} inválido. {BATCH_USAGE}", 400)
+        favorites = user.get('favorites', [])
+        if not isinstance(favorites, list) or not all(isinstance(title, str) for title in favorites):
+            raise JobError(f"'favorites' de '{user['user']}' deve ser uma lista de títulos.", 400)
+        parsed.append((user['user'], favorites))
+    return parsed
+
+def _batch_int(payload, name, default, maximum):
+    value = payload.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= maximum:
+        raise JobError(f"'{name}' deve ser um inteiro entre 1 e {maximum}.", 400)
+    return value
+
+def parse_batch_payload(payload):
+    """Valida o corpo inteiro do /recommend_batch antes de começar a resposta em streaming."""
+    if not isinstance(payload, dict):
+        raise JobError(BATCH_USAGE, 400)
+
+    users = _batch_users(payload.get('users'))
+    top_n = _batch_int(payload, 'top_n', 10, 100)
+    candidate_pool_size = _batch_int(payload, 'candidate_pool_size', 100, 1000)
+    lambda_ = payload.get('lambda', 0.7)
+    if isinstance(lambda_, bool) or not isinstance(lambda_, (int, float)) or not 0 <= lambda_ <= 1:
+        raise JobError("'lambda' deve ser um número entre 0 e 1.", 400)
+    filters = payload.get('filters') or {}
+    if not isinstance(filters, dict):
+        raise JobError("'filters' deve ser um objeto.", 400)
+
+    return users, {
+        "top_n": top_n,
+        "candidate_pool_size": candidate_pool_size,
+        "lambda_": float(lambda_),
+        "row_filter": parse_filters(filters)
+    }
+
+@app.route('/recommend_batch', methods=['POST'])
+def recommend_batch():
+    if imdb_df is None or recommender_index is None:
+        return jsonify({"error": "Erro interno: dataset ou embeddings não carregados."}), 500
+
+    try:
+        users, params = parse_batch_payload(request.get_json(silent=True))
+    except JobError as e:
+        return jsonify({"error": e.message}), e.status_code
+
+    results = recommend_movies_batch(users, imdb_df, recommender_index, catalog_index, title_matcher, **params)
+    return Response(stream_with_context(to_json_lines(results)), mimetype='application/x-ndjson')
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({
+        "recommendation_cache": recommendation_cache.stats(),
+        "scrape_cache": get_scrape_cache().stats()
+    })
+
+@app.route('/similar_users', methods=['GET'])
+def similar_users():
+    nickname = request.args.get('nickname')
+    if not nickname:
+        return jsonify({"error": "O parâmetro 'nickname' é obrigatório."}), 400
+
+    if user_index is None:
+        return jsonify({"error": "Erro interno: dataset ou embeddings não carregados."}), 500
+
+    try:
+        k = min(_positive_int_arg(request.args, 'k', 10), 100)
+        if nickname not in user_index:
+            profile = fetch_profile(nickname)
+            remember_profile(nickname, [row for row in match_profile(profile).values() if row is not None])
+
+        with timed("similar_users"):
+            users = user_index.similar_users(nickname, k=k)
+        return jsonify({"users": [{"nickname": user, "similarity": score} for user, score in users]})
+
+    except JobError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except Exception as e:
+        print(f"Erro ao buscar usuários parecidos: {e}")
+        return jsonify({"error": "Erro interno durante a busca."}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/find_common', methods=['GET'])
 def find_common():
+    min_common = request.args.get('min_common', type=int)
+    if request.args.get('nicknames') or min_common is not None:
+        return find_common_group(min_common)
+
     nickname1 = request.args.get('nickname1') 
     nickname2 = request.args.get('nickname2') 
 
     if not nickname1 or not nickname2:
         return jsonify({"error": "Os dois nicknames são obrigatórios."}), 400 
 
-    try:
-        print(f"Coletando watchlist de '{nickname1}'...")
-        watchlist1 = scrape_watchlist(nickname1)
-
-        print(f"\nColetando watchlist de '{nickname2}'...")
-        watchlist2 = scrape_watchlist(nickname2)
+    if watchlist_service is None:
+        return jsonify({"error": "Erro interno: dataset ou embeddings não carregados."}), 500
 
-        common_movies = sorted(list(set(watchlist1) & set(watchlist2)))
+    try:
+        print(f"Coletando watchlists de '{nickname1}' e '{nickname2}'...")
+        common_movies = common_titles(nickname1, nickname2)
 
         if not common_movies:
             print("Nenhum filme em comum encontrado.")
@@ -123,9 +363,139 @@ def find_common():
             
         return jsonify(common_movies)
 
+    except JobError as e:
+        return jsonify({"error": e.message}), e.status_code
+    except Exception as e:
+        print(f"Erro ao buscar filmes em comum: {e}")
+        return jsonify({"error": "Ocorreu um erro ao processar sua solicitação."}), 500
+
+def common_titles(nickname1, nickname2):
+    """
+    Formato antigo do /find_common (uma lista de títulos), usado pelo
+    static/common.js: os filmes em comum vêm do WatchlistService, do mais
+    próximo do gosto dos dois para o menos próximo.
+    """
+    return [movie["title"] for movie in common_for_group(normalize_nicknames([nickname1, nickname2]))]
+
+def common_for_group(nicknames, min_common=None, limit=None):
+    try:
+        with timed("find_common_group"):
+            return watchlist_service.common(nicknames, min_common=min_common, limit=limit)
+    except WatchlistUnavailable as e:
+        raise JobError(str(e), 502)
+
+def _group_nicknames(args):
+    nicknames = normalize_nicknames(
+        _list_arg(args, 'nicknames') or [n for n in (args.get('nickname1'), args.get('nickname2')) if n]
+    )
+    if len(nicknames) < 2:
+        raise JobError("Informe pelo menos dois nicknames diferentes em 'nicknames'.", 400)
+    return nicknames
+
+def _positive_int_arg(args, name, default=None):
+    value = args.get(name)
+    if value in (None, ''):
+        return default
+    if not str(value).isdigit() or int(value) < 1:
+        raise JobError(f"'{name}' deve ser um inteiro positivo.", 400)
+    return int(value)
+
+def find_common_group(min_common):
+    """
+    Versão para N usuários do /find_common: filmes em pelo menos `min_common`
+    watchlists, com os dados do catálogo, ordenados pelo gosto do grupo.
+    """
+    if watchlist_service is None:
+        return jsonify({"error": "Erro interno: dataset ou embeddings não carregados."}), 500
+
+    try:
+        nicknames = _group_nicknames(request.args)
+        limit = _positive_int_arg(request.args, 'limit')
+        print(f"Coletando watchlists de {', '.join(nicknames)}...")
+        movies = common_for_group(nicknames, min_common, limit=limit)
+        return jsonify(movies)
+
+    except JobError as e:
+        return jsonify({"error": e.message}), e.status_code
     except Exception as e:
         print(f"Erro ao buscar filmes em comum: {e}")
         return jsonify({"error": "Ocorreu um erro ao processar sua solicitação."}), 500
 
+def _job_accepted(job):
+    return jsonify({"job_id": job.id, "status_url": f"/jobs/{job.id}"}), 202
+
+@app.route('/jobs/recommend', methods=['POST'])
+def submit_recommend_job():
+    nickname = request.args.get('nickname')
+    if not nickname:
+        return jsonify({"error": "O parâmetro 'nickname' é obrigatório."}), 400
+
+    if imdb_df is None or recommender_index is None:
+        return jsonify({"error": "Erro interno: dataset ou embeddings não carregados."}), 500
+
+    nprobe = request.args.get('nprobe', type=int)
+    ef_search = request.args.get('ef_search', type=int)
+    co_favorite_weight = request.args.get('co_favorite_weight', CO_FAVORITE_WEIGHT, type=float)
+    try:
+        row_filter = parse_recommend_filters(request.args)
+    except JobError as e:
+        return jsonify({"error": e.message}), e.status_code
+
+    cached = get_scrape_cache().peek("profile", nickname)
+    stages = [
+        ("scrape_profile", INLINE if cached else IO, lambda _: fetch_profile(nickname)),
+        ("rank", CPU, lambda profile: rank_profile(
+            profile, nprobe=nprobe, ef_search=ef_search,
+            co_favorite_weight=co_favorite_weight, row_filter=row_filter
+        ))
+    ]
+    return _job_accepted(job_manager.submit("recommend", stages, {"nickname": nickname}))
+
+@app.route('/jobs/find_common', methods=['POST'])
+def submit_find_common_job():
+    min_common = request.args.get('min_common', type=int)
+    if request.args.get('nicknames') or min_common is not None:
+        if watchlist_service is None:
+            return jsonify({"error": "Erro interno: dataset ou embeddings não carregados."}), 500
+        try:
+            nicknames = _group_nicknames(request.args)
+            limit = _positive_int_arg(request.args, 'limit')
+        except JobError as e:
+            return jsonify({"error": e.message}), e.status_code
+        stages = [("scrape_watchlists", IO, lambda _: common_for_group(nicknames, min_common, limit))]
+        return _job_accepted(job_manager.submit("find_common", stages, {"nicknames": nicknames}))
+
+    nickname1 = request.args.get('nickname1')
+    nickname2 = request.args.get('nickname2')
+    if not nickname1 or not nickname2:
+        return jsonify({"error": "Os dois nicknames são obrigatórios."}), 400
+    if watchlist_service is None:
+        return jsonify({"error": "Erro interno: dataset ou embeddings não carregados."}), 500
+
+    stages = [("scrape_watchlists", IO, lambda _: common_titles(nickname1, nickname2))]
+    return _job_accepted(job_manager.submit("find_common", stages, {"nicknames": [nickname1, nickname2]}))
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job não encontrado."}), 404
+    return jsonify(job.snapshot())
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job não encontrado."}), 404
+
+    def stream():
+        for snapshot in job.iter_snapshots():
+            if snapshot is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"data: {json.dumps(snapshot, ensure_ascii=False, default=str)}\n\n"
+
+    return Response(stream(), mimetype='text/event-stream')
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000) 
\ No newline at end of file
@@ -0,0 +1,315 @@
+import os
+import sys
+import json
+import time
+import zlib
+import platform
+import argparse
+import subprocess
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.recommender.index import RecommenderIndex
+from src.recommender.mmr import mmr_rerank, mmr_rerank_batch
+from src.recommender.ann_eval import sample_profile_queries
+from src.utils.catalog_index import CatalogIndex
+from src.matching.fuzzy_matcher import TitleMatcher
+
+DIM = 384
+GENRES = ["Action", "Comedy", "Drama", "Horror", "Romance", "Sci-Fi", "Thriller", "Animation", "Documentary"]
+LANGUAGES = ["English", "Portuguese", "Spanish", "French", "Japanese", "Korean", "German", "Italian"]
+WORDS = [
+    "night", "city", "love", "dark", "river", "last", "house", "war", "dream", "blue", "summer", "king",
+    "shadow", "road", "heart", "star", "ghost", "secret", "winter", "fire", "island", "storm", "silent",
+    "golden", "lost", "wild", "broken", "paper", "glass", "iron", "moon", "garden", "empire", "echo"
+]
+
+
+def synthetic_catalog(rows, seed=0):
+    """Catálogo falso com as colunas usadas pelo app (title, genre, release_date, language, rating_imdb)."""
+    rng = np.random.default_rng(seed)
+    words = np.array(WORDS, dtype=object)
+    picks = rng.integers(0, len(words), size=(rows, 3))
+    titles = pd.Series(words[picks[:, 0]] + " " + words[picks[:, 1]] + " " + words[picks[:, 2]]).str.title()
+    return pd.DataFrame({
+        "title": titles + " " + pd.Series(np.arange(rows)).astype(str),
+        "genre": np.array(GENRES, dtype=object)[rng.integers(0, len(GENRES), rows)],
+        "release_date": rng.integers(1920, 2025, rows),
+        "language": np.array(LANGUAGES, dtype=object)[rng.integers(0, len(LANGUAGES), rows)],
+        "rating_imdb": np.round(rng.uniform(1.0, 9.8, rows), 1)
+    })
+
+
+def synthetic_embeddings(rows, dim=DIM, clusters=256, seed=0, chunk_size=100000):
+    """Vetores agrupados em torno de `clusters` centros, para o ANN não ver ruído uniforme."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    embeddings = np.empty((rows, dim), dtype="float32")
+    for start in range(0, rows, chunk_size):
+        end = min(start + chunk_size, rows)
+        assignments = rng.integers(0, clusters, end - start)
+        embeddings[start:end] = centers[assignments] + 0.5 * rng.standard_normal((end - start, dim), dtype="float32")
+    return embeddings
+
+
+class StubModel:
+    """Substitui o SentenceTransformer: vetores determinísticos a partir do crc32 do texto."""
+
+    def __init__(self, dim=DIM):
+        self.dim = dim
+        self.frequencies = np.random.default_rng(0).uniform(0.1, 10.0, dim).astype("float32")
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        seeds = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in texts), dtype=np.float64, count=len(texts))
+        return np.sin(np.outer(seeds / 2 ** 32, self.frequencies) * 1000).astype("float32")
+
+
+@contextmanager
+def stub_embedding_model(dim=DIM):
+    from src.embedding import embedding_generator
+
+    original = embedding_generator.get_model
+    model = StubModel(dim)
+    embedding_generator.get_model = lambda model_name=None: model
+    try:
+        yield model
+    finally:
+        embedding_generator.get_model = original
+
+
+def measure(fn, repeat=3, warmup=1):
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {"min_s": min(timings), "median_s": float(np.median(timings)), "mean_s": float(np.mean(timings))}
+
+
+def misspell(title, rng):
+    chars = list(title)
+    position = int(rng.integers(0, len(chars)))
+    chars[position] = chars[position - 1] if position else chars[position]
+    return "".join(chars)
+
+
+def bench_descriptions(df, repeat):
+    from src.embedding.embedding_generator import generate_description_nova_base
+    return [dict(stage="descriptions", **measure(lambda: generate_description_nova_base(df), repeat))]
+
+
+def bench_embedding(df, repeat, sample=20000, batch_size=256):
+    from src.embedding.embedding_generator import generate_description_nova_base, embed_descriptions
+
+    descriptions = generate_description_nova_base(df.head(sample)).tolist()
+    with stub_embedding_model():
+        timing = measure(lambda: embed_descriptions(descriptions, batch_size=batch_size, show_progress_bar=False), repeat)
+    return [dict(stage="embedding_stub", texts=len(descriptions), **timing)]
+
+
+def bench_indexes(embeddings, index_types, num_queries, k, repeat):
+    results, indexes = [], {}
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = RecommenderIndex(embeddings, normalized=True, index_type=index_type)
+        results.append({"stage": "index_build", "index_type": index_type, "seconds": time.perf_counter() - start})
+        indexes[index_type] = index
+
+        queries = sample_profile_queries(index, num_queries)
+        single = measure(lambda: [index.search(q, k) for q in queries[:100]], repeat)
+        batched = measure(lambda: index.search(queries, k), repeat)
+        results.append(dict(stage="search_single", index_type=index_type, k=k, ms_per_query=1000 * single["median_s"] / min(100, num_queries), **single))
+        results.append(dict(stage="search_batch", index_type=index_type, k=k, ms_per_query=1000 * batched["median_s"] / num_queries, **batched))
+    return results, indexes
+
+
+def bench_mmr(index, pool_sizes, top_ns, repeat, batch=256, seed=0):
+    rng = np.random.default_rng(seed)
+    results = []
+    for pool_size in pool_sizes:
+        rows = rng.integers(0, len(index), size=(batch, pool_size))
+        candidates = index.vectors(rows.ravel()).reshape(batch, pool_size, -1)
+        queries = candidates.mean(axis=1)
+        for top_n in top_ns:
+            single = measure(lambda: mmr_rerank(queries[0], candidates[0], top_n), repeat)
+            batched = measure(lambda: mmr_rerank_batch(queries, candidates, top_n), repeat)
+            results.append(dict(stage="mmr_single", candidate_pool_size=pool_size, top_n=top_n, **single))
+            results.append(dict(stage="mmr_batch", candidate_pool_size=pool_size, top_n=top_n, batch=batch, **batched))
+    return results
+
+
+def bench_matching(df, num_queries, repeat, seed=0):
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    catalog_index = CatalogIndex.from_dataframe(df)
+    matcher = TitleMatcher(catalog_index)
+    build_s = time.perf_counter() - start
+
+    picks = rng.integers(0, len(df), num_queries)
+    exact = [df["title"].iat[i] for i in picks]
+    typos = [misspell(title, rng) for title in exact]
+    results = [{"stage": "matcher_build", "seconds": build_s}]
+    for name, queries in (("exact", exact), ("typo", typos)):
+        timing = measure(lambda: [matcher._match(title, 85) for title in queries], repeat)
+        results.append(dict(stage="fuzzy_match", queries=name, ms_per_query=1000 * timing["median_s"] / num_queries, **timing))
+    return results, catalog_index, matcher
+
+
+def bench_end_to_end(df, embeddings, index, catalog_index, matcher, num_requests, seed=0):
+    """
+    O caminho do `/recommend` sem o servidor: scraper falso, matching dos
+    favoritos, ranking e serialização do resultado, sem cache de recomendações.
+    Chama o recomendador direto, sem importar o app (que carregaria o dataset real).
+    """
+    from src.recommender.recommender import recommend_movies_advanced
+
+    rng = np.random.default_rng(seed)
+    profiles = {}
+    for i in range(num_requests):
+        favorites = [df["title"].iat[row] for row in rng.integers(0, len(df), 4)]
+        profiles[f"user{i}"] = {"nickname": f"user{i}", "avatar_url": None, "favorites": favorites, "stats": {}}
+    scrape_profile = profiles.get
+
+    timings = []
+    for nickname in profiles:
+        start = time.perf_counter()
+        profile = scrape_profile(nickname)
+        fav_rows = matcher.match_rows(profile["favorites"], threshold=85)
+        recommendations = recommend_movies_advanced(
+            fav_matches=None, fav_rows=fav_rows, imdb_df=df, embeddings=embeddings,
+            index=index, catalog_index=catalog_index
+        )
+        json.dumps({"avatar_url": profile["avatar_url"], "recommendations": recommendations.to_dict(orient="records")},
+                   default=str)
+        timings.append(time.perf_counter() - start)
+        if recommendations.empty:
+            raise RuntimeError(f"Nenhuma recomendação para {nickname}.")
+    timings = np.array(timings)
+    return [{
+        "stage": "recommend_end_to_end",
+        "requests": num_requests,
+        "p50_ms": 1000 * float(np.percentile(timings, 50)),
+        "p95_ms": 1000 * float(np.percentile(timings, 95)),
+        "mean_ms": 1000 * float(timings.mean())
+    }]
+
+
+def environment():
+    import faiss
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "faiss": getattr(faiss, "__version__", None),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count()
+    }
+
+
+def run(sizes, dim=DIM, index_types=("flat",), pool_sizes=(50, 100, 200, 500), top_ns=(10, 20, 50),
+        num_queries=1000, num_requests=200, repeat=3, stages=None, seed=0):
+    stages = set(stages or ("descriptions", "embedding", "index", "mmr", "matching", "end_to_end"))
+    results = []
+    for rows in sizes:
+        print(f"Catálogo sintético com {rows} filmes ({dim}-d)...", file=sys.stderr)
+        df = synthetic_catalog(rows, seed)
+        embeddings, flat, sized = None, None, []
+
+        if "descriptions" in stages:
+            sized += bench_descriptions(df, repeat)
+        if "embedding" in stages:
+            sized += bench_embedding(df, repeat)
+
+        if stages & {"index", "mmr", "end_to_end"}:
+            embeddings = synthetic_embeddings(rows, dim, seed=seed)
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+            types = index_types if "index" in stages else ("flat",)
+            index_results, indexes = bench_indexes(embeddings, types, num_queries, 100, repeat)
+            if "index" in stages:
+                sized += index_results
+            flat = indexes.get("flat") or next(iter(indexes.values()))
+            if "mmr" in stages:
+                sized += bench_mmr(flat, pool_sizes, top_ns, repeat, seed=seed)
+
+        if stages & {"matching", "end_to_end"}:
+            matching_results, catalog_index, matcher = bench_matching(df, min(num_queries, 200), repeat, seed)
+            if "matching" in stages:
+                sized += matching_results
+            if "end_to_end" in stages:
+                sized += bench_end_to_end(df, embeddings, flat, catalog_index, matcher, num_requests, seed)
+
+        results += [dict(rows=rows, dim=dim, **result) for result in sized]
+    return {"environment": environment(), "results": results}
+
+
+def _result_key(result):
+    return tuple(sorted((k, v) for k, v in result.items() if isinstance(v, (str, int))))
+
+
+def compare(baseline, current, metric_names=("median_s", "seconds", "p50_ms", "ms_per_query")):
+    """Variação relativa de cada medida em relação a um resultado anterior (positivo = mais lento)."""
+    previous = {_result_key(r): r for r in baseline["results"]}
+    changes = []
+    for result in current["results"]:
+        before = previous.get(_result_key(result))
+        if before is None:
+            continue
+        metric = next((m for m in metric_names if m in result and m in before), None)
+        if metric and before[metric]:
+            changes.append(dict(dict(_result_key(result)), metric=metric, change=result[metric] / before[metric] - 1))
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das etapas do pipeline de recomendação com dados sintéticos.")
+    parser.add_argument("--sizes", default="10000,100000", help="Tamanhos do catálogo (até 5000000).")
+    parser.add_argument("--dim", type=int, default=DIM)
+    parser.add_argument("--index-types", default="flat,hnsw")
+    parser.add_argument("--pool-sizes", default="50,100,200,500")
+    parser.add_argument("--top-n", default="10,20,50")
+    parser.add_argument("--stages", help="Subconjunto de: descriptions,embedding,index,mmr,matching,end_to_end")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="-")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar.")
+    args = parser.parse_args()
+
+    report = run(
+        sizes=[int(v) for v in args.sizes.split(",")],
+        dim=args.dim,
+        index_types=args.index_types.split(","),
+        pool_sizes=[int(v) for v in args.pool_sizes.split(",")],
+        top_ns=[int(v) for v in args.top_n.split(",")],
+        num_queries=args.queries,
+        num_requests=args.requests,
+        repeat=args.repeat,
+        stages=args.stages.split(",") if args.stages else None
+    )
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["comparison"] = compare(json.load(f), report)
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,8 @@ import sys
 
 from src.scraping.letterboxd_scraper import get_favorite_movies
 from src.matching.fuzzy_matcher import match_titles
-from src.embedding.embedding_generator import generate_descriptions, embed_descriptions
+from src.embedding.embedding_generator import generate_descriptions
+from src.embedding.embedding_store import update_embeddings
 from src.recommender.recommender import recommend_movies_with_diversity
 
 DATASET_PATH = '/home/eduardo-monteiro/projetos/letterboxd/TopFourYou/data/world_imdb_movies_preprocessed.csv' # IMPORTANTE: Adapte para o nome do seu arquivo CSV
@@ -67,9 +68,10 @@ def main():
     else:
         print("\n[4/5] Gerando embeddings para o dataset (isso pode levar alguns minutos)...")
         descriptions = generate_descriptions(imdb_df)
-        embeddings = embed_descriptions(descriptions)
+        store = update_embeddings(descriptions, os.path.join(os.path.dirname(EMBEDDINGS_PATH), 'store'))
         print(f"Salvando embeddings em '{EMBEDDINGS_PATH}' para uso futuro.")
-        np.save(EMBEDDINGS_PATH, embeddings)
+        store.export_npy(EMBEDDINGS_PATH)
+        embeddings = np.load(EMBEDDINGS_PATH)
 
     print("\n[5/5] Gerando recomendações com base nos seus favoritos...")
     recommendations = recommend_movies_with_diversity(
@@ -1,12 +1,66 @@
+import atexit
+from functools import lru_cache
+import numpy as np
+import pandas as pd
 from sentence_transformers import SentenceTransformer
 
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+def _text(column):
+    # `map(str)` formata cada valor como o f-string da versão com `apply` (NaN vira "nan");
+    # `astype(str)` no pandas 3 mantém NaN como ausente e a descrição inteira viraria NaN.
+    return column.map(str)
+
 def generate_descriptions(df):
-    return df.apply(lambda row: f"{row['title']} ({row['year']}), directed by {row['director']}, starring {row['star']}. Genre: {row['genre']}. Language: {row['language']}", axis=1)
+    return (
+        _text(df['title']) + " (" + _text(df['year']) + "), directed by " + _text(df['director'])
+        + ", starring " + _text(df['star']) + ". Genre: " + _text(df['genre'])
+        + ". Language: " + _text(df['language'])
+    )
 
 def generate_description_nova_base(df):
-        return df.apply(lambda row: f"{row['title']} ({row['release_date']}), Genre: {row['genre']}. Language: {row['language']}", axis=1)
+    return (
+        _text(df['title']) + " (" + _text(df['release_date']) + "), Genre: " + _text(df['genre'])
+        + ". Language: " + _text(df['language'])
+    )
+
+def iter_description_chunks(csv_path, builder=generate_description_nova_base, chunksize=100000, dropna_subset=None):
+    """
+    Lê o CSV em blocos e gera as descrições de cada bloco, para alimentar o
+    embedder sem manter todas as descrições em memória.
+    """
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        if dropna_subset:
+            chunk = chunk.dropna(subset=dropna_subset)
+        yield builder(chunk)
+
+@lru_cache(maxsize=4)
+def get_model(model_name=DEFAULT_MODEL):
+    return SentenceTransformer(model_name)
+
+_process_pools = {}
+
+def get_process_pool(model_name=DEFAULT_MODEL, processes=2):
+    """
+    Pool de processos do sentence-transformers; cada processo carrega o
+    próprio modelo e o `encode_multi_process` remonta os resultados na ordem.
+    """
+    key = (model_name, processes)
+    if key not in _process_pools:
+        _process_pools[key] = get_model(model_name).start_multi_process_pool(["cpu"] * processes)
+    return _process_pools[key]
 
-def embed_descriptions(descriptions, model_name="all-MiniLM-L6-v2"):
-    model = SentenceTransformer(model_name)
-    return model.encode(descriptions.tolist(), show_progress_bar=True)
+@atexit.register
+def stop_process_pools():
+    for pool in _process_pools.values():
+        SentenceTransformer.stop_multi_process_pool(pool)
+    _process_pools.clear()
 
+def embed_descriptions(descriptions, model_name=DEFAULT_MODEL, batch_size=32, show_progress_bar=True, processes=None):
+    model = get_model(model_name)
+    if processes and processes > 1:
+        pool = get_process_pool(model_name, processes)
+        embeddings = model.encode_multi_process(list(descriptions), pool, batch_size=batch_size)
+    else:
+        embeddings = model.encode(list(descriptions), batch_size=batch_size, show_progress_bar=show_progress_bar)
+    return np.asarray(embeddings, dtype="float32")
@@ -0,0 +1,288 @@
+import os
+import json
+import hashlib
+import argparse
+import numpy as np
+from src.embedding.embedding_generator import DEFAULT_MODEL, embed_descriptions
+from src.embedding.quantization import DTYPES, write_normalized_embeddings
+
+HASH_SIZE = 20
+VECTORS_FILE = "vectors.f32"
+HASHES_FILE = "hashes.bin"
+META_FILE = "meta.json"
+PREVIOUS_SUFFIX = ".prev"
+KEY_BYTES = 8
+
+
+def hash_descriptions(texts):
+    hashes = np.empty((len(texts), HASH_SIZE), dtype=np.uint8)
+    for i, text in enumerate(texts):
+        hashes[i] = np.frombuffer(hashlib.sha1(str(text).encode("utf-8")).digest(), dtype=np.uint8)
+    return hashes
+
+
+def _hash_keys(hashes):
+    return np.ascontiguousarray(hashes[:, :KEY_BYTES]).view("<u8").ravel()
+
+
+class EmbeddingStore:
+    """
+    Armazena os embeddings alinhados às linhas do dataset, junto com o hash do
+    texto que gerou cada linha. Os arquivos crescem conforme necessário e o
+    `meta.json` só é atualizado em `checkpoint()`, depois que vetores e hashes
+    foram gravados; se o processo cair, a próxima execução retoma do último
+    checkpoint.
+
+    Durante uma atualização, a geração anterior fica em arquivos `.prev` só
+    para leitura: um texto que já tinha embedding é reaproveitado pelo hash,
+    em qualquer linha que esteja, então inserir ou remover linhas do dataset
+    não obriga a recodificar tudo o que vem depois.
+    """
+
+    def __init__(self, store_dir, model_name=DEFAULT_MODEL):
+        self.store_dir = store_dir
+        self.model_name = model_name
+        os.makedirs(store_dir, exist_ok=True)
+
+        meta = {}
+        meta_path = os.path.join(store_dir, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+
+        if meta and meta.get("model") != model_name:
+            print(f"Modelo mudou de '{meta.get('model')}' para '{model_name}'; todos os embeddings serão refeitos.")
+            meta = {}
+            self._remove_previous()
+
+        self.dim = meta.get("dim")
+        self.rows = meta.get("rows", 0)
+        self.previous_rows = meta.get("previous_rows")
+        if self.previous_rows is None and self.rows and os.path.exists(self._path(VECTORS_FILE + PREVIOUS_SUFFIX)) \
+                and not os.path.exists(self._path(VECTORS_FILE)):
+            # Caiu entre mover a geração atual para .prev e gravar o meta.
+            self.previous_rows, self.rows = self.rows, 0
+        self._capacity = 0
+        self._vectors = None
+        self._hashes = None
+        self._previous = None
+        self._pending_hashes = {}
+        self._reserve(self.rows, exact=True)
+
+    def _path(self, name):
+        return os.path.join(self.store_dir, name)
+
+    def _reserve(self, rows, exact=False):
+        if self.dim is None or (rows <= self._capacity and not exact):
+            return
+        capacity = rows if exact else max(rows, int(self._capacity * 1.5) + 1024)
+
+        self._vectors = self._hashes = None
+        for name, row_bytes in ((VECTORS_FILE, self.dim * 4), (HASHES_FILE, HASH_SIZE)):
+            with open(self._path(name), "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self._capacity = capacity
+        if capacity:
+            self._vectors = np.memmap(self._path(VECTORS_FILE), dtype="float32", mode="r+", shape=(capacity, self.dim))
+            self._hashes = np.memmap(self._path(HASHES_FILE), dtype=np.uint8, mode="r+", shape=(capacity, HASH_SIZE))
+
+    def _remove_previous(self):
+        for name in (VECTORS_FILE, HASHES_FILE):
+            if os.path.exists(self._path(name + PREVIOUS_SUFFIX)):
+                os.remove(self._path(name + PREVIOUS_SUFFIX))
+
+    def start_update(self):
+        """
+        Move os embeddings atuais para a geração anterior (`.prev`) e recomeça
+        a atual do zero. Se uma atualização anterior caiu no meio, mantém a
+        geração anterior e o que já foi gravado na atual.
+        """
+        if self.previous_rows is None and self.rows:
+            self._vectors = self._hashes = None
+            for name in (VECTORS_FILE, HASHES_FILE):
+                os.replace(self._path(name), self._path(name + PREVIOUS_SUFFIX))
+            self.previous_rows, self.rows, self._capacity = self.rows, 0, 0
+            self._write_meta()
+
+        if self.previous_rows:
+            vectors = np.memmap(self._path(VECTORS_FILE + PREVIOUS_SUFFIX), dtype="float32", mode="r",
+                                shape=(self.previous_rows, self.dim))
+            hashes = np.memmap(self._path(HASHES_FILE + PREVIOUS_SUFFIX), dtype=np.uint8, mode="r",
+                               shape=(self.previous_rows, HASH_SIZE))
+            keys = _hash_keys(hashes)
+            order = np.argsort(keys, kind="stable")
+            self._previous = (vectors, hashes, keys[order], order)
+
+    def find_previous(self, hashes):
+        """Linha da geração anterior com o mesmo texto de cada hash (-1 se não houver)."""
+        if self._previous is None or len(hashes) == 0:
+            return np.full(len(hashes), -1, dtype=np.int64)
+        _, stored, sorted_keys, order = self._previous
+        positions = np.searchsorted(sorted_keys, _hash_keys(hashes)).clip(max=len(sorted_keys) - 1)
+        rows = order[positions]
+        found = (sorted_keys[positions] == _hash_keys(hashes)) & np.all(stored[rows] == hashes, axis=1)
+        return np.where(found, rows, -1)
+
+    def previous_vectors(self, rows):
+        return np.asarray(self._previous[0][rows])
+
+    def stored_hashes(self, start, end):
+        end = min(end, self.rows)
+        if self._hashes is None or start >= end:
+            return np.zeros((0, HASH_SIZE), dtype=np.uint8)
+        return np.asarray(self._hashes[start:end])
+
+    def write(self, rows, vectors, hashes):
+        vectors = np.asarray(vectors, dtype="float32")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Dimensão {vectors.shape[1]} diferente da armazenada ({self.dim}).")
+
+        rows = np.asarray(rows, dtype=np.int64)
+        self._reserve(int(rows.max()) + 1)
+        self._vectors[rows] = vectors
+        for row, digest in zip(rows, hashes):
+            self._pending_hashes[int(row)] = digest
+
+    def checkpoint(self, rows):
+        if self.dim is not None:
+            self._reserve(rows)
+            self._vectors.flush()
+            for row, digest in self._pending_hashes.items():
+                if row < rows:
+                    self._hashes[row] = digest
+            self._hashes.flush()
+        self._pending_hashes.clear()
+        self.rows = rows
+        self._write_meta()
+
+    def _write_meta(self):
+        meta_path = self._path(META_FILE)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "model": self.model_name,
+                "dim": self.dim,
+                "rows": self.rows,
+                "previous_rows": self.previous_rows
+            }, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def finalize(self, rows):
+        self.checkpoint(rows)
+        self._reserve(rows, exact=True)
+        if self.previous_rows is not None:
+            self._previous = None
+            self.previous_rows = None
+            self._write_meta()
+            self._remove_previous()
+
+    def as_array(self):
+        if self.dim is None or self.rows == 0:
+            return np.zeros((0, self.dim or 0), dtype="float32")
+        return np.memmap(self._path(VECTORS_FILE), dtype="float32", mode="r", shape=(self.rows, self.dim))
+
+    def export_npy(self, path, chunk_size=100000, dtype="float32"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        source = self.as_array()
+        if dtype != "float32":
+            write_normalized_embeddings(source, path, dtype, chunk_size)
+            return path
+        target = np.lib.format.open_memmap(path, mode="w+", dtype="float32", shape=source.shape)
+        for start in range(0, source.shape[0], chunk_size):
+            target[start:start + chunk_size] = source[start:start + chunk_size]
+        target.flush()
+        return path
+
+
+def update_embeddings(
+    descriptions,
+    store_dir,
+    model_name=DEFAULT_MODEL,
+    batch_size=256,
+    chunk_size=10000,
+    processes=None
+):
+    """
+    Atualiza o EmbeddingStore com as descrições: só os textos que ainda não
+    têm embedding (pelo hash, em qualquer linha) são codificados. As
+    descrições são lidas em blocos de `chunk_size`, com checkpoint ao fim de
+    cada bloco. Com `processes` > 1, cada bloco é dividido entre processos com
+    um modelo cada.
+    """
+    encode_size = chunk_size if processes and processes > 1 else batch_size
+    store = EmbeddingStore(store_dir, model_name)
+    store.start_update()
+    start = 0
+    encoded = 0
+    chunk = []
+
+    def process(chunk, start):
+        hashes = hash_descriptions(chunk)
+        stored = store.stored_hashes(start, start + len(chunk))
+        changed = np.ones(len(chunk), dtype=bool)
+        changed[:len(stored)] = np.any(stored != hashes[:len(stored)], axis=1)
+
+        positions = np.flatnonzero(changed)
+        previous = store.find_previous(hashes[positions])
+        reused = previous >= 0
+        if reused.any():
+            store.write(positions[reused] + start, store.previous_vectors(previous[reused]), hashes[positions[reused]])
+        positions = positions[~reused]
+
+        for b in range(0, len(positions), encode_size):
+            batch = positions[b:b + encode_size]
+            vectors = embed_descriptions(
+                [chunk[i] for i in batch], model_name=model_name,
+                batch_size=batch_size, show_progress_bar=False, processes=processes
+            )
+            store.write(batch + start, vectors, hashes[batch])
+        store.checkpoint(max(store.rows, start + len(chunk)))
+        return len(positions)
+
+    for text in descriptions:
+        chunk.append(text)
+        if len(chunk) >= chunk_size:
+            encoded += process(chunk, start)
+            start += len(chunk)
+            chunk = []
+            print(f"{start} descrições processadas ({encoded} codificadas).")
+    if chunk:
+        encoded += process(chunk, start)
+        start += len(chunk)
+
+    store.finalize(start)
+    print(f"Embeddings atualizados: {start} linhas, {encoded} codificadas.")
+    return store
+
+
+def main():
+    from itertools import chain
+    from src.embedding.embedding_generator import iter_description_chunks
+    from src.utils.catalog_store import REQUIRED_COLUMNS
+
+    parser = argparse.ArgumentParser(description="Atualiza os embeddings só das linhas novas ou alteradas.")
+    parser.add_argument("--csv", default="./data/pre-processing/base_transformada.csv")
+    parser.add_argument("--store", default="./data/embeddings/store")
+    parser.add_argument("--out", default="./data/embeddings/movie_embeddings.npy")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--processes", type=int, default=None, help="Processos de CPU para codificar em paralelo.")
+    parser.add_argument("--dtype", choices=DTYPES, default="float32", help="Tipo dos embeddings exportados.")
+    args = parser.parse_args()
+
+    descriptions = chain.from_iterable(
+        iter_description_chunks(args.csv, chunksize=args.chunk_size, dropna_subset=REQUIRED_COLUMNS)
+    )
+    store = update_embeddings(
+        descriptions, args.store,
+        model_name=args.model, batch_size=args.batch_size, chunk_size=args.chunk_size,
+        processes=args.processes
+    )
+    store.export_npy(args.out, dtype=args.dtype)
+    print(f"Embeddings exportados para '{args.out}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import os
+import argparse
+import numpy as np
+
+DTYPES = ("float32", "float16", "int8")
+
+
+def scale_path_for(path):
+    return os.path.splitext(path)[0] + ".scale.npy"
+
+
+def int8_scale(max_abs):
+    scale = np.asarray(max_abs, dtype="float32") / 127.0
+    scale[scale == 0] = 1.0
+    return scale
+
+
+def quantize_embeddings(embeddings, dtype="int8", scale=None):
+    """
+    Converte os embeddings para float16 ou int8. No int8 a quantização é
+    simétrica por dimensão e a escala (float32, uma por dimensão) é devolvida
+    junto; para os outros tipos a escala é None.
+    """
+    embeddings = np.asarray(embeddings, dtype="float32")
+    if dtype == "float32":
+        return embeddings, None
+    if dtype == "float16":
+        return embeddings.astype(np.float16), None
+    if dtype != "int8":
+        raise ValueError(f"Tipo de quantização desconhecido: {dtype}")
+
+    if scale is None:
+        scale = int8_scale(np.abs(embeddings).max(axis=0))
+    codes = np.clip(np.rint(embeddings / scale), -127, 127).astype(np.int8)
+    return codes, scale.astype("float32")
+
+
+def dequantize_embeddings(codes, scale=None):
+    codes = np.asarray(codes)
+    if codes.dtype == np.int8:
+        if scale is None:
+            raise ValueError("Embeddings int8 precisam da escala para serem reconstruídos.")
+        return codes.astype("float32") * scale
+    return codes.astype("float32", copy=False)
+
+
+def _normalized_blocks(source, chunk_size):
+    for start in range(0, source.shape[0], chunk_size):
+        block = np.array(source[start:start + chunk_size], dtype="float32")
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        yield start, block / norms
+
+
+def write_normalized_embeddings(source, path, dtype="float32", chunk_size=100000):
+    """
+    Normaliza `source` em blocos e grava num .npy no tipo pedido, sem carregar
+    tudo na memória. Para int8 faz uma primeira passada para achar a escala.
+    Devolve a escala (ou None).
+    """
+    scale = None
+    if dtype == "int8":
+        max_abs = np.zeros(source.shape[1], dtype="float32")
+        for _, block in _normalized_blocks(source, chunk_size):
+            np.maximum(max_abs, np.abs(block).max(axis=0), out=max_abs)
+        scale = int8_scale(max_abs)
+        np.save(scale_path_for(path), scale)
+
+    target = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=source.shape)
+    for start, block in _normalized_blocks(source, chunk_size):
+        target[start:start + len(block)] = quantize_embeddings(block, dtype, scale)[0]
+    target.flush()
+    return scale
+
+
+def load_embeddings(path, mmap_mode=None):
+    """Devolve (embeddings no tipo armazenado, escala ou None)."""
+    codes = np.load(path, mmap_mode=mmap_mode)
+    scale_path = scale_path_for(path)
+    scale = np.load(scale_path) if codes.dtype == np.int8 and os.path.exists(scale_path) else None
+    return codes, scale
+
+
+def compare_quantization(embeddings, dtype, num_queries=1000, k=100, favorites_per_query=4, seed=42):
+    """
+    Mede a perda de qualidade do ranking: para perfis sintéticos (média de
+    `favorites_per_query` filmes aleatórios), compara o top-k da busca exata em
+    float32 com o top-k sobre os embeddings quantizados.
+    """
+    import faiss
+    from src.recommender.index import normalize_embeddings
+
+    exact = normalize_embeddings(embeddings)
+    codes, scale = quantize_embeddings(exact, dtype)
+    approx = dequantize_embeddings(codes, scale)
+
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(exact), size=(num_queries, favorites_per_query))
+    queries = np.ascontiguousarray(exact[picks].mean(axis=1), dtype="float32")
+
+    exact_index = faiss.IndexFlatIP(exact.shape[1])
+    exact_index.add(exact)
+    approx_index = faiss.IndexFlatIP(exact.shape[1])
+    approx_index.add(np.ascontiguousarray(approx))
+
+    exact_scores, exact_ids = exact_index.search(queries, k)
+    _, approx_ids = approx_index.search(queries, k)
+
+    report = {"dtype": dtype, "queries": num_queries, "k": k}
+    for cutoff in sorted({10, k}):
+        hits = [len(set(e[:cutoff]) & set(a[:cutoff])) for e, a in zip(exact_ids, approx_ids)]
+        report[f"recall@{cutoff}"] = float(np.mean(hits) / cutoff)
+
+    approx_scores = np.einsum("qkd,qd->qk", approx[exact_ids], queries)
+    report["mean_abs_score_error"] = float(np.mean(np.abs(approx_scores - exact_scores)))
+    report["bytes_float32"] = int(exact.nbytes)
+    report["bytes_quantized"] = int(codes.nbytes + (scale.nbytes if scale is not None else 0))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantiza os embeddings e compara a qualidade do ranking.")
+    parser.add_argument("--embeddings", default="./data/embeddings/movie_embeddings.npy")
+    parser.add_argument("--dtype", choices=DTYPES[1:], default="int8")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=100)
+    parser.add_argument("--out", help="Se informado, salva os embeddings quantizados neste caminho.")
+    args = parser.parse_args()
+
+    embeddings = np.load(args.embeddings, mmap_mode="r")
+    report = compare_quantization(embeddings, args.dtype, num_queries=args.queries, k=args.k)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+    if args.out:
+        write_normalized_embeddings(embeddings, args.out, args.dtype)
+        print(f"Embeddings quantizados salvos em '{args.out}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
-from rapidfuzz import process
+from functools import lru_cache
+import numpy as np
+from rapidfuzz import process, fuzz
 from tqdm import tqdm
+from src.utils.catalog_index import normalize_title, split_title_year
 
 def match_titles(favorite_titles, imdb_titles, threshold=80, show_scores=False):
     matches = {}
@@ -10,3 +13,180 @@ def match_titles(favorite_titles, imdb_titles, threshold=80, show_scores=False):
         else:
             matches[fav] = None
     return matches
+
+
+def match_titles_bulk(
+    query_titles,
+    imdb_titles,
+    threshold=80,
+    scorer=fuzz.WRatio,
+    processor=None,
+    query_chunk_size=512,
+    choice_chunk_size=32768,
+    workers=-1
+):
+    """
+    Combina milhares de títulos de uma vez com `process.cdist`, usando todos os
+    núcleos. A matriz de scores é calculada em blocos (consultas x catálogo)
+    para limitar a memória. Devolve três arrays NumPy por consulta: título
+    encontrado (None abaixo do threshold), score e linha no catálogo (-1 abaixo
+    do threshold).
+    """
+    queries = list(query_titles)
+    choices = list(imdb_titles)
+
+    best_scores = np.full(len(queries), -1.0, dtype=np.float32)
+    best_rows = np.full(len(queries), -1, dtype=np.int64)
+
+    for q_start in range(0, len(queries), query_chunk_size):
+        q_end = min(q_start + query_chunk_size, len(queries))
+        block = queries[q_start:q_end]
+
+        for c_start in range(0, len(choices), choice_chunk_size):
+            c_end = min(c_start + choice_chunk_size, len(choices))
+            scores = process.cdist(
+                block, choices[c_start:c_end],
+                scorer=scorer, processor=processor, dtype=np.float32, workers=workers
+            )
+            chunk_rows = np.argmax(scores, axis=1)
+            chunk_scores = scores[np.arange(len(block)), chunk_rows]
+
+            improved = chunk_scores > best_scores[q_start:q_end]
+            best_scores[q_start:q_end][improved] = chunk_scores[improved]
+            best_rows[q_start:q_end][improved] = chunk_rows[improved] + c_start
+
+    below = best_scores < threshold
+    best_rows[below] = -1
+    best_scores[best_scores < 0] = 0.0
+
+    matches = np.empty(len(queries), dtype=object)
+    for i, row in enumerate(best_rows):
+        matches[i] = choices[row] if row >= 0 else None
+    return matches, best_scores, best_rows
+
+
+def title_trigrams(normalized):
+    """Trigramas de caracteres do título normalizado, com as bordas marcadas por espaço."""
+    padded = f" {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleMatcher:
+    """
+    Matcher de títulos construído uma vez na inicialização a partir de um
+    CatalogIndex. Compara títulos normalizados, pontua só os candidatos que
+    compartilham trigramas de caracteres pouco frequentes com a busca
+    (blocking; um erro de digitação ainda deixa a maior parte dos trigramas
+    em comum) e guarda os resultados recentes num cache LRU. A varredura do catálogo inteiro quando
+    o blocking não acha nada acima do threshold é opcional
+    (`full_scan_fallback`), já que custa uma comparação por filme.
+    """
+
+    def __init__(
+        self,
+        catalog_index,
+        max_candidates=256,
+        max_posting_fraction=0.01,
+        cache_size=4096,
+        full_scan_fallback=False,
+        scorer=fuzz.WRatio
+    ):
+        self.catalog_index = catalog_index
+        self.choices = catalog_index.normalized_titles
+        self.max_candidates = max_candidates
+        self.full_scan_fallback = full_scan_fallback
+        self.scorer = scorer
+        self._max_posting = max(max_candidates, int(len(self.choices) * max_posting_fraction))
+
+        postings = {}
+        for row, title in enumerate(self.choices):
+            for trigram in title_trigrams(title):
+                postings.setdefault(trigram, []).append(row)
+        self._postings = {trigram: np.array(rows, dtype=np.int32) for trigram, rows in postings.items()}
+
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    def __len__(self):
+        return len(self.choices)
+
+    def _candidates(self, normalized):
+        postings = sorted(
+            (self._postings[trigram] for trigram in title_trigrams(normalized) if trigram in self._postings),
+            key=len
+        )
+        if not postings:
+            return np.empty(0, dtype=np.int64)
+
+        selective = [rows for rows in postings if len(rows) <= self._max_posting] or postings[:1]
+        rows, counts = np.unique(np.concatenate(selective), return_counts=True)
+        if len(rows) > self.max_candidates:
+            best = np.argsort(-counts, kind="stable")[:self.max_candidates]
+            rows = np.sort(rows[best])
+        return rows
+
+    def _match(self, title, threshold=0):
+        """Devolve (título do catálogo, score, linha) ou None."""
+        normalized = normalize_title(title)
+        if not normalized:
+            return None
+
+        row = self.catalog_index.lookup(title)
+        if row is not None and self.choices[row] == normalized:
+            return self.catalog_index.titles[row], 100.0, row
+
+        best = None
+        candidates = self._candidates(normalized)
+        if len(candidates):
+            result = process.extractOne(
+                normalized, [self.choices[i] for i in candidates], scorer=self.scorer, processor=None
+            )
+            if result:
+                best = (result[1], int(candidates[result[2]]))
+
+        if self.full_scan_fallback and (best is None or best[0] < threshold):
+            result = process.extractOne(
+                normalized, self.choices, scorer=self.scorer, processor=None,
+                score_cutoff=best[0] if best else 0
+            )
+            if result and (best is None or result[1] > best[0]):
+                best = (result[1], result[2])
+
+        if best is None:
+            return None
+        score, row = best
+        year = split_title_year(title)[1]
+        if year is not None:
+            # Entre homônimos, fica a linha do ano pedido.
+            same_year = self.catalog_index.lookup(self.choices[row], year)
+            if same_year is not None and self.choices[same_year] == self.choices[row]:
+                row = same_year
+        return self.catalog_index.titles[row], score, row
+
+    def match_titles(self, favorite_titles, threshold=80, show_scores=False):
+        matches = {}
+        for fav in favorite_titles:
+            result = self.match(fav, threshold)
+            if result and result[1] >= threshold:
+                matches[fav] = (result[0], result[1]) if show_scores else result[0]
+            else:
+                matches[fav] = None
+        return matches
+
+    def match_rows(self, favorite_titles, threshold=80):
+        """Como `match_titles`, mas devolve a linha do catálogo de cada favorito (ou None)."""
+        rows = {}
+        for fav in favorite_titles:
+            result = self.match(fav, threshold)
+            rows[fav] = result[2] if result and result[1] >= threshold else None
+        return rows
+
+    def match_bulk(self, titles, threshold=80, **kwargs):
+        """Versão em lote de `match` sobre os títulos normalizados do catálogo."""
+        _, scores, rows = match_titles_bulk(
+            [normalize_title(t) for t in titles], self.choices,
+            threshold=threshold, scorer=self.scorer, processor=None, **kwargs
+        )
+        matches = np.empty(len(rows), dtype=object)
+        for i, row in enumerate(rows):
+            matches[i] = self.catalog_index.titles[row] if row >= 0 else None
+        return matches, scores, rows
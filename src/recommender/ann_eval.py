@@ -0,0 +1,90 @@
+import time
+import json
+import argparse
+import numpy as np
+from src.recommender.index import RecommenderIndex, INDEX_TYPES
+from src.embedding.quantization import load_embeddings
+
+
+def sample_profile_queries(recommender_index, num_queries=1000, favorites_per_query=4, seed=42):
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(recommender_index), size=(num_queries, favorites_per_query))
+    vectors = recommender_index.vectors(picks.ravel()).reshape(num_queries, favorites_per_query, -1)
+    return np.ascontiguousarray(vectors.mean(axis=1), dtype="float32")
+
+
+def recall_at_k(exact_ids, approx_ids, k):
+    hits = [len(set(e[:k]) & set(a[:k])) for e, a in zip(exact_ids, approx_ids)]
+    return float(np.mean(hits) / k)
+
+
+def evaluate_index(recommender_index, queries, exact_ids, k, **search_params):
+    start = time.perf_counter()
+    _, approx_ids = recommender_index.search(queries, k, **search_params)
+    elapsed = time.perf_counter() - start
+    return {
+        f"recall@{k}": recall_at_k(exact_ids, approx_ids, k),
+        "ms_per_query": 1000 * elapsed / len(queries)
+    }
+
+
+def run_recall_harness(embeddings, configs, scale=None, k=100, num_queries=1000):
+    """
+    Compara cada configuração aproximada com o índice exato (flat) sobre os
+    mesmos embeddings e perfis sintéticos. `configs` é uma lista de dicts com
+    `index_type`, parâmetros de construção (nlist, pq_m, hnsw_m...) e a lista de
+    valores de busca a testar em `nprobe` ou `ef_search`.
+    """
+    exact = RecommenderIndex(embeddings, scale=scale)
+    queries = sample_profile_queries(exact, num_queries)
+    exact_ids = exact.search(queries, k)[1]
+    exact_result = evaluate_index(exact, queries, exact_ids, k)
+
+    results = [dict(index_type="flat", build_s=0.0, **exact_result)]
+    for config in configs:
+        config = dict(config)
+        index_type = config.pop("index_type")
+        sweep = {name: config.pop(name) for name in ("nprobe", "ef_search") if name in config}
+
+        start = time.perf_counter()
+        approx = RecommenderIndex(embeddings, scale=scale, index_type=index_type, **config)
+        build_s = time.perf_counter() - start
+
+        name, values = next(iter(sweep.items()), (None, [None]))
+        for value in values:
+            search_params = {name: value} if name else {}
+            result = evaluate_index(approx, queries, exact_ids, k, **search_params)
+            results.append(dict(index_type=index_type, build_s=build_s, **config, **search_params, **result))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede recall@k dos índices aproximados contra o índice exato.")
+    parser.add_argument("--embeddings", default="./data/embeddings/movie_embeddings.npy")
+    parser.add_argument("--types", default="ivf_flat,ivf_pq,hnsw")
+    parser.add_argument("--k", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--nprobe", default="1,4,16,64")
+    parser.add_argument("--ef-search", default="16,64,128,256")
+    args = parser.parse_args()
+
+    embeddings, scale = load_embeddings(args.embeddings, mmap_mode="r")
+    nprobes = [int(v) for v in args.nprobe.split(",")]
+    ef_searches = [int(v) for v in args.ef_search.split(",")]
+
+    configs = []
+    for index_type in args.types.split(","):
+        if index_type not in INDEX_TYPES[1:]:
+            raise ValueError(f"Tipo de índice aproximado desconhecido: {index_type}")
+        if index_type == "hnsw":
+            configs.append({"index_type": index_type, "ef_search": ef_searches})
+        else:
+            configs.append({"index_type": index_type, "nlist": args.nlist, "nprobe": nprobes})
+
+    for result in run_recall_harness(embeddings, configs, scale=scale, k=args.k, num_queries=args.queries):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
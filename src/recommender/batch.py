@@ -0,0 +1,164 @@
+import sys
+import json
+import argparse
+from itertools import islice
+import numpy as np
+from src.recommender.mmr import MAX_BATCH_BYTES, mmr_rerank_batch
+from src.recommender.recommender import user_profile_vector, candidate_pool, recommendations_frame
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _resolve_rows(favorites, catalog_index, title_matcher, threshold):
+    if isinstance(favorites, dict):
+        titles = [match for match in favorites.values() if match is not None]
+    elif title_matcher is not None:
+        return [row for row in title_matcher.match_rows(favorites, threshold=threshold).values() if row is not None]
+    else:
+        titles = list(favorites)
+    rows = [catalog_index.lookup(title) for title in titles]
+    return [row for row in rows if row is not None]
+
+
+def recommend_movies_batch(
+    users,
+    imdb_df,
+    index,
+    catalog_index,
+    title_matcher=None,
+    top_n=10,
+    candidate_pool_size=100,
+    lambda_=0.7,
+    batch_size=1024,
+    threshold=85,
+    nprobe=None,
+    ef_search=None,
+    row_filter=None
+):
+    """
+    Recomendações para muitos usuários. `users` é um iterável de pares
+    (usuário, favoritos), onde favoritos é uma lista de títulos (resolvidos com
+    o `title_matcher`) ou um dict já combinado como o de `match_titles`. Para
+    cada bloco de `batch_size` usuários, os perfis viram uma matriz, a busca no
+    FAISS é feita de uma vez e o MMR roda vetorizado para todos, em pedaços
+    que cabem em MAX_BATCH_BYTES (os vetores dos candidatos de um pedaço são
+    montados só na hora). Gera um dict por usuário, na ordem da entrada, sem
+    acumular os resultados em memória.
+    """
+    for batch in _batched(users, batch_size):
+        results = [None] * len(batch)
+        valid = []
+        for position, (user, favorites) in enumerate(batch):
+            rows = _resolve_rows(favorites, catalog_index, title_matcher, threshold)
+            if rows:
+                valid.append((position, user, rows))
+            else:
+                results[position] = {"user": user, "error": "Nenhum filme favorito foi encontrado no nosso banco de dados."}
+        if valid:
+            _recommend_valid(valid, results, imdb_df, index, top_n, candidate_pool_size, lambda_,
+                             nprobe, ef_search, row_filter)
+        yield from results
+
+
+def _recommend_valid(valid, results, imdb_df, index, top_n, candidate_pool_size, lambda_, nprobe, ef_search, row_filter):
+    no_candidates = "Nenhum candidato encontrado para o perfil do usuário."
+    profiles = np.stack([user_profile_vector(index.vectors(rows)) for _, _, rows in valid]).astype("float32")
+    max_favorites = max(len(rows) for _, _, rows in valid)
+    _, candidate_ids = index.search(
+        profiles, candidate_pool_size + max_favorites, nprobe=nprobe, ef_search=ef_search, row_filter=row_filter
+    )
+
+    pools = [candidate_pool(ids, rows, candidate_pool_size) for ids, (_, _, rows) in zip(candidate_ids, valid)]
+    pool_size = max(len(pool) for pool in pools)
+    if pool_size == 0:
+        for position, user, _ in valid:
+            results[position] = {"user": user, "error": no_candidates}
+        return
+    pool_ids = np.zeros((len(valid), pool_size), dtype=np.int64)
+    valid_mask = np.zeros((len(valid), pool_size), dtype=bool)
+    for b, pool in enumerate(pools):
+        pool_ids[b, :len(pool)] = pool
+        valid_mask[b, :len(pool)] = True
+
+    chunk = max(1, MAX_BATCH_BYTES // max(1, pool_size * profiles.shape[1] * 4))
+    for start in range(0, len(valid), chunk):
+        end = min(start + chunk, len(valid))
+        candidate_vecs = index.vectors(pool_ids[start:end].ravel()).reshape(end - start, pool_size, -1)
+        selected = mmr_rerank_batch(profiles[start:end], candidate_vecs, top_n, lambda_, valid_mask[start:end])
+
+        for b in range(start, end):
+            position, user, _ = valid[b]
+            picks = selected[b - start][selected[b - start] >= 0]
+            if len(picks) == 0:
+                results[position] = {"user": user, "error": no_candidates}
+                continue
+            frame = recommendations_frame(imdb_df, pool_ids[b, picks])
+            results[position] = {"user": user, "recommendations": frame.to_dict(orient="records")}
+
+
+def to_json_lines(results):
+    for result in results:
+        yield json.dumps(result, ensure_ascii=False, default=str) + "\n"
+
+
+def read_users_jsonl(lines):
+    for line in lines:
+        line = line.strip()
+        if line:
+            record = json.loads(line)
+            yield record["user"], record["favorites"]
+
+
+def main():
+    from src.utils.catalog_index import CatalogIndex
+    from src.utils.catalog_store import load_catalog, catalog_index_path, catalog_scale
+    from src.recommender.index import RecommenderIndex
+    from src.matching.fuzzy_matcher import TitleMatcher
+
+    parser = argparse.ArgumentParser(
+        description="Gera recomendações em lote. Entrada e saída em JSON Lines: "
+                    '{"user": ..., "favorites": [títulos]} por linha.'
+    )
+    parser.add_argument("--catalog", default="./data/catalog")
+    parser.add_argument("--input", default="-")
+    parser.add_argument("--output", default="-")
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--candidate-pool-size", type=int, default=100)
+    parser.add_argument("--lambda", dest="lambda_", type=float, default=0.7)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    imdb_df, embeddings, manifest = load_catalog(args.catalog)
+    index = RecommenderIndex.load_or_build(
+        embeddings, catalog_index_path(args.catalog), normalized=True, mmap=True,
+        scale=catalog_scale(args.catalog, manifest), version=manifest["version"]
+    )
+    catalog_index = CatalogIndex.from_dataframe(imdb_df)
+    title_matcher = TitleMatcher(catalog_index)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    target = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        results = recommend_movies_batch(
+            read_users_jsonl(source), imdb_df, index, catalog_index, title_matcher,
+            top_n=args.top_n, candidate_pool_size=args.candidate_pool_size,
+            lambda_=args.lambda_, batch_size=args.batch_size
+        )
+        for line in to_json_lines(results):
+            target.write(line)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import faiss
+from src.utils.catalog_index import normalize_title, extract_years
+
+MULTI_VALUE_SEPARATOR = ","
+
+
+def _pack(mask):
+    return np.packbits(mask, bitorder="little")
+
+
+class RowFilter:
+    """
+    Conjunto de linhas do catálogo permitidas numa busca, guardado como bitmap
+    (1 bit por filme, na ordem de bits que o faiss.IDSelectorBitmap espera).
+    """
+
+    def __init__(self, bitmap, num_rows, key=None):
+        self.bitmap = np.ascontiguousarray(bitmap, dtype=np.uint8)
+        self.num_rows = num_rows
+        self.key = key
+        self.count = int(np.unpackbits(self.bitmap, count=num_rows, bitorder="little").sum())
+        self._rows = None
+        self._selector = None
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def rows(self):
+        if self._rows is None:
+            self._rows = np.flatnonzero(np.unpackbits(self.bitmap, count=self.num_rows, bitorder="little"))
+        return self._rows
+
+    def contains(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        return ((self.bitmap[rows >> 3] >> (rows & 7)) & 1).astype(bool)
+
+    def selector(self):
+        # O seletor aponta para a memória do bitmap, que vive enquanto este objeto viver.
+        if self._selector is None:
+            # O primeiro argumento é o tamanho do bitmap em bytes, não o número de linhas.
+            self._selector = faiss.IDSelectorBitmap(len(self.bitmap), faiss.swig_ptr(self.bitmap))
+        return self._selector
+
+
+class AttributeIndex:
+    """
+    Índices de atributos do catálogo para pré-filtrar a busca: um bitmap por
+    valor de `genre` e `language` (colunas com vários valores separados por
+    vírgula contam em todos eles) e arrays colunares de ano e nota para os
+    filtros por faixa. Os filtros combinados são cacheados por chave.
+    """
+
+    def __init__(self, genres, languages, years, ratings):
+        self.num_rows = len(years)
+        self.years = np.asarray(years, dtype=np.int16)
+        self.ratings = np.asarray(ratings, dtype=np.float32)
+        self.bitmaps = {
+            "genre": self._value_bitmaps(genres),
+            "language": self._value_bitmaps(languages)
+        }
+        self.filter = lru_cache(maxsize=256)(self._filter)
+
+    @classmethod
+    def from_dataframe(cls, df):
+        years = [year or 0 for year in extract_years(df["release_date"])]
+        ratings = pd.to_numeric(df["rating_imdb"], errors="coerce").fillna(-1).to_numpy()
+        return cls(df["genre"], df["language"], years, ratings)
+
+    @staticmethod
+    def _key(value):
+        return normalize_title(value)
+
+    def _value_bitmaps(self, values):
+        exploded = pd.Series(np.asarray(values, dtype=object)).astype(str).str.split(MULTI_VALUE_SEPARATOR).explode()
+        keys = exploded.map(self._key)
+        keys = keys[keys != ""]
+        bitmaps = {}
+        for key, rows in keys.groupby(keys).groups.items():
+            mask = np.zeros(self.num_rows, dtype=bool)
+            mask[np.asarray(rows, dtype=np.int64)] = True
+            bitmaps[key] = _pack(mask)
+        return bitmaps
+
+    def values(self, attribute):
+        return sorted(self.bitmaps[attribute])
+
+    def _any_of(self, attribute, values):
+        bitmap = np.zeros((self.num_rows + 7) // 8, dtype=np.uint8)
+        for value in values:
+            value_bitmap = self.bitmaps[attribute].get(self._key(value))
+            if value_bitmap is not None:
+                np.bitwise_or(bitmap, value_bitmap, out=bitmap)
+        return bitmap
+
+    def build(self, genres=None, languages=None, year_min=None, year_max=None, min_rating=None):
+        """
+        Monta o filtro (AND entre atributos, OR entre os valores de um mesmo
+        atributo). Devolve None quando nenhum filtro foi pedido.
+        """
+        genres = tuple(sorted(self._key(g) for g in genres)) if genres else None
+        languages = tuple(sorted(self._key(l) for l in languages)) if languages else None
+        if genres is None and languages is None and year_min is None and year_max is None and min_rating is None:
+            return None
+        return self.filter(genres, languages, year_min, year_max, min_rating)
+
+    def _filter(self, genres, languages, year_min, year_max, min_rating):
+        bitmap = np.full((self.num_rows + 7) // 8, 0xFF, dtype=np.uint8)
+        if genres:
+            np.bitwise_and(bitmap, self._any_of("genre", genres), out=bitmap)
+        if languages:
+            np.bitwise_and(bitmap, self._any_of("language", languages), out=bitmap)
+
+        if year_min is not None or year_max is not None or min_rating is not None:
+            mask = np.ones(self.num_rows, dtype=bool)
+            if year_min is not None:
+                mask &= self.years >= year_min
+            if year_max is not None:
+                mask &= (self.years <= year_max) & (self.years > 0)
+            if min_rating is not None:
+                mask &= self.ratings >= min_rating
+            np.bitwise_and(bitmap, _pack(mask), out=bitmap)
+
+        if self.num_rows % 8:
+            bitmap[-1] &= (1 << (self.num_rows % 8)) - 1
+        key = (genres, languages, year_min, year_max, min_rating)
+        return RowFilter(bitmap, self.num_rows, key=key)
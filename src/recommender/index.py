@@ -0,0 +1,267 @@
+import os
+import numpy as np
+import faiss
+from src.embedding.quantization import dequantize_embeddings
+
+QUANTIZATION_FACTORY = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+TRAIN_SAMPLE_SIZE = 100000
+EXACT_FILTER_LIMIT = 20000
+# IO_FLAG_MMAP sozinho só mapeia as listas invertidas do IVF; os códigos de
+# índices flat (e do armazenamento do HNSW) precisam do IO_FLAG_MMAP_IFC.
+MMAP_FLAGS = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
+
+
+def index_factory_string(index_type, dim, num_vectors, quantization="float32", nlist=None, pq_m=None, pq_nbits=8, hnsw_m=32):
+    storage = QUANTIZATION_FACTORY[quantization]
+    if index_type == "flat":
+        return storage
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m}" if storage == "Flat" else f"HNSW{hnsw_m},{storage}"
+
+    nlist = nlist or max(1, min(65536, int(4 * np.sqrt(num_vectors))))
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},{storage}"
+    if index_type == "ivf_pq":
+        pq_m = pq_m or next(m for m in (dim // 8, dim // 4, dim // 2, dim) if m and dim % m == 0)
+        return f"IVF{nlist},PQ{pq_m}x{pq_nbits}"
+    raise ValueError(f"Tipo de índice desconhecido: {index_type}. Use um de {INDEX_TYPES}.")
+
+
+def index_path_for(embeddings_path):
+    return os.path.splitext(embeddings_path)[0] + ".faiss"
+
+
+def embeddings_version(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def version_path_for(index_path):
+    return index_path + ".version"
+
+
+def read_index_version(index_path):
+    try:
+        with open(version_path_for(index_path), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def normalize_embeddings(embeddings):
+    vectors = np.array(embeddings, dtype="float32", copy=True, order="C")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+class RecommenderIndex:
+    """
+    Índice FAISS construído uma única vez e compartilhado entre as requisições.
+    Os embeddings são normalizados na construção; as buscas não alteram o índice
+    e podem ser feitas por várias threads ao mesmo tempo.
+
+    Embeddings em float16 ou int8 (com `scale`) são tratados como já
+    normalizados e mantidos no tipo original; o índice correspondente usa um
+    quantizador escalar do FAISS e `vectors()` reconstrói só as linhas pedidas.
+    Com um IndexFlat em float32, `vectors()` lê direto do armazenamento do
+    índice e nenhuma outra cópia dos embeddings fica em memória.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        index=None,
+        normalized=False,
+        scale=None,
+        index_type="flat",
+        build_chunk_size=100000,
+        version=None,
+        **index_params
+    ):
+        embeddings = np.asarray(embeddings)
+        flat_vectors = self._flat_vectors(index) if index is not None else None
+        if embeddings.dtype in (np.float16, np.int8):
+            if embeddings.dtype == np.int8 and scale is None:
+                raise ValueError("Embeddings int8 precisam da escala de quantização.")
+            self.embeddings = embeddings
+        elif flat_vectors is not None:
+            self.embeddings = flat_vectors
+        elif normalized:
+            self.embeddings = np.asarray(embeddings, dtype="float32")
+        else:
+            self.embeddings = normalize_embeddings(embeddings)
+        self.scale = scale
+        self.version = version
+        self.quantization = str(self.embeddings.dtype)
+        self.dim = self.embeddings.shape[1]
+
+        if index is None:
+            factory = index_factory_string(index_type, self.dim, len(self), self.quantization, **index_params)
+            index = self._build_index(factory, build_chunk_size)
+            # A cópia normalizada só servia para construir o índice; daqui em diante os vetores saem dele.
+            flat_vectors = self._flat_vectors(index)
+            if flat_vectors is not None and self.quantization == "float32":
+                self.embeddings = flat_vectors
+        elif index.ntotal != embeddings.shape[0] or index.d != embeddings.shape[1]:
+            raise ValueError(
+                f"Índice FAISS ({index.ntotal}x{index.d}) não corresponde aos embeddings "
+                f"({embeddings.shape[0]}x{embeddings.shape[1]})."
+            )
+        self.index = index
+        self._ivf = faiss.try_extract_index_ivf(index)
+        self._hnsw = isinstance(faiss.downcast_index(index), faiss.IndexHNSW)
+
+    def _build_index(self, factory, chunk_size):
+        index = faiss.index_factory(self.dim, factory, faiss.METRIC_INNER_PRODUCT)
+        if not index.is_trained:
+            ivf = faiss.try_extract_index_ivf(index)
+            sample_size = max(TRAIN_SAMPLE_SIZE, 40 * ivf.nlist) if ivf is not None else TRAIN_SAMPLE_SIZE
+            sample = np.linspace(0, len(self) - 1, num=min(len(self), sample_size), dtype=np.int64)
+            print(f"Treinando índice '{factory}' com {len(sample)} vetores...")
+            index.train(self.vectors(sample))
+        for start in range(0, len(self), chunk_size):
+            index.add(self.vectors(slice(start, start + chunk_size)))
+        return index
+
+    @staticmethod
+    def _flat_vectors(index):
+        """Os vetores de um IndexFlat float32 como array numpy sobre a memória do índice (sem cópia), ou None."""
+        flat = faiss.downcast_index(index)
+        if not isinstance(flat, faiss.IndexFlat) or flat.ntotal == 0:
+            return None
+        return faiss.rev_swig_ptr(flat.get_xb(), flat.ntotal * flat.d).reshape(flat.ntotal, flat.d)
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    def vectors(self, rows):
+        if self.quantization == "float32":
+            return np.ascontiguousarray(self.embeddings[rows])
+        return np.ascontiguousarray(dequantize_embeddings(self.embeddings[rows], self.scale))
+
+    def search_parameters(self, nprobe=None, ef_search=None, selector=None):
+        if self._ivf is not None and (nprobe is not None or selector is not None):
+            params = faiss.SearchParametersIVF()
+            params.nprobe = int(nprobe) if nprobe is not None else self._ivf.nprobe
+        elif self._hnsw and (ef_search is not None or selector is not None):
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = int(ef_search) if ef_search is not None else faiss.downcast_index(self.index).hnsw.efSearch
+        elif selector is not None:
+            params = faiss.SearchParameters()
+        else:
+            return None
+        # O seletor continua vivo no RowFilter que o criou.
+        if selector is not None:
+            params.sel = selector
+        return params
+
+    def _search_rows(self, query_vecs, k, rows):
+        scores = query_vecs @ self.vectors(rows).T
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        return np.take_along_axis(top_scores, order, axis=1), rows[np.take_along_axis(top, order, axis=1)]
+
+    def search(self, query_vecs, k, nprobe=None, ef_search=None, row_filter=None):
+        """
+        Busca os k vizinhos. `nprobe` (IVF) e `ef_search` (HNSW) valem só para
+        esta chamada e não alteram o índice compartilhado.
+
+        `row_filter` (um `RowFilter`) restringe a busca às linhas permitidas:
+        filtros seletivos (até EXACT_FILTER_LIMIT linhas) são resolvidos com
+        busca exata só sobre essas linhas; os demais entram no FAISS como
+        IDSelectorBitmap. IVF e HNSW com seletor podem devolver menos de k
+        resultados (as listas visitadas ou o grafo têm poucas linhas
+        permitidas); nesse caso as consultas que vieram curtas são refeitas
+        com busca exata sobre as linhas do filtro.
+        """
+        query_vecs = np.ascontiguousarray(np.atleast_2d(query_vecs), dtype="float32")
+        if row_filter is not None:
+            if row_filter.count == 0:
+                return (np.full((len(query_vecs), k), -np.inf, dtype="float32"),
+                        np.full((len(query_vecs), k), -1, dtype=np.int64))
+            if row_filter.count <= EXACT_FILTER_LIMIT:
+                return self._search_rows(query_vecs, k, row_filter.rows)
+        selector = row_filter.selector() if row_filter is not None else None
+        params = self.search_parameters(nprobe, ef_search, selector)
+        scores, ids = self.index.search(query_vecs, min(k, len(self)), params=params)
+        if row_filter is not None and (self._ivf is not None or self._hnsw):
+            short = (ids >= 0).sum(axis=1) < min(k, row_filter.count)
+            if short.any():
+                exact_scores, exact_ids = self._search_rows(query_vecs[short], k, row_filter.rows)
+                scores[short], ids[short] = -np.inf, -1
+                scores[short, :exact_ids.shape[1]] = exact_scores
+                ids[short, :exact_ids.shape[1]] = exact_ids
+        return scores, ids
+
+    def save(self, path):
+        """Grava o índice e, ao lado dele, a versão dos embeddings usados na construção."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        faiss.write_index(self.index, path)
+        version_path = version_path_for(path)
+        if self.version is not None:
+            with open(version_path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(str(self.version))
+            os.replace(version_path + ".tmp", version_path)
+        elif os.path.exists(version_path):
+            os.remove(version_path)
+
+    @classmethod
+    def load(cls, path, embeddings, normalized=False, mmap=False, scale=None, version=None):
+        flags = MMAP_FLAGS if mmap else 0
+        return cls(embeddings, index=faiss.read_index(path, flags), normalized=normalized, scale=scale, version=version)
+
+    @classmethod
+    def load_or_build(cls, embeddings, path, normalized=False, mmap=False, scale=None, version=None):
+        """
+        Abre o índice salvo em `path` ou constrói um novo. Com `version`, o
+        índice salvo só é usado se foi construído com os mesmos embeddings:
+        mesmo formato não basta, já que embeddings reexportados mantêm o shape.
+        """
+        stored_version = read_index_version(path)
+        if os.path.exists(path) and version is not None and stored_version != version:
+            print(f"Índice FAISS em '{path}' é de outros embeddings ({stored_version}); reconstruindo.")
+        elif os.path.exists(path):
+            try:
+                print(f"Carregando índice FAISS de '{path}'...")
+                return cls.load(path, embeddings, normalized=normalized, mmap=mmap, scale=scale, version=version)
+            except Exception as e:
+                print(f"Índice FAISS inválido, reconstruindo: {e}")
+
+        print("Construindo índice FAISS...")
+        recommender_index = cls(embeddings, normalized=normalized, scale=scale, version=version)
+        try:
+            recommender_index.save(path)
+        except Exception as e:
+            print(f"Não foi possível salvar o índice FAISS em '{path}': {e}")
+        return recommender_index
+
+
+def main():
+    import argparse
+    from src.embedding.quantization import load_embeddings
+
+    parser = argparse.ArgumentParser(description="Treina e serializa o índice FAISS do recomendador.")
+    parser.add_argument("--embeddings", default="./data/embeddings/movie_embeddings.npy")
+    parser.add_argument("--out", help="Caminho do índice (padrão: ao lado dos embeddings).")
+    parser.add_argument("--type", choices=INDEX_TYPES, default="flat")
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--pq-m", type=int)
+    parser.add_argument("--pq-nbits", type=int, default=8)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    args = parser.parse_args()
+
+    embeddings, scale = load_embeddings(args.embeddings, mmap_mode="r")
+    recommender_index = RecommenderIndex(
+        embeddings, scale=scale, index_type=args.type, version=embeddings_version(args.embeddings),
+        nlist=args.nlist, pq_m=args.pq_m, pq_nbits=args.pq_nbits, hnsw_m=args.hnsw_m
+    )
+    out = args.out or index_path_for(args.embeddings)
+    recommender_index.save(out)
+    print(f"Índice '{args.type}' com {len(recommender_index)} vetores salvo em '{out}'.")
+
+
+if __name__ == "__main__":
+    main()
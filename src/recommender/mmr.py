@@ -0,0 +1,92 @@
+import numpy as np
+
+MAX_BATCH_BYTES = 256 * 1024 * 1024
+
+
+def _normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype="float32")
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def mmr_rerank(query_vec, candidate_vecs, top_n, lambda_=0.7, boost=None):
+    """
+    Reordena os candidatos por Maximal Marginal Relevance e devolve as posições
+    escolhidas (em ordem de seleção) dentro de `candidate_vecs`. `boost`, se
+    dado, é somado à relevância de cada candidato.
+    """
+    query_vec = np.asarray(query_vec, dtype="float32").reshape(1, -1)
+    candidate_vecs = np.asarray(candidate_vecs, dtype="float32")
+    if boost is not None:
+        boost = np.asarray(boost, dtype="float32")[np.newaxis]
+    selected = mmr_rerank_batch(query_vec, candidate_vecs[np.newaxis], top_n, lambda_, boost=boost)[0]
+    return selected[selected >= 0]
+
+
+def mmr_rerank_batch(query_vecs, candidate_vecs, top_n, lambda_=0.7, valid_mask=None, boost=None):
+    """
+    MMR vetorizado para vários perfis de uma vez.
+
+    query_vecs: (B, d); candidate_vecs: (B, P, d); valid_mask: (B, P) opcional,
+    para pools de tamanhos diferentes; boost: (B, P) opcional, somado à
+    relevância (ex.: sinal colaborativo). Devolve uma matriz (B, top_n) com as
+    posições selecionadas em cada pool, preenchida com -1 quando faltam candidatos.
+    """
+    query_vecs = np.asarray(query_vecs, dtype="float32")
+    candidate_vecs = np.asarray(candidate_vecs, dtype="float32")
+    batch_size, pool_size, dim = candidate_vecs.shape
+
+    if valid_mask is None:
+        valid_mask = np.ones((batch_size, pool_size), dtype=bool)
+
+    selected = np.full((batch_size, top_n), -1, dtype=np.int64)
+    if batch_size == 0 or pool_size == 0 or top_n <= 0:
+        return selected
+
+    chunk = max(1, MAX_BATCH_BYTES // max(1, pool_size * dim * 4))
+    for start in range(0, batch_size, chunk):
+        end = min(start + chunk, batch_size)
+        selected[start:end] = _mmr_chunk(
+            query_vecs[start:end], candidate_vecs[start:end], valid_mask[start:end], top_n, lambda_,
+            None if boost is None else boost[start:end]
+        )
+    return selected
+
+
+def _mmr_chunk(query_vecs, candidate_vecs, valid_mask, top_n, lambda_, boost=None):
+    batch_size, pool_size, _ = candidate_vecs.shape
+    rows = np.arange(batch_size)
+
+    queries = _normalize_rows(query_vecs)
+    candidates = _normalize_rows(candidate_vecs)
+
+    relevance = np.einsum("bpd,bd->bp", candidates, queries)
+    if boost is not None:
+        relevance = relevance + boost
+    available = valid_mask.copy()
+    max_similarity = np.full((batch_size, pool_size), -np.inf, dtype="float32")
+    selected = np.full((batch_size, top_n), -1, dtype=np.int64)
+
+    # A primeira escolha é puramente por relevância; as seguintes penalizam a
+    # maior similaridade com os já escolhidos, atualizada só com a linha da
+    # matriz pool x pool do último item selecionado.
+    scores = relevance
+    for step in range(min(top_n, pool_size)):
+        scores = np.where(available, scores, -np.inf)
+        best = np.argmax(scores, axis=1)
+        has_candidate = available[rows, best]
+        if not has_candidate.any():
+            break
+
+        selected[has_candidate, step] = best[has_candidate]
+        available[rows[has_candidate], best[has_candidate]] = False
+
+        chosen_vecs = candidates[rows, best]
+        similarity = np.einsum("bpd,bd->bp", candidates, chosen_vecs)
+        similarity[~has_candidate] = -np.inf
+        np.maximum(max_similarity, similarity, out=max_similarity)
+
+        scores = lambda_ * relevance - (1 - lambda_) * max_similarity
+
+    return selected
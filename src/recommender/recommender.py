@@ -1,7 +1,27 @@
 import numpy as np
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
-import faiss
+from src.recommender.index import RecommenderIndex
+from src.recommender.mmr import mmr_rerank
+from src.utils.catalog_index import CatalogIndex
+from src.utils.metrics import timed
+
+RECOMMENDATION_COLUMNS = ['title', 'genre', 'release_date', 'language', 'rating_imdb']
+
+def user_profile_vector(fav_vecs, weights=None):
+    if weights is not None:
+        weights = np.asarray(weights, dtype="float32").reshape(-1, 1)
+        return np.sum(fav_vecs * weights, axis=0) / np.sum(weights)
+    return np.mean(fav_vecs, axis=0)
+
+def candidate_pool(candidate_ids, exclude, size):
+    exclude = set(exclude)
+    pool = [idx for idx in candidate_ids if idx >= 0 and idx not in exclude]
+    return np.array(pool[:size], dtype=np.int64)
+
+def recommendations_frame(imdb_df, rows):
+    return imdb_df.iloc[rows][RECOMMENDATION_COLUMNS]\
+             .sort_values(by='rating_imdb', ascending=False)\
+             .reset_index(drop=True)
 
 def recommend_movies_advanced(
     fav_matches,
@@ -10,64 +30,92 @@ def recommend_movies_advanced(
     ratings=None,
     top_n=10,
     candidate_pool_size=100,
-    lambda_=0.7
+    lambda_=0.7,
+    index=None,
+    catalog_index=None,
+    nprobe=None,
+    ef_search=None,
+    cache=None,
+    user_index=None,
+    nickname=None,
+    co_favorite_weight=0.0,
+    co_favorite_neighbors=50,
+    row_filter=None,
+    fav_rows=None
 ):
-    try:
-        indices = [imdb_df[imdb_df['title'] == match].index[0] for match in fav_matches.values()]
-    except IndexError:
-        print("Erro: Não foi possível encontrar os índices para um ou mais filmes favoritos.")
-        return pd.DataFrame()
+    """
+    `fav_matches` é o dict favorito -> título do catálogo de `match_titles`.
+    Quando o matcher já devolveu as linhas (`fav_rows`, favorito -> linha),
+    elas são usadas direto, sem procurar o título de novo no catálogo.
 
-    fav_vecs = embeddings[indices]
+    `user_index` só é lido (vizinhos para `co_favorite_weight`, excluindo o
+    próprio `nickname`); gravar o perfil do usuário fica a cargo de quem chama.
+    """
+    if index is None:
+        index = RecommenderIndex(embeddings)
+    if catalog_index is None:
+        catalog_index = CatalogIndex.from_dataframe(imdb_df)
 
-    if ratings:
-        weights = np.array([ratings.get(title, 1.0) for title in fav_matches.values()]).reshape(-1, 1)
-        mean_vector = np.sum(fav_vecs * weights, axis=0) / np.sum(weights)
+    if fav_rows is not None:
+        indices = [int(row) for row in fav_rows.values() if row is not None]
+        matched = [catalog_index.titles[row] for row in indices]
     else:
-        mean_vector = np.mean(fav_vecs, axis=0)
-
-    user_profile_vec = mean_vector.reshape(1, -1)
-
-    faiss.normalize_L2(embeddings)
-    d = embeddings.shape[1]
-    index = faiss.IndexFlatIP(d)
-    index.add(embeddings)
+        matched = [match for match in fav_matches.values() if match is not None]
+        indices = [catalog_index.lookup(match) for match in matched]
+    if not indices or any(idx is None for idx in indices):
+        print("Erro: Não foi possível encontrar os índices para um ou mais filmes favoritos.")
+        return pd.DataFrame()
 
-    k = candidate_pool_size + len(indices)
-    distances, candidate_indices = index.search(user_profile_vec, k)
+    weights = [ratings.get(title, 1.0) for title in matched] if ratings else None
+    user_profile_vec = user_profile_vector(index.vectors(indices), weights).reshape(1, -1)
 
-    candidate_indices = [idx for idx in candidate_indices[0] if idx not in indices]
-    candidate_indices = candidate_indices[:candidate_pool_size]
+    def rank():
+        k = candidate_pool_size + len(indices)
+        with timed("faiss_search"):
+            distances, candidate_indices = index.search(
+                user_profile_vec, k, nprobe=nprobe, ef_search=ef_search, row_filter=row_filter
+            )
 
-    candidate_embeddings = embeddings[candidate_indices]
-    relevance_scores = cosine_similarity(user_profile_vec, candidate_embeddings)[0]
-    candidate_relevance = {idx: score for idx, score in zip(candidate_indices, relevance_scores)}
+        candidate_indices = candidate_pool(candidate_indices[0], indices, candidate_pool_size)
 
-    recommendations_indices = [candidate_indices[np.argmax(relevance_scores)]]
-    candidate_indices.pop(np.argmax(relevance_scores))
+        boost = None
+        if user_index is not None and co_favorite_weight > 0:
+            with timed("co_favorites"):
+                co_rows, co_scores = user_index.co_favorite_scores(
+                    user_profile_vec, k=co_favorite_neighbors, exclude=nickname
+                )
+            if len(co_rows):
+                # Favoritos dos vizinhos que a busca por conteúdo não trouxe
+                # também entram no pool.
+                extra = co_rows[~np.isin(co_rows, candidate_indices) & ~np.isin(co_rows, indices)]
+                if row_filter is not None:
+                    extra = extra[row_filter.contains(extra)]
+                candidate_indices = np.concatenate([candidate_indices, extra])
+                positions = np.searchsorted(co_rows, candidate_indices).clip(max=len(co_rows) - 1)
+                found = co_rows[positions] == candidate_indices
+                boost = co_favorite_weight * np.where(found, co_scores[positions], 0.0)
 
-    while len(recommendations_indices) < top_n and candidate_indices:
-        mmr_scores = []
-        recommended_vecs = embeddings[recommendations_indices]
+        if len(candidate_indices) == 0:
+            print("Erro: Nenhum candidato encontrado para o perfil do usuário.")
+            return pd.DataFrame()
 
-        for candidate_idx in candidate_indices:
-            candidate_vec = embeddings[candidate_idx].reshape(1, -1)
-            relevance = candidate_relevance[candidate_idx]
-            similarity_with_selected = cosine_similarity(candidate_vec, recommended_vecs)
-            max_similarity = np.max(similarity_with_selected)
-            mmr_score = lambda_ * relevance - (1 - lambda_) * max_similarity
-            mmr_scores.append((mmr_score, candidate_idx))
+        with timed("mmr_rerank"):
+            selected = mmr_rerank(user_profile_vec[0], index.vectors(candidate_indices), top_n, lambda_, boost=boost)
+        recommendations_indices = candidate_indices[selected]
 
-        if not mmr_scores:
-            break
+        return recommendations_frame(imdb_df, recommendations_indices)
 
-        best_candidate_idx = max(mmr_scores, key=lambda x: x[0])[1]
-        recommendations_indices.append(best_candidate_idx)
-        candidate_indices.remove(best_candidate_idx)
+    # O sinal colaborativo muda a cada perfil novo no índice de usuários, então
+    # essas recomendações não passam pelo cache.
+    if cache is None or (user_index is not None and co_favorite_weight > 0):
+        return rank()
 
-    return imdb_df.iloc[recommendations_indices][['title', 'genre', 'release_date', 'language', 'rating_imdb']]\
-             .sort_values(by='rating_imdb', ascending=False)\
-             .reset_index(drop=True)
+    key = cache.key(
+        indices, weights, top_n=top_n, candidate_pool_size=candidate_pool_size,
+        lambda_=lambda_, nprobe=nprobe, ef_search=ef_search,
+        filters=row_filter.key if row_filter is not None else None
+    )
+    return cache.get_or_compute(index.version, key, rank)
 
 if __name__ == '__main__':
     num_movies = 1000
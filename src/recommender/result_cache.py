@@ -0,0 +1,33 @@
+import os
+from src.utils.cache import TTLCache
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("TOPFOURYOU_RECOMMENDATION_CACHE_SIZE", 4096))
+DEFAULT_TTL = float(os.environ.get("TOPFOURYOU_RECOMMENDATION_CACHE_TTL", 6 * 60 * 60))
+
+
+class RecommendationCache:
+    """
+    Cache de recomendações prontas, indexado pelo conjunto ordenado de linhas
+    favoritas (com seus pesos), pelos parâmetros do ranking e pela versão do
+    índice. Entradas de uma versão antiga nunca mais são lidas e saem pelo
+    LRU ou pelo TTL.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    @staticmethod
+    def key(rows, weights=None, **params):
+        weights = weights if weights is not None else [1.0] * len(rows)
+        favorites = tuple(sorted((int(row), float(weight)) for row, weight in zip(rows, weights)))
+        return favorites, tuple(sorted(params.items()))
+
+    def get_or_compute(self, version, key, compute):
+        result = self._cache.get_or_compute((version, key), compute, should_cache=lambda frame: not frame.empty)
+        return result.copy()
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
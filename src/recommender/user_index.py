@@ -0,0 +1,511 @@
+import os
+import glob
+import json
+import queue
+import atexit
+import base64
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+import faiss
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SNAPSHOT_FILE = "users.npz"
+LOG_PATTERN = "log-*.jsonl"
+LOCK_FILE = ".lock"
+DEFAULT_NEIGHBORS = 50
+DEFAULT_HNSW_M = 32
+DEFAULT_EF_SEARCH = 128
+DEFAULT_COMPACT_EVERY = 4096
+
+
+@contextmanager
+def _file_lock(path):
+    """Lock exclusivo entre processos (flock) para compactar o diretório do índice."""
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, LOCK_FILE), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class _LogWriter:
+    """
+    Thread única do processo que grava as atualizações de perfil no log do
+    worker (`log-<pid>.jsonl`), fora da thread da requisição e sem o lock do
+    índice.
+    """
+
+    def __init__(self, path):
+        self.pid = os.getpid()
+        self.path = os.path.join(path, f"log-{self.pid}.jsonl")
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="user-index-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        self._queue.put(record)
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    f.flush()
+                    return
+                try:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    if self._queue.empty():
+                        f.flush()
+                except OSError as e:
+                    print(f"Erro ao gravar o log do índice de usuários: {e}")
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+class _Generation:
+    """
+    Estado que as buscas leem sem lock: o HNSW da última compactação (ids =
+    id do usuário), os usuários cujo vetor nele ficou velho (tombstones) e o
+    buffer com os vetores gravados desde então. Só `upsert` e `compact`
+    trocam a geração, sempre por uma nova; o buffer só é escrito depois de
+    `size`, então as linhas que uma geração enxerga nunca mudam.
+    """
+
+    __slots__ = ("index", "dead", "vectors", "owners", "size", "dead_rows", "_selectors")
+
+    def __init__(self, index, dead, vectors, owners, size, dead_rows):
+        self.index = index
+        self.dead = dead
+        self.vectors = vectors
+        self.owners = owners
+        self.size = size
+        self.dead_rows = dead_rows
+        self._selectors = None
+
+    def selector(self):
+        """IDSelector que pula os tombstones; os dois seletores vivem enquanto a geração viver."""
+        if not len(self.dead):
+            return None
+        if self._selectors is None:
+            dead = faiss.IDSelectorBatch(len(self.dead), faiss.swig_ptr(self.dead))
+            self._selectors = (dead, faiss.IDSelectorNot(dead))
+        return self._selectors[1]
+
+
+class UserIndex:
+    """
+    Índice dos perfis dos usuários (a média dos embeddings dos quatro
+    favoritos) para consultas "usuários com top 4 parecido". Os vetores ficam
+    num HNSW (IndexHNSWFlat dentro de um IndexIDMap2, ids estáveis por
+    nickname) e os favoritos formam uma matriz esparsa usuário x filme (uma
+    linha por usuário, guardada como array de linhas do catálogo).
+
+    O HNSW não muda depois de construído: `upsert` grava o vetor novo num
+    buffer e marca o antigo como tombstone, e as buscas juntam o HNSW (sem os
+    tombstones) com uma varredura exata do buffer. Quando o buffer passa de
+    `compact_every` linhas, uma thread reconstrói o HNSW e troca a geração.
+    O lock só protege as mutações; as buscas leem a geração atual sem ele.
+
+    Persistência: cada processo anexa suas atualizações a um log próprio
+    (`log-<pid>.jsonl`) por uma thread de escrita; um snapshot num arquivo só
+    (`users.npz`, trocado atomicamente) junta o snapshot anterior e todos os
+    logs, aplicando a atualização mais recente de cada nickname. Essa
+    compactação roda sob um flock ao abrir o índice e ao encerrar o processo,
+    então vários workers do Gunicorn não sobrescrevem o trabalho uns dos
+    outros. Cada worker só vê, em memória, os perfis do disco na hora em que
+    abriu e os que ele mesmo gravou.
+    """
+
+    def __init__(
+        self, dim, num_movies, version=None, path=None,
+        hnsw_m=DEFAULT_HNSW_M, ef_search=DEFAULT_EF_SEARCH, compact_every=DEFAULT_COMPACT_EVERY
+    ):
+        self.dim = dim
+        self.num_movies = num_movies
+        self.version = version
+        self.path = path
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.compact_every = compact_every
+        self.nicknames = []
+        self.ids = {}
+        self.favorites = {}
+        self.updated_at = {}
+        self._delta_rows = {}
+        self._generation = self._new_generation(self._build_index(*self._empty_vectors()), *self._empty_vectors())
+        self._writer = None
+        self._compacting = False
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.nicknames)
+
+    @staticmethod
+    def _key(nickname):
+        return str(nickname).strip().lower()
+
+    def __contains__(self, nickname):
+        return self._key(nickname) in self.ids
+
+    def _empty_vectors(self):
+        return np.empty(0, dtype=np.int64), np.empty((0, self.dim), dtype="float32")
+
+    @staticmethod
+    def _new_generation(index, owners, vectors, dead=None):
+        dead = np.unique(owners) if dead is None else dead
+        return _Generation(index, dead, vectors, owners, len(owners), np.empty(0, dtype=np.int64))
+
+    def _build_index(self, ids, vectors):
+        index = faiss.IndexIDMap2(faiss.IndexHNSWFlat(self.dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT))
+        if len(ids):
+            index.add_with_ids(np.ascontiguousarray(vectors, dtype="float32"), np.asarray(ids, dtype=np.int64))
+        return index
+
+    def upsert(self, nickname, profile_vec, favorite_rows):
+        """Grava ou atualiza o perfil; devolve True se algo mudou."""
+        key = self._key(nickname)
+        rows = np.unique(np.asarray(favorite_rows, dtype=np.int64))
+        vector = np.ascontiguousarray(np.asarray(profile_vec, dtype="float32").reshape(1, -1))
+        faiss.normalize_L2(vector)
+        updated_at = time.time()
+
+        with self._lock:
+            if not self._apply(key, vector, rows, updated_at):
+                return False
+            compact = self._generation.size >= self.compact_every and not self._compacting
+            if compact:
+                self._compacting = True
+        if compact:
+            threading.Thread(target=self._compact_in_background, name="user-index-compaction", daemon=True).start()
+        if self.path:
+            self._log({
+                "version": self.version,
+                "nickname": key,
+                "vector": base64.b64encode(vector.tobytes()).decode("ascii"),
+                "rows": rows.tolist(),
+                "updated_at": updated_at
+            })
+        return True
+
+    def _apply(self, key, vector, rows, updated_at):
+        user_id = self.ids.get(key)
+        if user_id is not None and (
+            self.updated_at.get(user_id, 0) > updated_at or np.array_equal(self.favorites.get(user_id), rows)
+        ):
+            return False
+
+        generation = self._generation
+        dead, dead_rows = generation.dead, generation.dead_rows
+        if user_id is None:
+            user_id = self.ids[key] = len(self.nicknames)
+            self.nicknames.append(key)
+        elif user_id in self._delta_rows:
+            dead_rows = np.append(dead_rows, self._delta_rows[user_id])
+        else:
+            dead = np.append(dead, user_id)
+
+        vectors, owners, size = generation.vectors, generation.owners, generation.size
+        if size == len(owners):
+            # Buffer novo e maior; as gerações antigas continuam com o delas.
+            capacity = max(64, 2 * size)
+            vectors, owners = np.empty((capacity, self.dim), dtype="float32"), np.empty(capacity, dtype=np.int64)
+            vectors[:size], owners[:size] = generation.vectors[:size], generation.owners[:size]
+        vectors[size] = vector[0]
+        owners[size] = user_id
+        self._delta_rows[user_id] = size
+        self._generation = _Generation(generation.index, dead, vectors, owners, size + 1, dead_rows)
+        self.favorites[user_id] = rows
+        self.updated_at[user_id] = updated_at
+        return True
+
+    @staticmethod
+    def _live_vectors(generation):
+        """(ids, vetores) com o vetor atual de cada usuário na geração."""
+        index = generation.index
+        ids, vectors = np.empty(0, dtype=np.int64), np.empty((0, index.d), dtype="float32")
+        if index.ntotal:
+            ids = faiss.vector_to_array(index.id_map).astype(np.int64)
+            vectors = index.index.reconstruct_n(0, index.ntotal)
+            keep = ~np.isin(ids, generation.dead)
+            ids, vectors = ids[keep], vectors[keep]
+        rows = np.setdiff1d(np.arange(generation.size), generation.dead_rows)
+        return np.concatenate([ids, generation.owners[rows]]), np.concatenate([vectors, generation.vectors[rows]])
+
+    def compact(self):
+        """
+        Reconstrói o HNSW com o vetor atual de cada usuário, fora do lock. O
+        que chegar durante a construção vai para o buffer da geração nova, com
+        o vetor velho desses usuários marcado como tombstone.
+        """
+        with self._compact_lock:
+            with self._lock:
+                base = self._generation
+            index = self._build_index(*self._live_vectors(base))
+            with self._lock:
+                current = self._generation
+                pending = slice(base.size, current.size)
+                owners = current.owners[pending].copy()
+                vectors = current.vectors[pending].copy()
+                generation = self._new_generation(index, owners, vectors)
+                generation.dead_rows = current.dead_rows[current.dead_rows >= base.size] - base.size
+                self._delta_rows = {
+                    user_id: row - base.size for user_id, row in self._delta_rows.items() if row >= base.size
+                }
+                self._generation = generation
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"Erro ao compactar o índice de usuários: {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _log(self, record):
+        # O writer nasce no processo que grava: com `--preload`, a thread do master não existe no worker.
+        writer = self._writer
+        if writer is None or writer.pid != os.getpid():
+            with self._lock:
+                if self._writer is None or self._writer.pid != os.getpid():
+                    self._writer = _LogWriter(self.path)
+                writer = self._writer
+        writer.write(record)
+
+    def profile(self, nickname):
+        user_id = self.ids.get(self._key(nickname))
+        if user_id is None:
+            return None
+        with self._lock:
+            generation, row = self._generation, self._delta_rows.get(user_id)
+        if row is not None:
+            return generation.vectors[row].copy()
+        return generation.index.reconstruct(int(user_id))
+
+    def _neighbors(self, profile_vec, k, exclude=None):
+        generation = self._generation
+        query = np.ascontiguousarray(np.asarray(profile_vec, dtype="float32").reshape(1, -1))
+        faiss.normalize_L2(query)
+        exclude_id = self.ids.get(self._key(exclude)) if exclude is not None else None
+        fetch = k + (exclude_id is not None)
+
+        ids, scores = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype="float32")]
+        index = generation.index
+        if index.ntotal:
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = max(self.ef_search, fetch)
+            selector = generation.selector()
+            if selector is not None:
+                params.sel = selector
+            found_scores, found_ids = index.search(query, min(fetch, index.ntotal), params=params)
+            ids.append(found_ids[0])
+            scores.append(found_scores[0])
+        if generation.size:
+            buffer_scores = generation.vectors[:generation.size] @ query[0]
+            buffer_scores[generation.dead_rows] = -np.inf
+            ids.append(generation.owners[:generation.size])
+            scores.append(buffer_scores.astype("float32"))
+
+        ids, scores = np.concatenate(ids), np.concatenate(scores)
+        keep = (ids >= 0) & np.isfinite(scores)
+        if exclude_id is not None:
+            keep &= ids != exclude_id
+        ids, scores = ids[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")[:k]
+        return ids[order], scores[order]
+
+    def similar_users(self, nickname=None, k=10, profile_vec=None):
+        """Os `k` usuários mais parecidos, como lista de (nickname, similaridade)."""
+        if profile_vec is None:
+            profile_vec = self.profile(nickname)
+            if profile_vec is None:
+                return []
+        ids, scores = self._neighbors(profile_vec, k, exclude=nickname)
+        return [(self.nicknames[i], float(score)) for i, score in zip(ids, scores)]
+
+    def co_favorite_scores(self, profile_vec, k=DEFAULT_NEIGHBORS, exclude=None):
+        """
+        Soma, para cada filme, a similaridade dos `k` vizinhos que o têm entre
+        os favoritos, normalizada para [0, 1]. Devolve (linhas, scores).
+        """
+        ids, scores = self._neighbors(profile_vec, k, exclude=exclude)
+        scores = np.maximum(scores, 0)
+        if len(ids) == 0 or not scores.any():
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype="float32")
+
+        with self._lock:
+            rows = [self.favorites.get(i, np.empty(0, dtype=np.int64)) for i in ids]
+        weights = np.repeat(scores, [len(r) for r in rows])
+        movies, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+        totals = np.bincount(inverse, weights=weights).astype("float32")
+        return movies, totals / totals.max()
+
+    def to_csr(self):
+        """Matriz esparsa usuário x filme (scipy) com os favoritos, para análises offline."""
+        from scipy.sparse import csr_matrix
+
+        indptr, indices = self._favorites_arrays()
+        data = np.ones(len(indices), dtype=np.float32)
+        return csr_matrix((data, indices, indptr), shape=(len(self.nicknames), self.num_movies))
+
+    def _favorites_arrays(self):
+        with self._lock:
+            rows = [self.favorites.get(i, np.empty(0, dtype=np.int64)) for i in range(len(self.nicknames))]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(r) for r in rows], out=indptr[1:])
+        indices = np.concatenate(rows).astype(np.int32) if rows else np.empty(0, dtype=np.int32)
+        return indptr, indices
+
+    def _snapshot_arrays(self):
+        # Sob o lock só se pega a geração e se copiam os dicionários; os vetores saem dela fora do lock.
+        with self._lock:
+            generation = self._generation
+            nicknames = list(self.nicknames)
+            updated_at = np.array([self.updated_at.get(i, 0.0) for i in range(len(nicknames))], dtype=np.float64)
+            indptr, indices = self._favorites_arrays()
+        ids, stored = self._live_vectors(generation)
+        vectors = np.zeros((len(nicknames), self.dim), dtype="float32")
+        vectors[ids] = stored
+        return nicknames, vectors, updated_at, indptr, indices
+
+    def save(self, path=None):
+        """Grava o snapshot do que está em memória num arquivo só, trocado atomicamente."""
+        path = path or self.path
+        os.makedirs(path, exist_ok=True)
+        nicknames, vectors, updated_at, indptr, indices = self._snapshot_arrays()
+        meta = {"dim": self.dim, "num_movies": self.num_movies, "version": self.version, "nicknames": nicknames}
+        tmp_path = os.path.join(path, f"{SNAPSHOT_FILE}.{os.getpid()}.tmp.npz")
+        np.savez(
+            tmp_path, meta=np.array(json.dumps(meta, ensure_ascii=False)), vectors=vectors,
+            updated_at=updated_at, indptr=indptr, indices=indices
+        )
+        os.replace(tmp_path, os.path.join(path, SNAPSHOT_FILE))
+
+    def _replay_logs(self, path):
+        records = []
+        for log_path in glob.glob(os.path.join(path, LOG_PATTERN)):
+            with open(log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # linha cortada por um processo que caiu no meio da escrita
+                    if record.get("version") == self.version:
+                        records.append(record)
+        records.sort(key=lambda record: record["updated_at"])
+        with self._lock:
+            for record in records:
+                vector = np.frombuffer(base64.b64decode(record["vector"]), dtype="float32").reshape(1, -1)
+                if vector.shape[1] == self.dim:
+                    self._apply(record["nickname"], vector, np.asarray(record["rows"], dtype=np.int64),
+                                record["updated_at"])
+        return len(records)
+
+    @staticmethod
+    def _remove_logs(path, include_own=False):
+        """Apaga os logs já compactados de processos que não existem mais (e o do próprio processo, ao sair)."""
+        for log_path in glob.glob(os.path.join(path, LOG_PATTERN)):
+            pid = int(os.path.basename(log_path)[len("log-"):-len(".jsonl")])
+            if (include_own and pid == os.getpid()) or (pid != os.getpid() and not _pid_alive(pid)):
+                os.remove(log_path)
+
+    def flush(self):
+        """Esvazia a fila do writer e compacta snapshot e logs no disco."""
+        writer, self._writer = self._writer, None
+        if writer is not None and writer.pid == os.getpid():
+            writer.close()
+        if self.path:
+            with _file_lock(self.path):
+                merged = self.load(self.path, self.dim, self.num_movies, self.version, build_index=False)
+                merged.save()
+                self._remove_logs(self.path, include_own=True)
+
+    @classmethod
+    def _load_snapshot(cls, path, dim, num_movies, version):
+        snapshot_path = os.path.join(path, SNAPSHOT_FILE)
+        if not os.path.exists(snapshot_path):
+            return None
+        try:
+            with np.load(snapshot_path) as stored:
+                meta = json.loads(str(stored["meta"]))
+                if (meta["version"], meta["dim"], meta["num_movies"]) != (version, dim, num_movies):
+                    print("Índice de usuários foi construído com outros embeddings; começando do zero.")
+                    return None
+                user_index = cls(dim, num_movies, version=version, path=path)
+                nicknames = meta["nicknames"]
+                vectors = np.ascontiguousarray(stored["vectors"], dtype="float32")
+                updated_at = stored["updated_at"]
+                indptr, indices = stored["indptr"], stored["indices"].astype(np.int64)
+        except Exception as e:
+            print(f"Índice de usuários inválido, começando do zero: {e}")
+            return None
+
+        # Os vetores entram no buffer; o HNSW sai do `compact` no fim do `load`.
+        user_index.nicknames = nicknames
+        user_index.ids = {nickname: i for i, nickname in enumerate(nicknames)}
+        user_index._delta_rows = {i: i for i in range(len(nicknames))}
+        user_index._generation = user_index._new_generation(
+            user_index._generation.index, np.arange(len(nicknames), dtype=np.int64), vectors,
+            dead=np.empty(0, dtype=np.int64)
+        )
+        user_index.updated_at = {i: float(t) for i, t in enumerate(updated_at)}
+        user_index.favorites = {
+            i: indices[indptr[i]:indptr[i + 1]] for i in range(len(nicknames)) if indptr[i + 1] > indptr[i]
+        }
+        return user_index
+
+    @classmethod
+    def load(cls, path, dim, num_movies, version=None, build_index=True):
+        """
+        Snapshot (se for dos mesmos embeddings) mais as atualizações de todos
+        os logs. Sem `build_index` o HNSW não é construído: serve para quem só
+        vai regravar o snapshot.
+        """
+        user_index = cls._load_snapshot(path, dim, num_movies, version)
+        if user_index is None:
+            user_index = cls(dim, num_movies, version=version, path=path)
+        user_index._replay_logs(path)
+        if build_index:
+            user_index.compact()
+        return user_index
+
+    @classmethod
+    def load_or_create(cls, path, dim, num_movies, version=None):
+        """
+        Abre o índice salvo em `path` com os perfis construídos com os mesmos
+        embeddings (`version`); perfis de outra versão são descartados, já que
+        estão em outro espaço vetorial. Aproveita para compactar os logs de
+        processos que já terminaram.
+        """
+        with _file_lock(path):
+            user_index = cls.load(path, dim, num_movies, version, build_index=False)
+            user_index.save()
+            cls._remove_logs(path)
+        # O HNSW é construído fora do flock, para não segurar os outros workers.
+        user_index.compact()
+        print(f"Índice de usuários em '{path}' com {len(user_index)} perfis.")
+        atexit.register(user_index.flush)
+        return user_index
@@ -0,0 +1,216 @@
+import os
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.recommender.recommender import RECOMMENDATION_COLUMNS
+from src.utils.cache import TTLCache
+from src.utils.catalog_index import normalize_title
+
+ROW_DTYPE = np.dtype("<u4")
+DEFAULT_TTL = 60 * 60
+DEFAULT_MATCH_THRESHOLD = 85
+
+
+class WatchlistUnavailable(RuntimeError):
+    """A watchlist de um usuário não pôde ser coletada por completo."""
+
+
+def normalize_nickname(nickname):
+    return str(nickname).strip().lower()
+
+
+def normalize_nicknames(nicknames):
+    """Nicknames normalizados, sem vazios e sem repetição, na ordem em que chegaram."""
+    return list(dict.fromkeys(n for n in map(normalize_nickname, nicknames) if n))
+
+
+def resolve_watchlist(titles, title_matcher, threshold=DEFAULT_MATCH_THRESHOLD):
+    """
+    Converte os títulos da watchlist em linhas do catálogo (array uint32
+    ordenado, sem repetição). Títulos idênticos aos do catálogo saem do
+    lookup exato; o resto vai de uma vez para o matcher em lote (cdist).
+    """
+    catalog_index = title_matcher.catalog_index
+    rows, pending = [], []
+    for title in dict.fromkeys(titles):
+        row = catalog_index.lookup(title)
+        if row is not None and title_matcher.choices[row] == normalize_title(title):
+            rows.append(row)
+        else:
+            pending.append(title)
+    if pending:
+        _, _, matched = title_matcher.match_bulk(pending, threshold)
+        rows.extend(matched[matched >= 0])
+    return np.unique(np.asarray(rows, dtype=ROW_DTYPE))
+
+
+def intersect_all(row_sets):
+    """Interseção de N arrays ordenados, começando pelo menor."""
+    row_sets = sorted(row_sets, key=len)
+    if not row_sets:
+        return np.empty(0, dtype=ROW_DTYPE)
+    common = row_sets[0]
+    for rows in row_sets[1:]:
+        if len(common) == 0:
+            break
+        common = np.intersect1d(common, rows, assume_unique=True)
+    return common
+
+
+def common_at_least(row_sets, min_common):
+    """Linhas presentes em pelo menos `min_common` dos arrays, com a contagem de cada uma."""
+    if not row_sets:
+        return np.empty(0, dtype=ROW_DTYPE), np.empty(0, dtype=np.int64)
+    rows, counts = np.unique(np.concatenate(row_sets), return_counts=True)
+    keep = counts >= min_common
+    return rows[keep], counts[keep]
+
+
+class WatchlistStore:
+    """
+    Watchlists já resolvidas para linhas do catálogo, gravadas em sqlite como
+    blobs de uint32 ordenados (4 bytes por filme). Cada entrada guarda a versão
+    do catálogo usada na resolução e expira depois de `ttl` segundos.
+    """
+
+    def __init__(self, path, version=None, ttl=DEFAULT_TTL, max_entries=4096):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.version = version
+        self.ttl = ttl
+        self.path = path
+        self.memory = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    @property
+    def conn(self):
+        # A conexão é aberta no processo que a usa: com `gunicorn --preload` o
+        # store nasce no master e uma conexão sqlite não pode atravessar o fork.
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._pid = os.getpid()
+            with self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS watchlists ("
+                    "nickname TEXT PRIMARY KEY, version TEXT, rows BLOB, updated_at REAL)"
+                )
+        return self._conn
+
+    @staticmethod
+    def _key(nickname):
+        return normalize_nickname(nickname)
+
+    def get(self, nickname):
+        key = self._key(nickname)
+        rows = self.memory.get(key)
+        if rows is not None:
+            return rows
+        with self._lock:
+            stored = self.conn.execute(
+                "SELECT version, rows, updated_at FROM watchlists WHERE nickname = ?", (key,)
+            ).fetchone()
+        if stored is None or stored[0] != self.version or stored[2] + self.ttl <= time.time():
+            return None
+        rows = np.frombuffer(stored[1], dtype=ROW_DTYPE)
+        self.memory.set(key, rows, stored[2] + self.ttl - time.time())
+        return rows
+
+    def set(self, nickname, rows):
+        key = self._key(nickname)
+        rows = np.ascontiguousarray(rows, dtype=ROW_DTYPE)
+        self.memory.set(key, rows)
+        with self._lock:
+            conn = self.conn
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO watchlists VALUES (?, ?, ?, ?)",
+                    (key, self.version, rows.tobytes(), time.time())
+                )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = self._pid = None
+
+
+class WatchlistService:
+    """
+    Filmes em comum entre N watchlists. Cada watchlist é coletada (`scrape`),
+    resolvida uma vez para linhas do catálogo e guardada no `store`; as
+    operações de conjunto são feitas sobre arrays ordenados. O resultado é
+    ordenado pela similaridade com o perfil médio do grupo: o perfil de cada
+    membro vem do índice de usuários quando existe, senão é a média dos
+    vetores da sua watchlist.
+    """
+
+    def __init__(self, imdb_df, recommender_index, title_matcher, scrape, store=None, user_index=None,
+                 threshold=DEFAULT_MATCH_THRESHOLD, max_workers=4):
+        self.imdb_df = imdb_df
+        self.index = recommender_index
+        self.title_matcher = title_matcher
+        self.scrape = scrape
+        self.store = store
+        self.user_index = user_index
+        self.threshold = threshold
+        self.max_workers = max_workers
+
+    def rows_for(self, nickname):
+        rows = self.store.get(nickname) if self.store is not None else None
+        if rows is None:
+            titles = self.scrape(nickname)
+            if titles is None:
+                raise WatchlistUnavailable(f"Não foi possível coletar a watchlist de '{nickname}'.")
+            rows = resolve_watchlist(titles, self.title_matcher, self.threshold)
+            if self.store is not None and titles:
+                self.store.set(nickname, rows)
+        return rows
+
+    def member_profile(self, nickname, rows):
+        profile = self.user_index.profile(nickname) if self.user_index is not None else None
+        if profile is None and len(rows):
+            profile = self.index.vectors(rows.astype(np.int64)).mean(axis=0)
+        return profile
+
+    def group_profile(self, nicknames, row_sets):
+        profiles = [self.member_profile(n, rows) for n, rows in zip(nicknames, row_sets)]
+        profiles = [p / max(np.linalg.norm(p), 1e-12) for p in profiles if p is not None]
+        return np.mean(profiles, axis=0).astype("float32") if profiles else None
+
+    def common(self, nicknames, min_common=None, limit=None):
+        """
+        Filmes presentes nas watchlists de pelo menos `min_common` dos
+        `nicknames` (todos, por padrão), do mais próximo do gosto do grupo
+        para o menos próximo.
+        """
+        nicknames = normalize_nicknames(nicknames)
+        min_common = len(nicknames) if min_common is None else max(1, min(min_common, len(nicknames)))
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(nicknames))) as executor:
+            row_sets = list(executor.map(self.rows_for, nicknames))
+
+        if min_common == len(nicknames):
+            rows = intersect_all(row_sets)
+            counts = np.full(len(rows), len(nicknames), dtype=np.int64)
+        else:
+            rows, counts = common_at_least(row_sets, min_common)
+        if len(rows) == 0:
+            return []
+
+        rows = rows.astype(np.int64)
+        group_vec = self.group_profile(nicknames, row_sets)
+        if group_vec is not None:
+            scores = self.index.vectors(rows) @ group_vec
+        else:
+            scores = np.zeros(len(rows), dtype="float32")
+        order = np.lexsort((-scores, -counts))[:limit]
+
+        movies = self.imdb_df.iloc[rows[order]][RECOMMENDATION_COLUMNS].to_dict(orient="records")
+        for movie, count, score in zip(movies, counts[order], scores[order]):
+            movie["friends"] = int(count)
+            movie["score"] = float(score)
+        return movies
@@ -0,0 +1,150 @@
+import os
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+from src.utils.metrics import BROWSER_LAUNCHES
+
+DEFAULT_POOL_SIZE = int(os.environ.get("LETTERBOXD_DRIVER_POOL_SIZE", 2))
+DEFAULT_MAX_PAGES = int(os.environ.get("LETTERBOXD_DRIVER_MAX_PAGES", 50))
+DEFAULT_CHECKOUT_TIMEOUT = float(os.environ.get("LETTERBOXD_DRIVER_CHECKOUT_TIMEOUT", 120))
+
+
+def chrome_driver_factory():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    options.add_argument("--headless=new")
+    return webdriver.Chrome(options=options)
+
+
+class PooledDriver:
+    """Envolve um webdriver e conta as páginas carregadas por ele."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+    def get(self, url):
+        self.pages += 1
+        return self.driver.get(url)
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+
+class DriverPool:
+    """
+    Pool limitado de navegadores headless reutilizáveis. Cada navegador é
+    verificado antes de ser entregue e reciclado depois de `max_pages` páginas.
+    O `driver_factory` pode ser trocado por um driver falso nos testes.
+    """
+
+    def __init__(
+        self,
+        size=DEFAULT_POOL_SIZE,
+        max_pages=DEFAULT_MAX_PAGES,
+        driver_factory=chrome_driver_factory,
+        checkout_timeout=DEFAULT_CHECKOUT_TIMEOUT
+    ):
+        self.size = size
+        self.max_pages = max_pages
+        self.driver_factory = driver_factory
+        self.checkout_timeout = checkout_timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def _launch(self):
+        BROWSER_LAUNCHES.inc()
+        return PooledDriver(self.driver_factory())
+
+    def _is_healthy(self, driver):
+        try:
+            driver.current_url
+            return driver.pages < self.max_pages
+        except Exception:
+            return False
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Erro ao fechar o navegador: {e}")
+
+    def checkout(self, timeout=None):
+        if self._closed:
+            raise RuntimeError("O pool de navegadores já foi fechado.")
+        timeout = self.checkout_timeout if timeout is None else timeout
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"Nenhum navegador livre após {timeout}s.")
+
+        try:
+            while True:
+                try:
+                    driver = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._launch()
+                if self._is_healthy(driver):
+                    return driver
+                self._quit(driver)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def checkin(self, driver, discard=False):
+        try:
+            if discard or self._closed or driver.pages >= self.max_pages:
+                self._quit(driver)
+            else:
+                self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def session(self, timeout=None):
+        """Empresta um navegador; se o bloco falhar, o navegador é descartado em vez de voltar ao pool."""
+        driver = self.checkout(timeout)
+        try:
+            yield driver
+        except BaseException:
+            self.checkin(driver, discard=True)
+            raise
+        self.checkin(driver)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_driver_pool():
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = DriverPool()
+    return _default_pool
+
+
+def configure_driver_pool(**kwargs):
+    global _default_pool
+    with _default_pool_lock:
+        old_pool, _default_pool = _default_pool, DriverPool(**kwargs)
+    if old_pool is not None:
+        old_pool.close()
+    return _default_pool
+
+
+@atexit.register
+def _close_default_pool():
+    if _default_pool is not None:
+        _default_pool.close()
@@ -1,36 +1,32 @@
 import os
 import json
-import re
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+import queue
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
-
-def get_favorite_movies(nickname):
-    url = f"https://letterboxd.com/{nickname}"
-
-    options = Options()
-    options.add_argument("--headless=new")
-    driver = webdriver.Chrome(options=options)
-
-    driver.get(url)
-
-    try:
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "poster-list"))
-        )
-        html = driver.page_source
-    except Exception as e:
-        print("Erro ao carregar favoritos:", e)
-        driver.quit()
-        return []
-    
-    driver.quit()
-
-    soup = BeautifulSoup(html, "html.parser")
+from src.scraping.driver_pool import get_driver_pool
+from src.scraping.scrape_cache import cached_scrape, get_scrape_cache
+from src.utils.metrics import SCRAPE_FAILURES, timed
+
+PROFILE_URL = "https://letterboxd.com/{nickname}/"
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+}
+HTTP_TIMEOUT = 10
+WATCHLIST_URL = "https://letterboxd.com/{nickname}/watchlist/page/{page}/"
+WATCHLIST_MAX_WORKERS = 4
+
+def _fetch_html(url, timeout=HTTP_TIMEOUT):
+    response = requests.get(url, headers=HTTP_HEADERS, timeout=timeout)
+    response.raise_for_status()
+    return response.text
+
+def _parse_favorites(soup):
     favorites_list = soup.find("ul", class_="poster-list")
     if not favorites_list:
         print("Lista de favoritos não encontrada.")
@@ -40,61 +36,253 @@ def get_favorite_movies(nickname):
     movie_items = favorites_list.find_all("li", class_="poster-container")
 
     for item in movie_items[:4]:
+        # O ano fica no título ("Título (2019)") para o matcher separar filmes homônimos.
         poster_div = item.find("div", class_="film-poster")
         if poster_div and poster_div.has_attr("data-film-name"):
             title = poster_div["data-film-name"]
-            favorite_titles.append(title)
+            year = poster_div.get("data-film-release-year")
+            favorite_titles.append(f"{title} ({year})" if year else title)
         else:
             frame_title = item.select_one("span.frame-title")
             if frame_title:
-                clean_title = re.sub(r"\s*\(\d{4}\)", "", frame_title.text)
-                favorite_titles.append(clean_title)
+                favorite_titles.append(frame_title.text.strip())
 
     return favorite_titles
 
-def scrape_watchlist(nickname):
-    base_url = f"https://letterboxd.com/{nickname}/watchlist/"
-    options = Options()
-    options.add_argument("--headless=new")
-    driver = webdriver.Chrome(options=options)
+def _parse_avatar(soup):
+    avatar_div = soup.find("div", class_="profile-avatar")
+    if avatar_div:
+        img_tag = avatar_div.find("img")
+        if img_tag and img_tag.has_attr("src"):
+            return img_tag["src"]
+    return None
 
-    watchlist_titles = []
-    page = 1
+def _parse_profile_stats(soup):
+    stats = {}
+    for statistic in soup.select(".profile-stats .profile-statistic"):
+        value = statistic.select_one(".value")
+        definition = statistic.select_one(".definition")
+        if value and definition:
+            stats[definition.text.strip().lower()] = value.text.strip()
+    return stats
+
+def _is_profile_page(soup):
+    return soup.select_one(".profile-header, .profile-summary, .profile-name") is not None
+
+def _parse_profile(soup, nickname):
+    display_name = soup.select_one(".profile-name .displayname, .profile-name h1")
+    return {
+        "nickname": nickname,
+        "display_name": display_name.text.strip() if display_name else nickname,
+        "avatar_url": _parse_avatar(soup),
+        "favorites": _parse_favorites(soup),
+        "stats": _parse_profile_stats(soup)
+    }
 
-    try:
-        while True:
-            url = f"{base_url}page/{page}/"
-            driver.get(url)
+@cached_scrape("profile")
+def scrape_profile(nickname, use_http=True):
+    """
+    Busca a página de perfil uma única vez e devolve favoritos, avatar e
+    metadados do perfil. Tenta primeiro via HTTP simples e usa o Selenium
+    como fallback quando a página não vem completa. Um 404 (perfil
+    inexistente) devolve None sem abrir o navegador.
+    """
+    url = PROFILE_URL.format(nickname=nickname)
+    soup = None
+
+    if use_http:
+        try:
+            with timed("scrape_profile_http"):
+                soup = BeautifulSoup(_fetch_html(url), "html.parser")
+            # Um perfil que existe mas não tem favoritos já é a resposta final;
+            # o navegador só entra quando a página não parece um perfil.
+            if not soup.find("ul", class_="poster-list") and not _is_profile_page(soup):
+                soup = None
+        except Exception as e:
+            if isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code == 404:
+                print(f"Perfil de {nickname} não existe.")
+                return None
+            SCRAPE_FAILURES.inc(kind="profile", source="http")
+            print(f"Falha no acesso HTTP ao perfil de {nickname}, usando o navegador: {e}")
+
+    if soup is None:
+        try:
+            with timed("scrape_profile_browser"), get_driver_pool().session() as driver:
+                driver.get(url)
+                try:
+                    WebDriverWait(driver, 10).until(
+                        EC.presence_of_element_located((By.CLASS_NAME, "poster-list"))
+                    )
+                except TimeoutException:
+                    # Sem resposta não há o que cachear; a próxima chamada tenta de novo.
+                    print(f"Lista de favoritos de {nickname} não carregou a tempo.")
+                    return None
+                html = driver.page_source
+            soup = BeautifulSoup(html, "html.parser")
+        except Exception as e:
+            SCRAPE_FAILURES.inc(kind="profile", source="browser")
+            print(f"Erro ao carregar o perfil de {nickname}: {e}")
+            return None
+
+    return _parse_profile(soup, nickname)
 
-            try:
-                WebDriverWait(driver, 5).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, ".poster-list li.poster-container"))
-                )
-            except TimeoutException:
-                print(f"Fim da watchlist. Nenhum filme carregado na página {page}.")
-                break
+def get_favorite_movies(nickname):
+    profile = scrape_profile(nickname)
+    return profile["favorites"] if profile else []
 
-            soup = BeautifulSoup(driver.page_source, "html.parser")
-            movies = soup.select("ul.poster-list li.poster-container")
+def fetch_page_html(url):
+    try:
+        html = _fetch_html(url)
+        if "poster-list" in html:
+            return html
+    except Exception as e:
+        SCRAPE_FAILURES.inc(kind="watchlist", source="http")
+        print(f"Falha no acesso HTTP a {url}, usando o navegador: {e}")
 
-            for item in movies:
-                poster_div = item.find("div", class_="film-poster")
-                if poster_div:
-                    img_tag = poster_div.find("img")
-                    if img_tag and img_tag.has_attr("alt"):
-                        title = img_tag["alt"].strip()
-                        watchlist_titles.append(title)
+    with timed("scrape_page_browser"), get_driver_pool().session() as driver:
+        driver.get(url)
+        try:
+            WebDriverWait(driver, 5).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, ".poster-list li.poster-container"))
+            )
+        except TimeoutException:
+            pass
+        return driver.page_source
+
+def _parse_watchlist_page(html):
+    soup = BeautifulSoup(html, "html.parser")
+    titles = []
+    for item in soup.select("ul.poster-list li.poster-container"):
+        poster_div = item.find("div", class_="film-poster")
+        if poster_div:
+            img_tag = poster_div.find("img")
+            if img_tag and img_tag.has_attr("alt"):
+                titles.append(img_tag["alt"].strip())
+    return titles
 
-            print(f"Página {page} processada com {len(movies)} filmes.")
-            page += 1
+def _parse_page_count(html):
+    soup = BeautifulSoup(html, "html.parser")
+    pages = [int(a.text) for a in soup.select(".paginate-pages li a") if a.text.strip().isdigit()]
+    return max(pages, default=1)
+
+def iter_watchlist_pages(nickname, max_workers=WATCHLIST_MAX_WORKERS, fetch_page=fetch_page_html):
+    """
+    Gera (página, títulos) à medida que as páginas da watchlist chegam. A
+    primeira página informa o total de páginas; as demais são buscadas em
+    paralelo, com no máximo `max_workers` requisições simultâneas. Se alguma
+    página falhar, a coleta inteira falha: uma watchlist pela metade não
+    serve para a interseção.
+    """
+    first_page = fetch_page(WATCHLIST_URL.format(nickname=nickname, page=1))
+    yield 1, _parse_watchlist_page(first_page)
+
+    page_count = _parse_page_count(first_page)
+    if page_count < 2:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            executor.submit(fetch_page, WATCHLIST_URL.format(nickname=nickname, page=page)): page
+            for page in range(2, page_count + 1)
+        }
+        for future in as_completed(futures):
+            page = futures[future]
+            try:
+                html = future.result()
+            except Exception as e:
+                SCRAPE_FAILURES.inc(kind="watchlist", source="browser")
+                raise RuntimeError(f"Erro ao carregar a página {page} da watchlist de {nickname}: {e}") from e
+            yield page, _parse_watchlist_page(html)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
+@cached_scrape("watchlist")
+def scrape_watchlist(nickname, max_workers=WATCHLIST_MAX_WORKERS, fetch_page=fetch_page_html):
+    """Títulos da watchlist na ordem das páginas, ou None se a coleta falhou (nada é cacheado)."""
+    pages = {}
+    try:
+        for page, titles in iter_watchlist_pages(nickname, max_workers, fetch_page):
+            pages[page] = titles
+            print(f"Página {page} processada com {len(titles)} filmes.")
     except Exception as e:
         print(f"Ocorreu um erro inesperado durante o scraping de {nickname}: {e}")
+        return None
+
+    return [title for page in sorted(pages) for title in pages[page]]
+
+def find_common_watchlists(nickname1, nickname2, max_workers=WATCHLIST_MAX_WORKERS, fetch_page=fetch_page_html, cache=None):
+    """
+    Coleta as duas watchlists em paralelo e calcula a interseção conforme as
+    páginas chegam. Devolve assim que o resultado não pode mais mudar: quando
+    uma das listas termina e todos os seus filmes já estão na interseção. A
+    falha de qualquer página é repassada a quem chamou.
+
+    Cada watchlist passa pelo `get_or_fetch` do cache de scraping (o padrão,
+    com o `fetch_page` do navegador): chamadas simultâneas para o mesmo
+    nickname esperam a mesma coleta. Com cache, a coleta vai até o fim mesmo
+    depois da resposta, para que a watchlist completa fique guardada.
+    """
+    nicknames = (nickname1, nickname2)
+    pages = queue.Queue()
+    stop = threading.Event()
+
+    if cache is None and fetch_page is fetch_page_html:
+        cache = get_scrape_cache()
+
+    def produce(user):
+        streamed = []
+
+        def fetch():
+            collected = {}
+            watchlist_pages = iter_watchlist_pages(nicknames[user], max_workers, fetch_page)
+            try:
+                for page, titles in watchlist_pages:
+                    if stop.is_set() and cache is None:
+                        break  # sem cache, o resto da watchlist não serve para ninguém
+                    collected[page] = titles
+                    if not stop.is_set():
+                        pages.put((user, titles))
+                        streamed.append(page)
+            finally:
+                watchlist_pages.close()
+            return [t for p in sorted(collected) for t in collected[p]]
+
+        try:
+            titles = cache.get_or_fetch("watchlist", nicknames[user], fetch) if cache is not None else fetch()
+            if not streamed:
+                # Veio do cache ou de uma coleta de outra requisição: entra de uma vez.
+                pages.put((user, titles))
+        except Exception as e:
+            print(f"Ocorreu um erro inesperado durante o scraping de {nicknames[user]}: {e}")
+            pages.put((user, e))
+        finally:
+            pages.put((user, None))
+
+    producers = [threading.Thread(target=produce, args=(user,), daemon=True) for user in (0, 1)]
+    for producer in producers:
+        producer.start()
+
+    seen = (set(), set())
+    done = [False, False]
+    common = set()
+    try:
+        while not all(done):
+            user, titles = pages.get()
+            if isinstance(titles, Exception):
+                raise titles
+            if titles is None:
+                done[user] = True
+            else:
+                seen[user].update(titles)
+                common.update(seen[1 - user].intersection(titles))
+
+            if any(done[u] and len(common) == len(seen[u]) for u in (0, 1)):
+                break
     finally:
-        print("Fechando o navegador.")
-        driver.quit()
+        stop.set()
 
-    return watchlist_titles
+    return sorted(common)
 
 def save_watchlists_to_json(nickname1, nickname2, output_file="data/watchlist/watchlist_filmes.json"):
     print(f"\nColetando watchlist de '{nickname1}'...")
@@ -135,42 +323,29 @@ def find_common_movies(json_path):
     return comuns
 
 def get_user_avatar(nickname):
-    url = f"https://letterboxd.com/{nickname}/"
-    options = Options()
-    options.headless = True
-    
-    try:
-        driver = webdriver.Chrome(options=options)
-        driver.get(url)
-        html = driver.page_source
-        driver.quit()
-
-        soup = BeautifulSoup(html, "html.parser")
-        
-        avatar_div = soup.find("div", class_="profile-avatar")
-        if avatar_div:
-            img_tag = avatar_div.find("img")
-            if img_tag and img_tag.has_attr("src"):
-                return img_tag["src"] 
+    profile = scrape_profile(nickname)
+    return profile["avatar_url"] if profile else None
 
-    except Exception as e:
-        print(f"Erro ao buscar o avatar de {nickname}: {e}")
-    
-    return None 
+@cached_scrape("poster")
 def get_movie_poster_by_slug(slug):
     
     movie_url = f"https://letterboxd.com/film/{slug}/"
-    options = Options()
-    options.headless = True
-    driver = webdriver.Chrome(options=options)
 
     try:
-        driver.get(movie_url)
-        WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "film-poster"))
-        )
+        with get_driver_pool().session() as driver:
+            driver.get(movie_url)
+            try:
+                WebDriverWait(driver, 5).until(
+                    EC.presence_of_element_located((By.CLASS_NAME, "film-poster"))
+                )
+            except TimeoutException:
+                # Página sem pôster não é navegador quebrado: o driver volta para o pool.
+                SCRAPE_FAILURES.inc(kind="poster", source="timeout")
+                print(f"Timeout ao buscar pôster para {slug}")
+                return None
+            html = driver.page_source
 
-        soup = BeautifulSoup(driver.page_source, "html.parser")
+        soup = BeautifulSoup(html, "html.parser")
 
         poster_div = soup.find("div", class_="film-poster")
         if poster_div:
@@ -178,12 +353,9 @@ def get_movie_poster_by_slug(slug):
             if img_tag and img_tag.has_attr("src"):
                 return img_tag["src"]
 
-    except TimeoutException:
-        print(f"Timeout ao buscar pôster para {slug}")
     except Exception as e:
+        SCRAPE_FAILURES.inc(kind="poster", source="browser")
         print(f"Erro ao buscar pôster de {slug}: {e}")
-    finally:
-        driver.quit()
 
     return None
 
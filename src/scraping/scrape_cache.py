@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from functools import wraps
+from src.utils.cache import TTLCache
+
+HOUR = 60 * 60
+DEFAULT_TTLS = {
+    "profile": 6 * HOUR,
+    "watchlist": 1 * HOUR,
+    "poster": 7 * 24 * HOUR
+}
+DEFAULT_MAX_ENTRIES = int(os.environ.get("LETTERBOXD_CACHE_SIZE", 2048))
+DEFAULT_CACHE_PATH = os.environ.get("LETTERBOXD_CACHE_PATH") or None
+
+
+class SqliteStore:
+    """Persistência em sqlite para o cache, compartilhada entre os workers."""
+
+    def __init__(self, path, prune_every=200):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.prune_every = prune_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS scrape_cache ("
+                "kind TEXT, key TEXT, value TEXT, expires_at REAL, PRIMARY KEY (kind, key))"
+            )
+
+    def get(self, kind, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM scrape_cache WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0]), row[1] - time.time()
+
+    def set(self, kind, key, value, ttl):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scrape_cache VALUES (?, ?, ?, ?)",
+                (kind, key, json.dumps(value, ensure_ascii=False), time.time() + ttl)
+            )
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._conn.execute("DELETE FROM scrape_cache WHERE expires_at <= ?", (time.time(),))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ScrapeCache:
+    """
+    Cache dos dados coletados do Letterboxd, por tipo de dado e nickname, com
+    TTL por tipo, descarte LRU em memória e, opcionalmente, persistência em
+    sqlite para sobreviver ao reinício dos workers.
+    """
+
+    def __init__(self, ttls=None, max_entries=DEFAULT_MAX_ENTRIES, path=DEFAULT_CACHE_PATH):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.memory = TTLCache(max_entries=max_entries)
+        self.disk = SqliteStore(path) if path else None
+
+    @staticmethod
+    def _key(kind, name):
+        return kind, str(name).strip().lower()
+
+    def peek(self, kind, name):
+        key = self._key(kind, name)
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            stored = self.disk.get(*key)
+            if stored is not None:
+                value, ttl = stored
+                self.memory.set(key, value, ttl)
+        return value
+
+    def set(self, kind, name, value):
+        key = self._key(kind, name)
+        ttl = self.ttls[kind]
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            self.disk.set(*key, value, ttl)
+
+    def get_or_fetch(self, kind, name, fetch):
+        key = self._key(kind, name)
+        ttl = [self.ttls[kind]]
+
+        def load():
+            if self.disk is not None:
+                stored = self.disk.get(*key)
+                if stored is not None:
+                    # Valor vindo do disco vale só pelo tempo que ainda lhe resta.
+                    value, ttl[0] = stored
+                    return value
+            value = fetch()
+            if value and self.disk is not None:
+                self.disk.set(*key, value, ttl[0])
+            return value
+
+        return self.memory.get_or_compute(key, load, ttl=lambda: ttl[0], should_cache=bool)
+
+    def stats(self):
+        return self.memory.stats()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_scrape_cache():
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ScrapeCache()
+    return _default_cache
+
+
+def configure_scrape_cache(**kwargs):
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = ScrapeCache(**kwargs)
+    return _default_cache
+
+
+def cached_scrape(kind):
+    """
+    Coloca a função de scraping atrás do cache padrão. Só chamadas com apenas
+    o nickname/slug são cacheadas; resultados vazios nunca são guardados.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(name, *args, **kwargs):
+            if args or kwargs:
+                return fn(name, *args, **kwargs)
+            return get_scrape_cache().get_or_fetch(kind, name, lambda: fn(name))
+
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
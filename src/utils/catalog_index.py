@@ -0,0 +1,89 @@
+import re
+import unicodedata
+import pandas as pd
+
+_YEAR_IN_TITLE = re.compile(r"\s*\((\d{4})\)\s*$")
+_NON_WORD = re.compile(r"[\W_]+")
+_LATIN_END = 0x250
+
+
+def normalize_title(title):
+    """
+    Normaliza um título para comparação: casefold, sem acentos nas letras
+    latinas, sem pontuação e sem o ano entre parênteses no final. Letras de
+    outros alfabetos (cirílico, CJK, árabe...) são mantidas.
+    """
+    if title is None:
+        return ""
+    title = _YEAR_IN_TITLE.sub("", str(title))
+    chars = []
+    for ch in unicodedata.normalize("NFKD", title):
+        # Só tira as marcas de letras latinas: em outros alfabetos elas mudam a letra (ex.: ガ/カ).
+        if unicodedata.combining(ch) and chars and ord(chars[-1]) < _LATIN_END:
+            continue
+        chars.append(ch)
+    title = unicodedata.normalize("NFC", "".join(chars))
+    return _NON_WORD.sub(" ", title.casefold()).strip()
+
+
+def split_title_year(title):
+    match = _YEAR_IN_TITLE.search(str(title))
+    if match:
+        return str(title)[:match.start()], int(match.group(1))
+    return str(title), None
+
+
+def extract_years(values):
+    years = pd.to_numeric(pd.Series(values).astype(str).str.extract(r"(\d{4})")[0], errors="coerce")
+    return [int(y) if pd.notna(y) else None for y in years]
+
+
+class CatalogIndex:
+    """
+    Mapeia títulos do catálogo para a linha posicional correspondente nos
+    embeddings. Construído uma vez no carregamento e compartilhado pelo
+    matcher e pelo recomendador.
+    """
+
+    def __init__(self, titles, years=None):
+        self.titles = [str(t) for t in titles]
+        self.normalized_titles = [normalize_title(t) for t in self.titles]
+        self.years = list(years) if years is not None else [None] * len(self.titles)
+
+        self._by_title = {}
+        self._by_normalized = {}
+        self._by_normalized_year = {}
+        for row, (title, normalized, year) in enumerate(zip(self.titles, self.normalized_titles, self.years)):
+            self._by_title.setdefault(title, []).append(row)
+            self._by_normalized.setdefault(normalized, []).append(row)
+            if year is not None:
+                self._by_normalized_year.setdefault((normalized, year), []).append(row)
+
+    @classmethod
+    def from_dataframe(cls, df, title_column="title", year_column=None):
+        if year_column is None:
+            year_column = "year" if "year" in df.columns else "release_date"
+        years = extract_years(df[year_column]) if year_column in df.columns else None
+        return cls(df[title_column].tolist(), years)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def lookup_all(self, title, year=None):
+        rows = self._by_title.get(str(title))
+        if rows and year is None:
+            return list(rows)
+
+        base_title, title_year = split_title_year(title)
+        year = year if year is not None else title_year
+        normalized = normalize_title(base_title)
+
+        if year is not None:
+            rows_with_year = self._by_normalized_year.get((normalized, year))
+            if rows_with_year:
+                return list(rows_with_year)
+        return list(rows or self._by_normalized.get(normalized, []))
+
+    def lookup(self, title, year=None):
+        rows = self.lookup_all(title, year)
+        return rows[0] if rows else None
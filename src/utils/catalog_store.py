@@ -0,0 +1,174 @@
+import os
+import json
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from src.embedding.quantization import DTYPES, scale_path_for, write_normalized_embeddings
+
+REQUIRED_COLUMNS = ['title', 'release_date', 'rating_imdb', 'genre', 'language']
+MANIFEST_FILE = "manifest.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+INDEX_FILE = "index.faiss"
+FORMAT_VERSION = 1
+_SEPARATOR = "\x00"
+
+
+def catalog_exists(catalog_dir):
+    return os.path.exists(os.path.join(catalog_dir, MANIFEST_FILE))
+
+
+def catalog_index_path(catalog_dir):
+    return os.path.join(catalog_dir, INDEX_FILE)
+
+
+def _file_sha1(path, block_size=1 << 24):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_string_column(path, values):
+    nulls = pd.isna(values)
+    text = _SEPARATOR.join("" if null else str(v) for v, null in zip(values, nulls))
+    with open(path, "wb") as f:
+        f.write(text.encode("utf-8"))
+    return nulls
+
+
+def _read_string_column(path, rows):
+    with open(path, "rb") as f:
+        values = f.read().decode("utf-8").split(_SEPARATOR) if rows else []
+    if len(values) != rows:
+        raise ValueError(f"Coluna '{path}' tem {len(values)} linhas, esperado {rows}.")
+    return values
+
+
+def build_catalog(csv_path, embeddings_path, catalog_dir, chunk_size=100000, dtype="float32"):
+    """
+    Compila o CSV e os embeddings num artefato colunar: uma coluna por arquivo
+    (.npy para números, texto separado por NUL para strings), os embeddings
+    normalizados em .npy (float32, float16 ou int8) para abrir com mmap e o
+    índice FAISS. O manifest guarda o número de linhas e uma impressão digital
+    dos títulos para validar que metadados e embeddings continuam alinhados.
+    """
+    from src.recommender.index import RecommenderIndex
+
+    print(f"Carregando dataset de '{csv_path}'...")
+    df = pd.read_csv(csv_path)
+    df.dropna(subset=REQUIRED_COLUMNS, inplace=True)
+    df.reset_index(drop=True, inplace=True)
+
+    source = np.load(embeddings_path, mmap_mode="r")
+    if source.ndim != 2 or source.shape[0] != len(df):
+        raise ValueError(
+            f"Embeddings com formato {source.shape} não correspondem às {len(df)} linhas do dataset."
+        )
+
+    os.makedirs(catalog_dir, exist_ok=True)
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        safe_name = hashlib.sha1(name.encode("utf-8")).hexdigest()[:12]
+        if pd.api.types.is_numeric_dtype(series):
+            filename = f"col_{safe_name}.npy"
+            np.save(os.path.join(catalog_dir, filename), series.to_numpy())
+            columns[name] = {"kind": "numeric", "file": filename}
+        else:
+            filename = f"col_{safe_name}.txt"
+            nulls = _write_string_column(os.path.join(catalog_dir, filename), series.tolist())
+            columns[name] = {"kind": "string", "file": filename}
+            if nulls.any():
+                null_file = f"col_{safe_name}.null.npy"
+                np.save(os.path.join(catalog_dir, null_file), np.asarray(nulls))
+                columns[name]["nulls"] = null_file
+
+    print("Normalizando e gravando embeddings...")
+    embeddings_file = os.path.join(catalog_dir, EMBEDDINGS_FILE)
+    scale = write_normalized_embeddings(source, embeddings_file, dtype, chunk_size)
+
+    title_fingerprint = _file_sha1(os.path.join(catalog_dir, columns["title"]["file"]))
+    embeddings_sha1 = _file_sha1(embeddings_file)
+    manifest = {
+        "format": FORMAT_VERSION,
+        "rows": len(df),
+        "columns": columns,
+        "column_order": list(df.columns),
+        "embeddings": {
+            "file": EMBEDDINGS_FILE,
+            "shape": list(source.shape),
+            "dtype": dtype,
+            "normalized": True,
+            "scale_file": os.path.basename(scale_path_for(embeddings_file)) if scale is not None else None
+        },
+        "title_fingerprint": title_fingerprint,
+        "version": hashlib.sha1(f"{title_fingerprint}:{embeddings_sha1}".encode()).hexdigest()
+    }
+
+    print("Construindo índice FAISS...")
+    embeddings = np.load(embeddings_file, mmap_mode="r")
+    RecommenderIndex(embeddings, normalized=True, scale=scale, version=manifest["version"]).save(
+        catalog_index_path(catalog_dir)
+    )
+
+    with open(os.path.join(catalog_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4, ensure_ascii=False)
+    print(f"Catálogo compilado em '{catalog_dir}' ({len(df)} filmes).")
+    return manifest
+
+
+def catalog_scale(catalog_dir, manifest):
+    scale_file = manifest["embeddings"].get("scale_file")
+    return np.load(os.path.join(catalog_dir, scale_file)) if scale_file else None
+
+
+def load_catalog(catalog_dir, validate=True):
+    """
+    Abre o catálogo compilado. Colunas numéricas e embeddings são mapeados em
+    memória (mmap), então vários workers compartilham as mesmas páginas.
+    Devolve (DataFrame, embeddings, manifest).
+    """
+    with open(os.path.join(catalog_dir, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Formato de catálogo não suportado: {manifest.get('format')}")
+
+    rows = manifest["rows"]
+    embeddings = np.load(os.path.join(catalog_dir, manifest["embeddings"]["file"]), mmap_mode="r")
+    if embeddings.shape[0] != rows:
+        raise ValueError(f"Embeddings têm {embeddings.shape[0]} linhas, o catálogo tem {rows}.")
+
+    if validate:
+        title_file = os.path.join(catalog_dir, manifest["columns"]["title"]["file"])
+        if _file_sha1(title_file) != manifest["title_fingerprint"]:
+            raise ValueError("Os títulos do catálogo não correspondem ao manifest; recompile o catálogo.")
+
+    data = {}
+    for name in manifest["column_order"]:
+        spec = manifest["columns"][name]
+        path = os.path.join(catalog_dir, spec["file"])
+        if spec["kind"] == "numeric":
+            data[name] = np.load(path, mmap_mode="r")
+        else:
+            values = pd.Series(_read_string_column(path, rows), dtype=object)
+            if "nulls" in spec:
+                values[np.load(os.path.join(catalog_dir, spec["nulls"]))] = None
+            data[name] = values
+
+    return pd.DataFrame(data, copy=False), embeddings, manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compila o catálogo de filmes e os embeddings.")
+    parser.add_argument("--csv", default="./data/pre-processing/base_transformada.csv")
+    parser.add_argument("--embeddings", default="./data/embeddings/movie_embeddings.npy")
+    parser.add_argument("--out", default="./data/catalog")
+    parser.add_argument("--dtype", choices=DTYPES, default="float32")
+    args = parser.parse_args()
+    build_catalog(args.csv, args.embeddings, args.out, dtype=args.dtype)
+
+
+if __name__ == "__main__":
+    main()
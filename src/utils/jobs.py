@@ -0,0 +1,188 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_IO_WORKERS = int(os.environ.get("TOPFOURYOU_JOB_IO_WORKERS", 8))
+DEFAULT_CPU_WORKERS = int(os.environ.get("TOPFOURYOU_JOB_CPU_WORKERS", 2))
+DEFAULT_JOB_TTL = float(os.environ.get("TOPFOURYOU_JOB_TTL", 60 * 60))
+DEFAULT_JOB_TIMEOUT = float(os.environ.get("TOPFOURYOU_JOB_TIMEOUT", 5 * 60))
+INLINE = "inline"
+IO = "io"
+CPU = "cpu"
+
+
+class JobError(Exception):
+    """Falha esperada de uma etapa, com a mensagem e o status HTTP para o cliente."""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class Job:
+    def __init__(self, kind, params=None, timeout=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.status = "queued"
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.status_code = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.deadline = self.created_at + timeout if timeout is not None else None
+        self.version = 0
+        self._changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in ("done", "error")
+
+    def _update(self, **fields):
+        # "done" e "error" são finais: o resultado de uma etapa que termina
+        # depois do tempo limite é descartado.
+        with self._changed:
+            if self.done:
+                return
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.updated_at = time.time()
+            self.version += 1
+            self._changed.notify_all()
+
+    def snapshot(self):
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+        if self.status == "done":
+            data["result"] = self.result
+        elif self.status == "error":
+            data["error"] = self.error
+            data["status_code"] = self.status_code
+        return data
+
+    def check_deadline(self, now=None):
+        if self.deadline is not None and not self.done and (now or time.time()) >= self.deadline:
+            self._update(status="error", error="Tempo limite do job esgotado.", status_code=504)
+
+    def wait_for_change(self, version, timeout=None):
+        if self.deadline is not None:
+            remaining = max(0.0, self.deadline - time.time())
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version or self.done, timeout=timeout)
+        self.check_deadline()
+        return self.version
+
+    def iter_snapshots(self, timeout=30):
+        """Gera um snapshot a cada mudança de etapa, até o job terminar."""
+        version = -1
+        while True:
+            current = self.wait_for_change(version, timeout)
+            if current == version and not self.done:
+                yield None
+                continue
+            version = current
+            yield self.snapshot()
+            if self.done:
+                return
+
+
+class JobManager:
+    """
+    Executa pipelines fora da thread da requisição. Cada pipeline é uma lista
+    de etapas (nome, executor, função); a função recebe o resultado da etapa
+    anterior. Etapas de I/O (scraping) e de CPU (matching/ranking) usam pools
+    separados, para que scrapes lentos não segurem o ranking de usuários já em
+    cache; etapas "inline" rodam direto na thread que as agendou.
+
+    Um job que passa de `timeout` segundos sem terminar vira erro 504, e os
+    jobs ficam consultáveis por `ttl` segundos depois de terminar. Acima de
+    `max_jobs`, os mais antigos saem primeiro, terminados ou não.
+
+    Os jobs vivem na memória do processo: com vários workers, o GET de
+    /jobs/<id> precisa chegar ao worker que recebeu o POST (um worker só com
+    várias threads, ou roteamento fixo por cliente).
+    """
+
+    def __init__(
+        self,
+        io_workers=DEFAULT_IO_WORKERS,
+        cpu_workers=DEFAULT_CPU_WORKERS,
+        max_jobs=1000,
+        ttl=DEFAULT_JOB_TTL,
+        timeout=DEFAULT_JOB_TIMEOUT
+    ):
+        self.executors = {
+            IO: ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="job-io"),
+            CPU: ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="job-cpu")
+        }
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self.timeout = timeout
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict_locked(self, now):
+        for job_id, job in list(self._jobs.items()):
+            job.check_deadline(now)
+            if job.done and job.updated_at + self.ttl <= now:
+                del self._jobs[job_id]
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+
+    def submit(self, kind, stages, params=None):
+        job = Job(kind, params, timeout=self.timeout)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict_locked(time.time())
+        self._run_stage(job, list(stages), 0, None)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job.check_deadline()
+        return job
+
+    def _run_stage(self, job, stages, position, value):
+        if job.done:
+            return
+        if position == len(stages):
+            job._update(status="done", stage=None, result=value)
+            return
+
+        name, executor, fn = stages[position]
+        job._update(status="running", stage=name)
+
+        def run():
+            try:
+                result = fn(value)
+            except JobError as e:
+                job._update(status="error", error=e.message, status_code=e.status_code)
+                return
+            except Exception as e:
+                print(f"Erro na etapa '{name}' do job {job.id}: {e}")
+                job._update(status="error", error="Erro interno durante o processamento.", status_code=500)
+                return
+            self._run_stage(job, stages, position + 1, result)
+
+        if executor == INLINE:
+            run()
+        else:
+            self.executors[executor].submit(run)
+
+    def shutdown(self, wait=True):
+        for executor in self.executors.values():
+            executor.shutdown(wait=wait)
@@ -0,0 +1,216 @@
+import os
+import io
+import time
+import pstats
+import cProfile
+import threading
+
+METRICS_ENABLED = os.environ.get("TOPFOURYOU_METRICS", "1") != "0"
+PROFILING_ENABLED = os.environ.get("TOPFOURYOU_PROFILING", "0") == "1"
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, "") for name in self.labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labels, key, [("le", _format_value(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labels, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Conjunto de métricas do processo. Além dos contadores e histogramas, aceita
+    coletores: funções chamadas na hora de exportar que devolvem tuplas
+    (nome, ajuda, {labels}, valor[, tipo]), usadas para expor estatísticas
+    que já existem em outros objetos (ex.: caches). O tipo padrão é "gauge";
+    totais que só crescem devem vir como "counter", com nome terminado em
+    `_total`.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, labels, buckets)
+
+    def register_collector(self, collect):
+        self.collectors.append(collect)
+        return collect
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        collected = {}
+        for collect in self.collectors:
+            try:
+                for name, help_text, labels, value, *kind in collect():
+                    kind = kind[0] if kind else "gauge"
+                    collected.setdefault(name, (help_text, kind, []))[2].append((labels, value))
+            except Exception as e:
+                print(f"Erro ao coletar métricas: {e}")
+        for name, (help_text, kind, samples) in collected.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "topfouryou_stage_seconds", "Duração de cada etapa do pipeline, em segundos.", labels=("stage",)
+)
+STAGE_ERRORS = registry.counter(
+    "topfouryou_stage_errors_total", "Etapas que terminaram com exceção.", labels=("stage",)
+)
+SCRAPE_FAILURES = registry.counter(
+    "topfouryou_scrape_failures_total", "Falhas de scraping no Letterboxd.", labels=("kind", "source")
+)
+BROWSER_LAUNCHES = registry.counter(
+    "topfouryou_browser_launches_total", "Navegadores headless iniciados pelo pool."
+)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, stage=self.stage)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(stage=self.stage)
+        return False
+
+
+def timed(stage):
+    """
+    Mede a duração de uma etapa no histograma `topfouryou_stage_seconds`.
+    Uso: `with timed("faiss_search"): ...`. Com as métricas desligadas
+    (TOPFOURYOU_METRICS=0) devolve um contexto vazio compartilhado.
+    """
+    if not METRICS_ENABLED:
+        return _NULL_TIMER
+    return _StageTimer(stage)
+
+
+def render_prometheus():
+    return registry.render()
+
+
+def start_profile(enabled):
+    """
+    Inicia um cProfile para a requisição atual quando `enabled` é verdadeiro e
+    o profiling está ligado (TOPFOURYOU_PROFILING=1); senão devolve None.
+    """
+    if not (enabled and PROFILING_ENABLED):
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def profile_report(profiler, limit=30, sort="cumulative"):
+    profiler.disable()
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats(sort).print_stats(limit)
+    return output.getvalue()
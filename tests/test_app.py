@@ -0,0 +1,167 @@
+import importlib
+import json
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from src.recommender import user_index as user_index_module
+from src.recommender.watchlists import normalize_nicknames, resolve_watchlist
+from src.utils.catalog_store import build_catalog
+
+TITLES = ["Stalker", "Solaris", "Mirror", "Ivan's Childhood", "Andrei Rublev", "Nostalghia"]
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """Importa o app do zero em cima de um catálogo compilado pequeno."""
+    csv_path, npy_path = tmp_path / "base.csv", tmp_path / "embeddings.npy"
+    pd.DataFrame({
+        "title": TITLES,
+        "release_date": [1979, 1972, 1975, 1962, 1966, 1983],
+        "rating_imdb": [8.1, 7.9, 8.0, 8.0, 8.1, 7.9],
+        "genre": ["Drama, Sci-Fi", "Drama, Sci-Fi", "Drama", "Drama, War", "Drama, History", "Drama"],
+        "language": ["Russian", "Russian", "Russian", "Russian", "Russian", "Italian"]
+    }).to_csv(csv_path, index=False)
+    np.save(npy_path, np.random.default_rng(0).standard_normal((len(TITLES), 8)).astype("float32"))
+    build_catalog(str(csv_path), str(npy_path), str(tmp_path / "catalog"))
+
+    monkeypatch.setenv("TOPFOURYOU_CATALOG_DIR", str(tmp_path / "catalog"))
+    monkeypatch.setenv("TOPFOURYOU_USER_INDEX_DIR", str(tmp_path / "users"))
+    monkeypatch.setenv("TOPFOURYOU_WATCHLIST_STORE", str(tmp_path / "watchlists.sqlite"))
+    monkeypatch.setattr(user_index_module.atexit, "register", lambda fn: fn)
+    monkeypatch.delitem(sys.modules, "app", raising=False)
+    module = importlib.import_module("app")
+    yield module
+    module.job_manager.shutdown()
+    sys.modules.pop("app", None)
+
+
+def test_startup_wires_user_index_into_watchlists(app_module):
+    assert app_module.user_index is not None
+    assert app_module.watchlist_service.user_index is app_module.user_index
+
+
+@pytest.mark.parametrize("limit", ["-1", "0", "abc", "2.5"])
+def test_find_common_rejects_invalid_limit(app_module, limit):
+    response = app_module.app.test_client().get(f"/find_common?nicknames=a,b&limit={limit}")
+    assert response.status_code == 400
+
+
+def test_find_common_requires_two_distinct_nicknames(app_module):
+    response = app_module.app.test_client().get("/find_common?nicknames=Someone,%20someone%20")
+    assert response.status_code == 400
+
+
+def test_resolve_watchlist_matches_exact_and_fuzzy_titles(app_module):
+    rows = resolve_watchlist(["Stalker", "stalker", "Solaaris", "Filme que não existe"], app_module.title_matcher)
+    np.testing.assert_array_equal(rows, [0, 1])
+
+
+def test_normalize_nicknames_keeps_first_occurrence():
+    assert normalize_nicknames([" Someone", "friend", "SOMEONE", "", "  "]) == ["someone", "friend"]
+
+
+def test_pair_find_common_uses_the_watchlist_service(app_module, monkeypatch):
+    watchlists = {"someone": ["Stalker", "Solaris", "Mirror"], "friend": ["solaris", "Stalker (1979)", "Nostalghia"]}
+    monkeypatch.setattr(app_module.watchlist_service, "scrape", lambda nickname: watchlists[nickname])
+
+    response = app_module.app.test_client().get("/find_common?nickname1=Someone&nickname2=friend")
+    assert response.status_code == 200
+    assert sorted(response.get_json()) == ["Solaris", "Stalker"]
+    assert app_module.watchlist_service.store.get("someone") is not None
+
+
+@pytest.mark.parametrize("k", ["-3", "0", "abc"])
+def test_similar_users_rejects_invalid_k(app_module, k):
+    response = app_module.app.test_client().get(f"/similar_users?nickname=someone&k={k}")
+    assert response.status_code == 400
+
+
+def test_empty_filter_fails_before_scraping(app_module, monkeypatch):
+    def fetch_profile(nickname):
+        raise AssertionError("o perfil não deveria ser coletado")
+
+    monkeypatch.setattr(app_module, "fetch_profile", fetch_profile)
+    client = app_module.app.test_client()
+    assert client.get("/recommend?nickname=someone&genre=western").status_code == 404
+    assert client.post("/jobs/recommend?nickname=someone&genre=western").status_code == 404
+
+
+VALID_USER = {"user": "someone", "favorites": ["Stalker"]}
+
+
+@pytest.mark.parametrize("payload", [
+    None,
+    [VALID_USER],
+    {"users": []},
+    {"users": [{"favorites": ["Stalker"]}]},
+    {"users": [{"user": "someone", "favorites": "Stalker"}]},
+    {"users": [VALID_USER], "top_n": 0},
+    {"users": [VALID_USER], "top_n": True},
+    {"users": [VALID_USER], "candidate_pool_size": 1001},
+    {"users": [VALID_USER], "lambda": 1.5},
+    {"users": [VALID_USER], "filters": ["Drama"]},
+    {"users": [VALID_USER], "filters": {"year_min": "abc"}}
+])
+def test_recommend_batch_rejects_invalid_payload(app_module, payload):
+    response = app_module.app.test_client().post("/recommend_batch", json=payload)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_recommend_batch_streams_one_line_per_user_in_order(app_module):
+    payload = {
+        "users": [VALID_USER, {"user": "nobody", "favorites": ["Filme que não existe"]},
+                  {"user": "friend", "favorites": ["Solaris", "Mirror"]}],
+        "top_n": 2,
+        "candidate_pool_size": 3
+    }
+    response = app_module.app.test_client().post("/recommend_batch", json=payload)
+    assert response.status_code == 200
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line["user"] for line in lines] == ["someone", "nobody", "friend"]
+    assert "error" in lines[1]
+    assert len(lines[0]["recommendations"]) == 2
+    assert "Stalker" not in [movie["title"] for movie in lines[0]["recommendations"]]
+
+
+def test_metrics_export_cache_totals_as_counters(app_module):
+    text = app_module.app.test_client().get("/metrics").get_data(as_text=True)
+
+    assert "# TYPE topfouryou_cache_entries gauge" in text
+    assert "# TYPE topfouryou_cache_hits_total counter" in text
+    assert 'topfouryou_cache_misses_total{cache="recommendation"}' in text
+    assert "# TYPE topfouryou_stage_seconds histogram" in text
+
+
+def test_job_events_stream_until_done(app_module, monkeypatch):
+    watchlists = {"someone": ["Stalker", "Solaris"], "friend": ["Stalker"]}
+    monkeypatch.setattr(app_module.watchlist_service, "scrape", lambda nickname: watchlists[nickname])
+    client = app_module.app.test_client()
+
+    accepted = client.post("/jobs/find_common?nickname1=someone&nickname2=friend")
+    assert accepted.status_code == 202
+    job_id = accepted.get_json()["job_id"]
+
+    body = client.get(f"/jobs/{job_id}/events").get_data(as_text=True)
+    events = [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+    assert events[-1]["status"] == "done"
+    assert events[-1]["result"] == ["Stalker"]
+    assert client.get(f"/jobs/{job_id}").get_json()["status"] == "done"
+
+
+def test_slow_job_times_out_with_504(app_module, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(app_module.watchlist_service, "scrape", lambda nickname: release.wait(5) and [])
+    monkeypatch.setattr(app_module.job_manager, "timeout", 0.1)
+    client = app_module.app.test_client()
+
+    job_id = client.post("/jobs/find_common?nicknames=someone,friend").get_json()["job_id"]
+    time.sleep(0.2)
+    snapshot = client.get(f"/jobs/{job_id}").get_json()
+    release.set()
+    assert (snapshot["status"], snapshot["status_code"]) == ("error", 504)
+    assert client.get("/jobs/desconhecido").status_code == 404
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.recommender import batch as batch_module
+from src.recommender.batch import recommend_movies_batch
+from src.recommender.index import RecommenderIndex
+from src.utils.catalog_index import CatalogIndex
+
+ROWS = 200
+
+
+@pytest.fixture
+def catalog():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "title": [f"Filme {i}" for i in range(ROWS)],
+        "genre": ["Drama"] * ROWS,
+        "release_date": rng.integers(1950, 2024, ROWS),
+        "language": ["English"] * ROWS,
+        "rating_imdb": np.round(rng.uniform(1, 10, ROWS), 1)
+    })
+    index = RecommenderIndex(rng.standard_normal((ROWS, 16)).astype("float32"))
+    return df, index, CatalogIndex.from_dataframe(df)
+
+
+def run(catalog, users, **kwargs):
+    df, index, catalog_index = catalog
+    return list(recommend_movies_batch(users, df, index, catalog_index, top_n=5, candidate_pool_size=20, **kwargs))
+
+
+def test_results_follow_input_order(catalog):
+    users = [("a", ["Filme 1"]), ("b", ["Filme que não existe"]), ("c", ["Filme 2", "Filme 3"]), ("d", [])]
+    results = run(catalog, users, batch_size=3)
+
+    assert [result["user"] for result in results] == ["a", "b", "c", "d"]
+    assert "error" in results[1] and "error" in results[3]
+    assert len(results[0]["recommendations"]) == 5
+    assert len(results[2]["recommendations"]) == 5
+
+
+def test_mmr_chunks_match_a_single_pass(catalog, monkeypatch):
+    users = [(str(i), [f"Filme {i}", f"Filme {i + 1}"]) for i in range(12)]
+    expected = run(catalog, users)
+
+    # Um pedaço por usuário: cada chunk monta só os vetores de candidatos dele.
+    monkeypatch.setattr(batch_module, "MAX_BATCH_BYTES", 1)
+    assert run(catalog, users) == expected
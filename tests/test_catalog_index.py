@@ -0,0 +1,25 @@
+from src.utils.catalog_index import CatalogIndex, normalize_title
+
+
+def test_normalize_title_strips_latin_accents_and_year():
+    assert normalize_title("Amélie (2001)") == "amelie"
+    assert normalize_title("Léon: The Professional") == "leon the professional"
+    assert normalize_title("Straße") == "strasse"
+
+
+def test_normalize_title_keeps_non_latin_scripts():
+    assert normalize_title("Сталкер (1979)") == "сталкер"
+    assert normalize_title("千と千尋の神隠し") == "千と千尋の神隠し"
+    assert normalize_title("ガメラ") != normalize_title("カメラ")
+
+
+def test_lookup_non_latin_title():
+    catalog = CatalogIndex(["Сталкер", "Solaris", "千と千尋の神隠し"], [1979, 1972, 2001])
+    assert catalog.lookup("СТАЛКЕР") == 0
+    assert catalog.lookup("千と千尋の神隠し (2001)") == 2
+
+
+def test_lookup_prefers_year():
+    catalog = CatalogIndex(["Dune", "Dune"], [1984, 2021])
+    assert catalog.lookup("Dune (2021)") == 1
+    assert catalog.lookup("Dune", 1984) == 0
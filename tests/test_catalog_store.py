@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.embedding.quantization import dequantize_embeddings
+from src.recommender.index import RecommenderIndex, normalize_embeddings
+from src.utils.catalog_store import (
+    build_catalog,
+    catalog_index_path,
+    catalog_scale,
+    load_catalog
+)
+
+
+@pytest.fixture
+def source(tmp_path):
+    df = pd.DataFrame({
+        "title": ["Stalker", "Amélie", "千と千尋の神隠し", "Sem ano", "Persona"],
+        "release_date": [1979, 2001, 2001, None, 1966],
+        "rating_imdb": [8.1, 8.3, 8.6, 5.0, 8.1],
+        "genre": ["Drama, Sci-Fi", "Comedy", "Animation", "Drama", "Drama"],
+        "language": ["Russian", "French", "Japanese", "English", "Swedish"],
+        "director": ["Andrei Tarkovsky", None, "Hayao Miyazaki", "Ninguém", "Ingmar Bergman"]
+    })
+    csv_path = tmp_path / "base.csv"
+    df.to_csv(csv_path, index=False)
+    # A linha sem ano sai no dropna; os embeddings são só das 4 que ficam.
+    embeddings = np.random.default_rng(0).standard_normal((4, 8)).astype("float32") * 2
+    npy_path = tmp_path / "embeddings.npy"
+    np.save(npy_path, embeddings)
+    return str(csv_path), str(npy_path), df.drop(index=3).reset_index(drop=True), embeddings
+
+
+def test_round_trip_keeps_columns_nulls_and_vectors(tmp_path, source):
+    csv_path, npy_path, expected, embeddings = source
+    catalog_dir = str(tmp_path / "catalog")
+    manifest = build_catalog(csv_path, npy_path, catalog_dir)
+
+    df, stored, loaded_manifest = load_catalog(catalog_dir)
+    assert loaded_manifest == manifest
+    assert list(df.columns) == list(expected.columns)
+    assert df["title"].tolist() == expected["title"].tolist()
+    assert df["director"].tolist() == expected["director"].where(expected["director"].notna(), None).tolist()
+    np.testing.assert_array_equal(df["release_date"], expected["release_date"])
+    assert isinstance(stored, np.memmap)
+    np.testing.assert_allclose(stored, normalize_embeddings(embeddings), rtol=1e-6)
+
+    index = RecommenderIndex.load_or_build(
+        stored, catalog_index_path(catalog_dir), normalized=True, mmap=True, version=manifest["version"]
+    )
+    np.testing.assert_allclose(index.vectors([2]), normalize_embeddings(embeddings)[[2]], rtol=1e-6)
+
+
+def test_int8_catalog_keeps_its_scale(tmp_path, source):
+    csv_path, npy_path, _, embeddings = source
+    catalog_dir = str(tmp_path / "catalog")
+    build_catalog(csv_path, npy_path, catalog_dir, dtype="int8")
+
+    _, stored, manifest = load_catalog(catalog_dir)
+    scale = catalog_scale(catalog_dir, manifest)
+    assert stored.dtype == np.int8 and scale is not None
+    np.testing.assert_allclose(dequantize_embeddings(stored, scale), normalize_embeddings(embeddings), atol=0.02)
+
+
+def test_tampered_titles_are_rejected(tmp_path, source):
+    csv_path, npy_path, _, _ = source
+    catalog_dir = tmp_path / "catalog"
+    manifest = build_catalog(csv_path, npy_path, str(catalog_dir))
+
+    title_file = catalog_dir / manifest["columns"]["title"]["file"]
+    title_file.write_bytes(title_file.read_bytes().replace("Stalker".encode(), b"Solaris"))
+    with pytest.raises(ValueError):
+        load_catalog(str(catalog_dir))
+
+
+def test_embeddings_must_match_the_dataset(tmp_path, source):
+    csv_path, _, _, embeddings = source
+    npy_path = tmp_path / "short.npy"
+    np.save(npy_path, embeddings[:3])
+    with pytest.raises(ValueError):
+        build_catalog(csv_path, str(npy_path), str(tmp_path / "catalog"))
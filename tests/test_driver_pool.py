@@ -0,0 +1,120 @@
+import pytest
+from src.scraping.driver_pool import DriverPool
+
+
+class FakeDriver:
+    def __init__(self):
+        self.visited = []
+        self.quit_called = False
+        self.broken = False
+
+    @property
+    def current_url(self):
+        if self.broken:
+            raise RuntimeError("sessão do navegador perdida")
+        return self.visited[-1] if self.visited else "about:blank"
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture
+def launched():
+    return []
+
+
+@pytest.fixture
+def pool(launched):
+    def factory():
+        driver = FakeDriver()
+        launched.append(driver)
+        return driver
+
+    pool = DriverPool(size=2, max_pages=3, driver_factory=factory, checkout_timeout=0.1)
+    yield pool
+    pool.close()
+
+
+def test_checkout_reuses_returned_driver(pool, launched):
+    with pool.session() as driver:
+        driver.get("https://letterboxd.com/a/")
+    with pool.session() as driver:
+        driver.get("https://letterboxd.com/b/")
+
+    assert len(launched) == 1
+    assert launched[0].visited == ["https://letterboxd.com/a/", "https://letterboxd.com/b/"]
+
+
+def test_checkout_blocks_when_pool_is_exhausted(pool):
+    first = pool.checkout()
+    second = pool.checkout()
+    with pytest.raises(TimeoutError):
+        pool.checkout(timeout=0.05)
+
+    pool.checkin(first)
+    assert pool.checkout(timeout=0.05) is first
+    pool.checkin(first)
+    pool.checkin(second)
+
+
+def test_driver_is_recycled_after_max_pages(pool, launched):
+    for page in range(3):
+        with pool.session() as driver:
+            driver.get(f"https://letterboxd.com/page/{page}/")
+
+    assert launched[0].quit_called
+    with pool.session():
+        pass
+    assert len(launched) == 2
+
+
+def test_driver_is_discarded_when_session_fails(pool, launched):
+    with pytest.raises(ValueError):
+        with pool.session() as driver:
+            driver.get("https://letterboxd.com/a/")
+            raise ValueError("falha no scraping")
+
+    assert launched[0].quit_called
+    with pool.session():
+        pass
+    assert len(launched) == 2
+
+
+def test_unhealthy_idle_driver_is_replaced(pool, launched):
+    with pool.session():
+        pass
+    launched[0].broken = True
+
+    with pool.session():
+        pass
+    assert launched[0].quit_called
+    assert len(launched) == 2
+
+
+def test_checkout_after_close_fails(pool):
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.checkout()
+
+
+def test_poster_timeout_returns_driver_to_pool(pool, launched, monkeypatch):
+    from selenium.common.exceptions import TimeoutException
+    from src.scraping import letterboxd_scraper
+
+    class NeverReady:
+        def __init__(self, driver, timeout):
+            pass
+
+        def until(self, condition):
+            raise TimeoutException("sem pôster")
+
+    monkeypatch.setattr(letterboxd_scraper, "get_driver_pool", lambda: pool)
+    monkeypatch.setattr(letterboxd_scraper, "WebDriverWait", NeverReady)
+
+    assert letterboxd_scraper.get_movie_poster_by_slug("filme-sem-poster") is None
+    assert not launched[0].quit_called
+    with pool.session() as driver:
+        assert driver.driver is launched[0]
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+from src.embedding import embedding_generator
+from src.embedding.embedding_generator import embed_descriptions, generate_description_nova_base, generate_descriptions
+
+
+def frame():
+    return pd.DataFrame({
+        "title": ["Stalker", "Solaris", None],
+        "year": [1979, np.nan, 1975],
+        "release_date": [1979.0, 1972.0, np.nan],
+        "director": ["Andrei Tarkovsky", "Andrei Tarkovsky", "Andrei Tarkovsky"],
+        "star": ["Alisa Freyndlikh", np.nan, "Margarita Terekhova"],
+        "genre": ["Drama, Sci-Fi", "Drama", "Drama"],
+        "language": ["Russian", np.nan, "Russian"]
+    })
+
+
+def test_descriptions_match_the_row_wise_version():
+    df = frame()
+    expected = df.apply(lambda row: f"{row['title']} ({row['year']}), directed by {row['director']}, starring {row['star']}. Genre: {row['genre']}. Language: {row['language']}", axis=1)
+    assert generate_descriptions(df).tolist() == expected.tolist()
+
+
+def test_nova_base_descriptions_keep_nan_as_text():
+    df = frame()
+    expected = df.apply(lambda row: f"{row['title']} ({row['release_date']}), Genre: {row['genre']}. Language: {row['language']}", axis=1)
+    descriptions = generate_description_nova_base(df)
+    assert descriptions.tolist() == expected.tolist()
+    assert descriptions[1] == "Solaris (1972.0), Genre: Drama. Language: nan"
+
+
+class FakeModel:
+    """Modelo falso: o vetor de cada texto é o seu tamanho, e cada pool criado fica registrado."""
+
+    def __init__(self):
+        self.pools = []
+
+    def encode(self, texts, batch_size=32, show_progress_bar=True):
+        return [[len(text), 0.0] for text in texts]
+
+    def start_multi_process_pool(self, devices):
+        self.pools.append(devices)
+        return {"devices": devices}
+
+    def encode_multi_process(self, texts, pool, batch_size=32):
+        assert pool["devices"] == ["cpu", "cpu", "cpu"]
+        return np.array(self.encode(texts), dtype="float64")
+
+
+def test_multi_process_encoding_reuses_the_pool_and_keeps_order(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(embedding_generator, "get_model", lambda model_name: model)
+    monkeypatch.setattr(embedding_generator, "_process_pools", {})
+    texts = ["a", "abc", "ab"]
+
+    first = embed_descriptions(texts, processes=3)
+    second = embed_descriptions(iter(texts), processes=3)
+
+    assert first.dtype == np.float32
+    np.testing.assert_array_equal(first[:, 0], [1, 3, 2])
+    np.testing.assert_array_equal(second, first)
+    assert model.pools == [["cpu", "cpu", "cpu"]]
+    np.testing.assert_array_equal(embed_descriptions(texts, processes=1), first)
+    assert len(model.pools) == 1
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from src.embedding import embedding_store
+from src.embedding.embedding_store import EmbeddingStore, update_embeddings
+
+
+def fake_vector(text, dim=8):
+    seed = int.from_bytes(text.encode("utf-8")[:8].ljust(8, b"\0"), "little") % (2 ** 32)
+    return np.random.default_rng(seed).random(dim).astype("float32")
+
+
+@pytest.fixture
+def encoded(monkeypatch):
+    """Troca o modelo por vetores determinísticos e registra cada texto codificado."""
+    calls = []
+
+    def embed_descriptions(descriptions, **kwargs):
+        calls.extend(descriptions)
+        return np.stack([fake_vector(text) for text in descriptions])
+
+    monkeypatch.setattr(embedding_store, "embed_descriptions", embed_descriptions)
+    return calls
+
+
+def test_unchanged_texts_are_not_reencoded(tmp_path, encoded):
+    texts = [f"filme {i}" for i in range(10)]
+    update_embeddings(texts, str(tmp_path), chunk_size=4)
+    encoded.clear()
+
+    store = update_embeddings(texts, str(tmp_path), chunk_size=4)
+    assert encoded == []
+    np.testing.assert_array_equal(store.as_array(), np.stack([fake_vector(t) for t in texts]))
+
+
+def test_inserted_row_only_encodes_the_new_text(tmp_path, encoded):
+    texts = [f"filme {i}" for i in range(10)]
+    update_embeddings(texts, str(tmp_path), chunk_size=4)
+    encoded.clear()
+
+    texts = ["filme novo"] + texts[:5] + texts[6:]
+    store = update_embeddings(texts, str(tmp_path), chunk_size=4)
+
+    assert encoded == ["filme novo"]
+    np.testing.assert_array_equal(store.as_array(), np.stack([fake_vector(t) for t in texts]))
+    assert not (tmp_path / (embedding_store.VECTORS_FILE + embedding_store.PREVIOUS_SUFFIX)).exists()
+
+
+def test_update_resumes_with_previous_generation(tmp_path, encoded):
+    texts = [f"filme {i}" for i in range(6)]
+    update_embeddings(texts, str(tmp_path), chunk_size=4)
+
+    # Simula uma atualização que caiu depois do primeiro checkpoint.
+    store = EmbeddingStore(str(tmp_path))
+    store.start_update()
+    store.write(np.arange(2), np.stack([fake_vector(t) for t in texts[4:]]), embedding_store.hash_descriptions(texts[4:]))
+    store.checkpoint(2)
+    encoded.clear()
+
+    reordered = texts[4:] + texts[:4]
+    store = update_embeddings(reordered, str(tmp_path), chunk_size=4)
+    assert encoded == []
+    np.testing.assert_array_equal(store.as_array(), np.stack([fake_vector(t) for t in reordered]))
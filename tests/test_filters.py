@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.recommender import index as index_module
+from src.recommender.filters import AttributeIndex
+from src.recommender.index import RecommenderIndex
+
+
+def catalog(rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "title": [f"Filme {i}" for i in range(rows)],
+        "genre": np.where(np.arange(rows) % 40 == 0, "Drama, Horror", "Comedy"),
+        "language": np.where(np.arange(rows) % 2 == 0, "English", "Portuguese"),
+        "release_date": rng.integers(1950, 2024, rows),
+        "rating_imdb": np.round(rng.uniform(1, 10, rows), 1)
+    })
+
+
+def embeddings(rows=2000, dim=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((rows, dim)).astype("float32")
+
+
+def test_filter_combines_attributes():
+    df = catalog()
+    attributes = AttributeIndex.from_dataframe(df)
+    row_filter = attributes.build(genres=["horror"], languages=["English"], year_min=1990)
+
+    expected = np.flatnonzero(
+        df["genre"].str.contains("Horror") & (df["language"] == "English") & (df["release_date"] >= 1990)
+    )
+    np.testing.assert_array_equal(row_filter.rows, expected)
+    assert row_filter.count == len(expected)
+    assert row_filter.contains(expected).all()
+    assert attributes.build() is None
+    assert attributes.build(genres=["western"]).count == 0
+
+
+def test_selector_uses_bitmap_size_in_bytes():
+    row_filter = AttributeIndex.from_dataframe(catalog(rows=1001)).build(genres=["horror"])
+    selector = row_filter.selector()
+    assert len(row_filter.bitmap) == 126
+    assert selector.is_member(1000)
+    assert not selector.is_member(999)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw"])
+def test_filtered_search_returns_full_top_k(monkeypatch, index_type):
+    monkeypatch.setattr(index_module, "EXACT_FILTER_LIMIT", 0)
+    df, vectors = catalog(), embeddings()
+    index = RecommenderIndex(vectors, index_type=index_type, nlist=32) if index_type == "ivf_flat" \
+        else RecommenderIndex(vectors, index_type=index_type)
+    row_filter = AttributeIndex.from_dataframe(df).build(genres=["horror"])
+
+    queries = index.vectors(np.arange(5))
+    _, ids = index.search(queries, 10, row_filter=row_filter)
+    assert (ids >= 0).all()
+    assert row_filter.contains(ids.ravel()).all()
+
+    if index_type != "hnsw":
+        _, exact_ids = index._search_rows(queries, 10, row_filter.rows)
+        np.testing.assert_array_equal(np.sort(ids, axis=1), np.sort(exact_ids, axis=1))
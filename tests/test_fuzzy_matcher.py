@@ -0,0 +1,57 @@
+import pytest
+from src.matching.fuzzy_matcher import TitleMatcher
+from src.utils.catalog_index import CatalogIndex
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    catalog = CatalogIndex(
+        ["Parasite", "Amélie", "Dune", "Dune", "The Godfather", "Сталкер"],
+        [2019, 2001, 1984, 2021, 1972, 1979]
+    )
+    return TitleMatcher(catalog)
+
+
+def test_typo_in_single_word_title_still_matches(matcher):
+    title, score, row = matcher.match("Parasyte", 80)
+    assert (title, row) == ("Parasite", 0)
+    assert score >= 80
+
+
+def test_accents_and_case_are_ignored(matcher):
+    assert matcher.match("amelie")[1:] == (100.0, 1)
+    assert matcher.match("СТАЛКЕР")[2] == 5
+
+
+def test_year_picks_the_right_homonym(matcher):
+    assert matcher.match("Dune (1984)")[2] == 2
+    assert matcher.match("Dune (2021)")[2] == 3
+    assert matcher.match("Dunne (2021)")[2] == 3
+
+
+def test_match_rows_drops_titles_below_threshold(matcher):
+    rows = matcher.match_rows(["The Godfather", "Filme que não existe"], threshold=85)
+    assert rows == {"The Godfather": 4, "Filme que não existe": None}
+
+
+def test_bulk_matching_agrees_with_extract_one():
+    from rapidfuzz import fuzz, process
+    from src.matching.fuzzy_matcher import match_titles_bulk
+
+    catalog = [f"filme numero {i}" for i in range(50)] + ["stalker", "solaris", "the mirror"]
+    queries = ["stalkr", "solaris", "mirror", "filme numero 42", "nada parecido aqui"]
+    matches, scores, rows = match_titles_bulk(queries, catalog, threshold=80, query_chunk_size=2, choice_chunk_size=7)
+
+    for query, match, score, row in zip(queries, matches, scores, rows):
+        expected, expected_score, expected_row = process.extractOne(query, catalog, scorer=fuzz.WRatio)
+        if expected_score >= 80:
+            assert (match, row) == (expected, expected_row)
+            assert score == pytest.approx(expected_score, abs=1e-3)
+        else:
+            assert (match, row) == (None, -1)
+
+
+def test_match_bulk_returns_catalog_titles(matcher):
+    matches, _, rows = matcher.match_bulk(["parasite", "Amelie", "xyz"], threshold=80)
+    assert list(matches) == ["Parasite", "Amélie", None]
+    assert list(rows) == [0, 1, -1]
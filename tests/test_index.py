@@ -0,0 +1,27 @@
+import numpy as np
+import faiss
+from src.recommender.index import RecommenderIndex, normalize_embeddings
+
+
+def embeddings(rows=50, dim=8):
+    return np.random.default_rng(0).standard_normal((rows, dim)).astype("float32") * 3
+
+
+def test_flat_index_serves_vectors_from_its_own_storage():
+    raw = embeddings()
+    index = RecommenderIndex(raw)
+
+    xb = faiss.rev_swig_ptr(faiss.downcast_index(index.index).get_xb(), raw.size)
+    assert np.shares_memory(index.embeddings, xb)
+    np.testing.assert_allclose(index.vectors(np.arange(5)), normalize_embeddings(raw)[:5], rtol=1e-6)
+
+
+def test_loaded_flat_index_does_not_normalize_a_copy(tmp_path):
+    raw = embeddings()
+    path = str(tmp_path / "index.faiss")
+    RecommenderIndex(raw, version="v1").save(path)
+
+    index = RecommenderIndex.load(path, raw, version="v1")
+    assert not np.shares_memory(index.embeddings, raw)
+    assert index.quantization == "float32"
+    np.testing.assert_allclose(index.vectors([3]), normalize_embeddings(raw)[[3]], rtol=1e-6)
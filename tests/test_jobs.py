@@ -0,0 +1,95 @@
+import threading
+import time
+import pytest
+from src.utils.jobs import CPU, INLINE, IO, JobError, JobManager
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(io_workers=2, cpu_workers=1, max_jobs=3, ttl=60, timeout=5)
+    yield manager
+    manager.shutdown()
+
+
+def wait_done(job, timeout=5):
+    deadline = time.time() + timeout
+    while not job.done and time.time() < deadline:
+        job.wait_for_change(job.version, timeout=0.1)
+    assert job.done
+    return job
+
+
+def test_stages_run_in_order_and_pass_results(manager):
+    job = manager.submit("recommend", [
+        ("scrape_profile", IO, lambda _: {"favorites": ["Stalker"]}),
+        ("rank", CPU, lambda profile: profile["favorites"] + ["Solaris"])
+    ], {"nickname": "someone"})
+
+    wait_done(job)
+    snapshot = job.snapshot()
+    assert snapshot["status"] == "done"
+    assert snapshot["result"] == ["Stalker", "Solaris"]
+    assert manager.get(job.id) is job
+
+
+def test_iter_snapshots_follows_stage_transitions(manager):
+    scraped, ranked = threading.Event(), threading.Event()
+    job = manager.submit("recommend", [
+        ("scrape_profile", IO, lambda _: scraped.wait(5) and "perfil"),
+        ("rank", CPU, lambda profile: ranked.wait(5) and profile.upper())
+    ])
+
+    events = (snapshot for snapshot in job.iter_snapshots(timeout=1) if snapshot is not None)
+    first = next(events)
+    assert (first["status"], first["stage"]) == ("running", "scrape_profile")
+    scraped.set()
+    second = next(events)
+    assert (second["status"], second["stage"]) == ("running", "rank")
+    ranked.set()
+    last = next(events)
+    assert (last["status"], last["result"]) == ("done", "PERFIL")
+    assert list(events) == []
+
+
+def test_job_error_keeps_message_and_status(manager):
+    def missing(_):
+        raise JobError("Perfil não encontrado.", 404)
+
+    job = wait_done(manager.submit("recommend", [("scrape_profile", INLINE, missing)]))
+    snapshot = job.snapshot()
+    assert snapshot["status"] == "error"
+    assert snapshot["error"] == "Perfil não encontrado."
+    assert snapshot["status_code"] == 404
+
+
+def test_unexpected_error_is_reported_as_500(manager):
+    job = wait_done(manager.submit("recommend", [("rank", CPU, lambda _: 1 / 0)]))
+    assert job.snapshot()["status_code"] == 500
+    assert "ZeroDivisionError" not in job.snapshot()["error"]
+
+
+def test_running_job_times_out_and_ignores_late_result(manager):
+    release = threading.Event()
+    manager.timeout = 0.1
+    job = manager.submit("find_common", [("scrape_watchlists", IO, lambda _: release.wait(5) and ["Stalker"])])
+
+    time.sleep(0.15)
+    assert manager.get(job.id).snapshot()["status_code"] == 504
+    release.set()
+    time.sleep(0.1)
+    assert job.snapshot()["status"] == "error"
+
+
+def test_eviction_by_age_and_count(manager):
+    release = threading.Event()
+    running = manager.submit("find_common", [("scrape_watchlists", IO, lambda _: release.wait(5))])
+    finished = [wait_done(manager.submit("recommend", [("rank", INLINE, lambda _: i)])) for i in range(3)]
+
+    # Acima de max_jobs sai o mais antigo, mesmo ainda rodando.
+    assert manager.get(running.id) is None
+    assert all(manager.get(job.id) is job for job in finished)
+
+    manager.ttl = 0
+    manager.submit("recommend", [("rank", INLINE, lambda _: None)])
+    assert all(manager.get(job.id) is None for job in finished)
+    release.set()
@@ -0,0 +1,61 @@
+import pytest
+from src.utils import metrics
+from src.utils.metrics import Registry
+
+
+def test_counter_renders_escaped_labels():
+    registry = Registry()
+    counter = registry.counter("scrapes_total", "Coletas.", labels=("kind",))
+    counter.inc(kind='pôster "grande"')
+    counter.inc(2, kind="profile")
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP scrapes_total Coletas.", "# TYPE scrapes_total counter"]
+    assert 'scrapes_total{kind="profile"} 2.0' in lines
+    assert 'scrapes_total{kind="pôster \\"grande\\""} 1.0' in lines
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram("stage_seconds", "Duração.", labels=("stage",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, stage="rank")
+
+    text = registry.render()
+    assert 'stage_seconds_bucket{stage="rank",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="rank",le="1.0"} 2' in text
+    assert 'stage_seconds_bucket{stage="rank",le="+Inf"} 3' in text
+    assert 'stage_seconds_sum{stage="rank"} 5.55' in text
+    assert 'stage_seconds_count{stage="rank"} 3' in text
+
+
+def test_collectors_choose_type_and_failures_are_skipped():
+    registry = Registry()
+
+    @registry.register_collector
+    def cache_stats():
+        yield "cache_entries", "Entradas.", {"cache": "scrape"}, 3
+        yield "cache_hits_total", "Acertos.", {"cache": "scrape"}, 7, "counter"
+
+    @registry.register_collector
+    def broken():
+        raise RuntimeError("coletor quebrado")
+        yield
+
+    lines = registry.render().splitlines()
+    assert "# TYPE cache_entries gauge" in lines
+    assert "# TYPE cache_hits_total counter" in lines
+    assert 'cache_hits_total{cache="scrape"} 7.0' in lines
+
+
+def test_timed_counts_errors(monkeypatch):
+    registry = Registry()
+    monkeypatch.setattr(metrics, "STAGE_SECONDS", registry.histogram("seconds", "Duração.", labels=("stage",)))
+    monkeypatch.setattr(metrics, "STAGE_ERRORS", registry.counter("errors_total", "Erros.", labels=("stage",)))
+
+    with pytest.raises(ValueError):
+        with metrics.timed("rank"):
+            raise ValueError("falhou")
+
+    assert metrics.STAGE_ERRORS.value(stage="rank") == 1
+    assert 'seconds_count{stage="rank"} 1' in registry.render()
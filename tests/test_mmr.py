@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from sklearn.metrics.pairwise import cosine_similarity
+from src.recommender.mmr import mmr_rerank, mmr_rerank_batch
+
+
+def original_mmr(query_vec, candidate_vecs, top_n, lambda_):
+    """O laço por candidato da versão original de recommend_movies_advanced, devolvendo posições."""
+    user_profile_vec = query_vec.reshape(1, -1)
+    candidate_indices = list(range(len(candidate_vecs)))
+    relevance_scores = cosine_similarity(user_profile_vec, candidate_vecs)[0]
+    candidate_relevance = {idx: score for idx, score in zip(candidate_indices, relevance_scores)}
+
+    recommendations_indices = [candidate_indices[np.argmax(relevance_scores)]]
+    candidate_indices.pop(np.argmax(relevance_scores))
+
+    while len(recommendations_indices) < top_n and candidate_indices:
+        mmr_scores = []
+        recommended_vecs = candidate_vecs[recommendations_indices]
+        for candidate_idx in candidate_indices:
+            candidate_vec = candidate_vecs[candidate_idx].reshape(1, -1)
+            relevance = candidate_relevance[candidate_idx]
+            max_similarity = np.max(cosine_similarity(candidate_vec, recommended_vecs))
+            mmr_scores.append((lambda_ * relevance - (1 - lambda_) * max_similarity, candidate_idx))
+        if not mmr_scores:
+            break
+        best_candidate_idx = max(mmr_scores, key=lambda x: x[0])[1]
+        recommendations_indices.append(best_candidate_idx)
+        candidate_indices.remove(best_candidate_idx)
+
+    return recommendations_indices
+
+
+@pytest.mark.parametrize("lambda_", [0.0, 0.2, 0.5, 0.7, 0.95, 1.0])
+@pytest.mark.parametrize("top_n", [1, 5, 10, 40])
+def test_matches_original_loop(lambda_, top_n):
+    rng = np.random.default_rng(int(lambda_ * 100) + top_n)
+    query = rng.standard_normal(64).astype("float32")
+    candidates = rng.standard_normal((30, 64)).astype("float32")
+
+    expected = original_mmr(query, candidates, top_n, lambda_)
+    assert mmr_rerank(query, candidates, top_n, lambda_).tolist() == expected
+
+
+@pytest.mark.parametrize("lambda_", [0.3, 0.7, 1.0])
+def test_ties_pick_the_first_candidate_like_the_original(lambda_):
+    rng = np.random.default_rng(7)
+    query = rng.standard_normal(16).astype("float32")
+    base = rng.standard_normal((6, 16)).astype("float32")
+    # Cada vetor aparece duas vezes: relevância e similaridade empatam entre as cópias.
+    candidates = np.concatenate([base, base])[[0, 6, 1, 7, 2, 8, 3, 9, 4, 10, 5, 11]]
+
+    expected = original_mmr(query, candidates, 8, lambda_)
+    assert mmr_rerank(query, candidates, 8, lambda_).tolist() == expected
+
+
+def test_batch_matches_single_queries():
+    rng = np.random.default_rng(3)
+    queries = rng.standard_normal((5, 32)).astype("float32")
+    candidates = rng.standard_normal((5, 20, 32)).astype("float32")
+
+    selected = mmr_rerank_batch(queries, candidates, 10, 0.7)
+    for b in range(5):
+        assert selected[b].tolist() == original_mmr(queries[b], candidates[b], 10, 0.7)
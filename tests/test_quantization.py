@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from src.embedding.quantization import (
+    compare_quantization, dequantize_embeddings, load_embeddings, quantize_embeddings,
+    scale_path_for, write_normalized_embeddings
+)
+from src.recommender.index import RecommenderIndex, normalize_embeddings
+
+
+@pytest.fixture
+def embeddings():
+    return np.random.default_rng(0).standard_normal((300, 16)).astype("float32")
+
+
+def test_int8_round_trip_stays_within_half_a_step(embeddings):
+    codes, scale = quantize_embeddings(embeddings, "int8")
+
+    assert codes.dtype == np.int8 and scale.dtype == np.float32 and scale.shape == (16,)
+    assert np.abs(codes).max() <= 127
+    error = np.abs(dequantize_embeddings(codes, scale) - embeddings)
+    assert np.all(error <= scale / 2 + 1e-6)
+
+
+def test_float16_round_trip_and_errors(embeddings):
+    codes, scale = quantize_embeddings(embeddings, "float16")
+    assert codes.dtype == np.float16 and scale is None
+    np.testing.assert_allclose(dequantize_embeddings(codes), embeddings, atol=1e-2)
+
+    with pytest.raises(ValueError):
+        quantize_embeddings(embeddings, "int4")
+    with pytest.raises(ValueError):
+        dequantize_embeddings(quantize_embeddings(embeddings, "int8")[0])
+
+
+def test_zero_dimension_gets_unit_scale():
+    codes, scale = quantize_embeddings(np.zeros((3, 2), dtype="float32"), "int8")
+    np.testing.assert_array_equal(scale, [1.0, 1.0])
+    np.testing.assert_array_equal(codes, 0)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_chunked_write_matches_normalizing_everything_at_once(tmp_path, embeddings, dtype):
+    path = str(tmp_path / f"embeddings_{dtype}.npy")
+    scale = write_normalized_embeddings(embeddings, path, dtype, chunk_size=64)
+
+    codes, loaded_scale = load_embeddings(path, mmap_mode="r")
+    expected, expected_scale = quantize_embeddings(normalize_embeddings(embeddings), dtype)
+    assert codes.dtype == np.dtype(dtype)
+    np.testing.assert_array_equal(codes, expected)
+    if dtype == "int8":
+        np.testing.assert_allclose(scale, expected_scale)
+        np.testing.assert_array_equal(loaded_scale, scale)
+    else:
+        assert scale is None and loaded_scale is None
+        assert not (tmp_path / f"embeddings_{dtype}.scale.npy").exists()
+
+
+def test_index_keeps_int8_codes_and_dequantizes_only_requested_rows(tmp_path, embeddings):
+    path = str(tmp_path / "embeddings.npy")
+    write_normalized_embeddings(embeddings, path, "int8")
+    codes, scale = load_embeddings(path, mmap_mode="r")
+
+    with pytest.raises(ValueError):
+        RecommenderIndex(codes)
+    index = RecommenderIndex(codes, scale=scale)
+    assert index.quantization == "int8" and index.embeddings.dtype == np.int8
+
+    rows = np.array([5, 42, 7])
+    vectors = index.vectors(rows)
+    assert vectors.dtype == np.float32
+    np.testing.assert_allclose(vectors, normalize_embeddings(embeddings)[rows], atol=np.max(scale))
+
+    _, ids = index.search(vectors[:1], 1)
+    assert ids[0, 0] == 5
+
+
+def test_scale_path_sits_next_to_the_embeddings():
+    assert scale_path_for("data/embeddings/movie_embeddings.npy") == "data/embeddings/movie_embeddings.scale.npy"
+
+
+def test_compare_quantization_reports_recall(embeddings):
+    report = compare_quantization(embeddings, "int8", num_queries=50, k=20)
+    assert report["recall@10"] > 0.8 and report["recall@20"] > 0.8
+    assert report["bytes_quantized"] < report["bytes_float32"] / 3
@@ -0,0 +1,45 @@
+import pandas as pd
+from src.recommender.result_cache import RecommendationCache
+
+
+def frame(*titles):
+    return pd.DataFrame({"title": list(titles)})
+
+
+def test_key_ignores_favorite_order():
+    assert RecommendationCache.key([3, 1, 2], top_n=10) == RecommendationCache.key([1, 2, 3], top_n=10)
+    assert RecommendationCache.key([1, 2], top_n=10) != RecommendationCache.key([1, 2], top_n=5)
+    assert RecommendationCache.key([1, 2], [1.0, 2.0]) != RecommendationCache.key([1, 2], [2.0, 1.0])
+
+
+def test_results_are_cached_per_index_version():
+    cache = RecommendationCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return frame("Stalker", "Solaris")
+
+    key = cache.key([1, 2], top_n=2)
+    first = cache.get_or_compute("v1", key, compute)
+    first.loc[0, "title"] = "alterado"
+    assert cache.get_or_compute("v1", key, compute)["title"].tolist() == ["Stalker", "Solaris"]
+    assert len(calls) == 1
+
+    cache.get_or_compute("v2", key, compute)
+    assert len(calls) == 2
+    assert cache.stats()["entries"] == 2
+
+
+def test_empty_results_are_not_cached():
+    cache = RecommendationCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return frame()
+
+    key = cache.key([1], top_n=2)
+    cache.get_or_compute("v1", key, compute)
+    cache.get_or_compute("v1", key, compute)
+    assert len(calls) == 2
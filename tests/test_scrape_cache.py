@@ -0,0 +1,30 @@
+import time
+from src.scraping.scrape_cache import ScrapeCache
+
+
+def test_failed_fetch_is_not_cached(tmp_path):
+    cache = ScrapeCache(path=str(tmp_path / "cache.sqlite"))
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return None
+
+    assert cache.get_or_fetch("profile", "someone", fetch) is None
+    assert cache.get_or_fetch("profile", "someone", fetch) is None
+    assert len(calls) == 2
+
+
+def test_disk_hit_keeps_remaining_ttl(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    writer = ScrapeCache(ttls={"profile": 0.3}, path=path)
+    writer.set("profile", "someone", {"favorites": ["Stalker"]})
+    time.sleep(0.2)
+
+    reader = ScrapeCache(ttls={"profile": 60}, path=path)
+    value = reader.get_or_fetch("profile", "someone", lambda: {"favorites": ["outro"]})
+    assert value == {"favorites": ["Stalker"]}
+
+    time.sleep(0.15)
+    value = reader.get_or_fetch("profile", "someone", lambda: {"favorites": ["outro"]})
+    assert value == {"favorites": ["outro"]}
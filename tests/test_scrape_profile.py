@@ -0,0 +1,104 @@
+import os
+import pytest
+import requests
+from selenium.common.exceptions import TimeoutException
+from src.scraping import letterboxd_scraper
+from src.scraping.driver_pool import DriverPool
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+class FakeDriver:
+    def __init__(self, page_source):
+        self.page_source = page_source
+        self.current_url = "about:blank"
+
+    def get(self, url):
+        self.current_url = url
+
+    def quit(self):
+        pass
+
+
+class Ready:
+    def __init__(self, driver, timeout):
+        pass
+
+    def until(self, condition):
+        return True
+
+
+class NeverReady(Ready):
+    def until(self, condition):
+        raise TimeoutException("favoritos não carregaram")
+
+
+@pytest.fixture
+def site(monkeypatch):
+    """HTTP e navegador falsos; `site["http"]` e `site["browser"]` definem o que cada um devolve."""
+    site = {"http": None, "browser": None, "browser_calls": 0}
+
+    def fetch_html(url, timeout=None):
+        if isinstance(site["http"], Exception):
+            raise site["http"]
+        return site["http"]
+
+    def factory():
+        site["browser_calls"] += 1
+        return FakeDriver(site["browser"])
+
+    pool = DriverPool(size=1, driver_factory=factory)
+    monkeypatch.setattr(letterboxd_scraper, "_fetch_html", fetch_html)
+    monkeypatch.setattr(letterboxd_scraper, "get_driver_pool", lambda: pool)
+    monkeypatch.setattr(letterboxd_scraper, "WebDriverWait", Ready)
+    yield site
+    pool.close()
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status}", response=response)
+
+
+def test_profile_comes_from_a_single_http_fetch(site):
+    site["http"] = fixture("profile.html")
+    profile = letterboxd_scraper.scrape_profile.uncached("someone")
+
+    assert profile["favorites"] == ["Stalker (1979)", "Dune (1984)", "Persona (1966)"]
+    assert profile["avatar_url"] == "https://a.ltrbxd.com/avatar/someone.jpg"
+    assert profile["display_name"] == "Someone"
+    assert profile["stats"] == {"films": "1,024"}
+    assert site["browser_calls"] == 0
+
+
+def test_missing_profile_does_not_open_the_browser(site):
+    site["http"] = http_error(404)
+    assert letterboxd_scraper.scrape_profile.uncached("ninguem") is None
+    assert site["browser_calls"] == 0
+
+
+def test_profile_without_favorites_is_final(site):
+    site["http"] = fixture("profile_no_favorites.html")
+    profile = letterboxd_scraper.scrape_profile.uncached("friend")
+    assert profile["favorites"] == []
+    assert site["browser_calls"] == 0
+
+
+@pytest.mark.parametrize("http", [fixture("challenge.html"), http_error(503)])
+def test_incomplete_http_page_falls_back_to_the_browser(site, http):
+    site["http"], site["browser"] = http, fixture("profile.html")
+    profile = letterboxd_scraper.scrape_profile.uncached("someone")
+    assert profile["favorites"][0] == "Stalker (1979)"
+    assert site["browser_calls"] == 1
+
+
+def test_browser_timeout_returns_none(site, monkeypatch):
+    site["http"], site["browser"] = fixture("challenge.html"), fixture("challenge.html")
+    monkeypatch.setattr(letterboxd_scraper, "WebDriverWait", NeverReady)
+    assert letterboxd_scraper.scrape_profile.uncached("someone") is None
@@ -0,0 +1,128 @@
+import os
+import time
+import numpy as np
+import pytest
+from src.recommender import user_index as user_index_module
+from src.recommender.user_index import SNAPSHOT_FILE, UserIndex
+
+DIM = 8
+
+
+@pytest.fixture(autouse=True)
+def no_atexit(monkeypatch):
+    monkeypatch.setattr(user_index_module.atexit, "register", lambda fn: fn)
+
+
+def vector(seed):
+    return np.random.default_rng(seed).standard_normal(DIM).astype("float32")
+
+
+def test_profiles_survive_restart(tmp_path):
+    path = str(tmp_path)
+    users = UserIndex.load_or_create(path, DIM, 100, version="v1")
+    assert users.upsert("Someone", vector(0), [3, 1, 2])
+    assert not users.upsert("someone", vector(0), [1, 2, 3])
+    users.upsert("friend", vector(1), [4, 5])
+    users.flush()
+
+    reopened = UserIndex.load_or_create(path, DIM, 100, version="v1")
+    assert len(reopened) == 2
+    assert "SOMEONE" in reopened
+    np.testing.assert_array_equal(reopened.favorites[reopened.ids["someone"]], [1, 2, 3])
+    assert reopened.similar_users("someone", k=1)[0][0] == "friend"
+    assert not [name for name in os.listdir(path) if name.startswith("log-")]
+
+
+def test_logs_are_replayed_without_flush(tmp_path):
+    path = str(tmp_path)
+    users = UserIndex.load_or_create(path, DIM, 100, version="v1")
+    users.upsert("someone", vector(0), [1, 2])
+    users._writer.close()
+    users._writer = None
+
+    reopened = UserIndex.load(path, DIM, 100, version="v1")
+    assert "someone" in reopened
+
+
+def test_latest_update_wins_across_workers(tmp_path):
+    path = str(tmp_path)
+    first = UserIndex.load_or_create(path, DIM, 100, version="v1")
+    second = UserIndex.load_or_create(path, DIM, 100, version="v1")
+    first.upsert("someone", vector(0), [1, 2])
+    second.upsert("someone", vector(1), [7, 8])
+    # No teste os dois "workers" dividem o pid (e o log); o segundo esvazia a fila antes.
+    second._writer.close()
+    second._writer = None
+    first.flush()
+
+    reopened = UserIndex.load_or_create(path, DIM, 100, version="v1")
+    np.testing.assert_array_equal(reopened.favorites[reopened.ids["someone"]], [7, 8])
+
+
+def test_other_embeddings_version_starts_empty(tmp_path):
+    path = str(tmp_path)
+    users = UserIndex.load_or_create(path, DIM, 100, version="v1")
+    users.upsert("someone", vector(0), [1, 2])
+    users.flush()
+    assert os.path.exists(os.path.join(path, SNAPSHOT_FILE))
+
+    assert len(UserIndex.load_or_create(path, DIM, 100, version="v2")) == 0
+
+
+def test_co_favorite_scores_exclude_the_user(tmp_path):
+    users = UserIndex(DIM, 100)
+    users.upsert("someone", vector(0), [1, 2])
+    users.upsert("friend", vector(0) + 0.01, [2, 9])
+
+    rows, scores = users.co_favorite_scores(vector(0), exclude="someone")
+    np.testing.assert_array_equal(rows, [2, 9])
+    assert scores.max() == 1.0
+
+
+def test_reupsert_hides_the_old_vector(tmp_path):
+    users = UserIndex(DIM, 100)
+    for seed, name in enumerate(["someone", "friend", "other"]):
+        users.upsert(name, vector(seed), [seed])
+    users.compact()
+
+    # O vetor velho de "someone" fica no HNSW como tombstone até a próxima compactação.
+    users.upsert("someone", vector(1) + 0.01, [9])
+    for _ in range(2):
+        neighbors = users.similar_users(profile_vec=vector(1), k=5)
+        assert [name for name, _ in neighbors].count("someone") == 1
+        assert len(neighbors) == 3
+        assert {name for name, _ in neighbors[:2]} == {"someone", "friend"}
+        users.compact()
+
+
+def test_updates_during_compaction_are_kept(tmp_path):
+    users = UserIndex(DIM, 100)
+    users.upsert("someone", vector(0), [1])
+    users.upsert("friend", vector(1), [2])
+    build = users._build_index
+
+    def build_while_updating(ids, vectors):
+        users.upsert("someone", vector(2), [3])
+        return build(ids, vectors)
+
+    users._build_index = build_while_updating
+    users.compact()
+
+    expected = vector(2) / np.linalg.norm(vector(2))
+    np.testing.assert_allclose(users.profile("someone"), expected, rtol=1e-5)
+    assert users.similar_users(profile_vec=vector(2), k=1)[0][0] == "someone"
+    assert len(users.similar_users(profile_vec=vector(0), k=5)) == 2
+
+
+def test_buffer_is_compacted_in_background(tmp_path):
+    users = UserIndex(DIM, 100, compact_every=4)
+    for seed in range(6):
+        users.upsert(f"user{seed}", vector(seed), [seed])
+    deadline = time.time() + 5
+    while users._generation.index.ntotal == 0 and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert users._generation.index.ntotal >= 4
+    assert sorted(name for name, _ in users.similar_users(profile_vec=vector(0), k=10)) == \
+        [f"user{seed}" for seed in range(6)]
+    assert users.similar_users(profile_vec=vector(5), k=1)[0][0] == "user5"
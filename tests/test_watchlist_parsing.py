@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from collections import Counter
+import pytest
+from src.scraping.letterboxd_scraper import (
+    WATCHLIST_URL,
+    _parse_page_count,
+    _parse_watchlist_page,
+    find_common_watchlists,
+    iter_watchlist_pages,
+    scrape_watchlist
+)
+from src.scraping.scrape_cache import ScrapeCache
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def fake_site(pages_by_user, failing=()):
+    """`fetch_page` falso que serve os fixtures por URL e falha nas URLs de `failing`."""
+    urls = {
+        WATCHLIST_URL.format(nickname=user, page=page): fixture(name)
+        for user, pages in pages_by_user.items()
+        for page, name in enumerate(pages, start=1)
+    }
+
+    def fetch_page(url):
+        if url in failing:
+            raise ConnectionError(f"falha simulada em {url}")
+        return urls[url]
+
+    return fetch_page
+
+
+THREE_PAGES = ["watchlist_page1.html", "watchlist_page2.html", "watchlist_page3.html"]
+
+
+def test_parse_watchlist_page_reads_poster_alts():
+    assert _parse_watchlist_page(fixture("watchlist_page1.html")) == ["Stalker", "Amélie"]
+    assert _parse_watchlist_page(fixture("watchlist_page3.html")) == ["Mirror", "Persona"]
+
+
+def test_parse_page_count():
+    assert _parse_page_count(fixture("watchlist_page1.html")) == 3
+    assert _parse_page_count(fixture("watchlist_page2.html")) == 3
+    assert _parse_page_count(fixture("watchlist_single.html")) == 1
+
+
+def test_iter_watchlist_pages_fetches_every_page():
+    fetch_page = fake_site({"someone": THREE_PAGES})
+    pages = dict(iter_watchlist_pages("someone", max_workers=2, fetch_page=fetch_page))
+    assert pages == {1: ["Stalker", "Amélie"], 2: ["Solaris"], 3: ["Mirror", "Persona"]}
+
+
+def test_scrape_watchlist_keeps_page_order():
+    fetch_page = fake_site({"someone": THREE_PAGES})
+    assert scrape_watchlist("someone", fetch_page=fetch_page) == ["Stalker", "Amélie", "Solaris", "Mirror", "Persona"]
+
+
+def test_failed_page_fails_the_whole_watchlist():
+    failing = {WATCHLIST_URL.format(nickname="someone", page=2)}
+    fetch_page = fake_site({"someone": THREE_PAGES}, failing=failing)
+
+    with pytest.raises(RuntimeError):
+        list(iter_watchlist_pages("someone", max_workers=2, fetch_page=fetch_page))
+    assert scrape_watchlist("someone", fetch_page=fetch_page) is None
+
+
+def test_find_common_watchlists():
+    fetch_page = fake_site({"someone": THREE_PAGES, "friend": ["watchlist_single.html"]})
+    assert find_common_watchlists("someone", "friend", fetch_page=fetch_page) == ["Mirror", "Stalker"]
+
+
+def test_find_common_watchlists_propagates_page_failure():
+    failing = {WATCHLIST_URL.format(nickname="someone", page=3)}
+    fetch_page = fake_site({"someone": THREE_PAGES, "friend": ["watchlist_single.html"]}, failing=failing)
+    with pytest.raises(RuntimeError):
+        find_common_watchlists("someone", "friend", fetch_page=fetch_page)
+
+
+def test_concurrent_find_common_shares_one_scrape_per_user():
+    fetch_page = fake_site({"someone": THREE_PAGES, "friend": ["watchlist_single.html"]})
+    calls = Counter()
+
+    def counting_fetch(url):
+        calls[url] += 1
+        time.sleep(0.05)
+        return fetch_page(url)
+
+    cache = ScrapeCache(path=None)
+    results = []
+    callers = [
+        threading.Thread(target=lambda: results.append(
+            find_common_watchlists("someone", "friend", fetch_page=counting_fetch, cache=cache)
+        ))
+        for _ in range(3)
+    ]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+
+    assert results == [["Mirror", "Stalker"]] * 3
+    deadline = time.time() + 5
+    while cache.peek("watchlist", "someone") is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert cache.peek("watchlist", "someone") == ["Stalker", "Amélie", "Solaris", "Mirror", "Persona"]
+    assert set(calls.values()) == {1}